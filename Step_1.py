@@ -1,13 +1,33 @@
 import os
-import shutil
-import random
-import subprocess
 import time
+import shutil
+import argparse
 import numpy as np
 import logging
 from scipy.optimize import minimize
-from tkinter import Tk
-from tkinter import filedialog
+from solver_runner import run_solver, SolverError
+from evaluation_cache import open_evaluation_cache, restore_cached_output, store_output
+from inp_template import CompiledTemplate, read_experimental_temperatures, PARAMETER_NAMES
+from pc_saft_native import run_native, evaluate_batch, read_exp_data
+from samplers import ParameterSampler
+from multistart import run_multistart, format_multistart_table
+from parallel_nelder_mead import parallel_nelder_mead, PARALLEL_METHODS
+from surrogate_optimizer import surrogate_optimize
+from least_squares_fit import parallel_least_squares
+from population_optimizer import population_optimize, format_generation, POPULATION_METHODS
+from bounded_transform import BoundedTransform
+from stopping_criteria import StoppingPolicy, CampaignBudget, StopOptimization
+from sensitivity_screening import (screen_morris, screen_samples, format_screening_table, ParameterSubspace,
+                                   SCREENING_METHODS)
+from warm_start import (open_warm_start_library, system_descriptors, warm_start_design, warm_start_steps,
+                        steps_simplex, format_neighbours)
+from checkpoint import open_checkpoint, checkpoint_seed
+from calc_output import parse_calc_output, output_rmsrd, calculated_at_temperatures, scaled_residuals
+from results_store import ResultsStore
+from results_db import open_results_database
+from evaluation_trace import EvaluationTracer
+from evaluation_pool import EvaluationPool
+from remote_workers import WorkerCoordinator, RemoteSolver, RemoteEvaluationPool
 
 
 # Function to read parameter ranges from a file
@@ -37,8 +57,44 @@ def read_drug_polymer_name(template_file_path):
     return drug_polymer_name
 
 
+# Function to parse the command line; without --base-dir the directories are chosen in Tk dialogs
+def parse_command_line():
+    parser = argparse.ArgumentParser(description="Step 1: random datasets and Nelder-Mead pre-optimization. "
+                                                 "Run without arguments to choose the directories interactively.")
+    parser.add_argument("--base-dir", help="Main program directory (executable, ranges_variables.txt, output folders)")
+    parser.add_argument("--folder", action="append", dest="folders",
+                        help="drug_polymer folder to process (repeat for several folders)")
+    parser.add_argument("--workspace", help="Directory the solver runs in (default: the main program directory); "
+                                            "give every concurrent run its own workspace")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its checkpoint without repeating solver runs")
+    parser.add_argument("--set", action="append", default=[], dest="overrides", metavar="KEY=VALUE",
+                        help="Override a ranges_variables.txt setting, e.g. --set num_workers=4")
+    return parser.parse_args()
+
+
+# Function to parse KEY=VALUE overrides (values are read like ranges_variables.txt, bare words as strings)
+def parse_setting_overrides(items):
+    overrides = {}
+    for item in items:
+        key, value = item.split('=', 1)
+        try:
+            overrides[key.strip()] = eval(value.strip())
+        except (NameError, SyntaxError):
+            overrides[key.strip()] = value.strip()
+    return overrides
+
+
+# Function to ask for a directory in a Tk dialog (tkinter is only imported for interactive runs)
+def ask_directory(title):
+    from tkinter import Tk, filedialog
+    Tk().withdraw()  # Hide the root window
+    return filedialog.askdirectory(title=title)
+
+
 # Function to select drug_polymer folders
 def select_drug_polymer_folders(base_directory):
+    from tkinter import Tk, filedialog
     Tk().withdraw()  # Close the root window
     selected_folders = []
     while True:
@@ -67,9 +123,11 @@ def copy_template_and_exp_data_files(drug_polymer_folder):
         logging.warning(f"Exp_data_SLE.dat not found in {drug_polymer_folder}. Skipping copy.")
 
 
-# Ask the user to select the main program directory using a file dialog
-Tk().withdraw()  # Hide the root window
-base_directory = filedialog.askdirectory(title="Select the Main Program Directory")
+# Headless runs (e.g. from batch_scheduler.py) pass the directories on the command line
+args = parse_command_line()
+
+# Otherwise ask the user to select the main program directory using a file dialog
+base_directory = args.base_dir or ask_directory("Select the Main Program Directory")
 
 # Check if a valid directory was chosen
 if not base_directory:
@@ -85,6 +143,10 @@ generated_datasets_path = os.path.join(base_directory, "generated_PC-SAFT_datase
 generated_inp_files_path = os.path.join(base_directory, "generated_inp_files")
 generated_RMSRD_values_path = os.path.join(base_directory, "generated_RMSRD_values")
 pc_saft_folder = base_directory
+if args.workspace:
+    # Separate solver directory so several systems can run at once from the same main directory
+    pc_saft_folder = os.path.abspath(args.workspace)
+    os.makedirs(pc_saft_folder, exist_ok=True)
 executable_path = os.path.join(base_directory, "PC_SAFT_ASD_v2022.12.exe")
 
 # Print paths for verification
@@ -97,6 +159,7 @@ logging.basicConfig(level=logging.INFO)
 
 # Read ranges from the file
 ranges = read_parameter_ranges(ranges_variables_file_path)
+ranges.update(parse_setting_overrides(args.overrides))
 
 # Define ranges for the parameters A, B, C, D, E, F, G, H from the loaded dictionary
 A_range = ranges['A_range']
@@ -107,108 +170,343 @@ E_range = ranges['E_range']
 F_range = ranges['F_range']
 G_range = ranges['G_range']
 H_range = ranges['H_range']
+parameter_bounds = [A_range, B_range, C_range, D_range, E_range, F_range, G_range, H_range]
 
 # Set up the parameters
 num_datasets = ranges.get('num_datasets', 25)  # Default to 25 if not specified
 maxiter = ranges.get('maxiter', 25)  # Default to 25 if not specified
+num_workers = ranges.get('num_workers', os.cpu_count() or 1)  # Default to one worker per core
+solver_timeout = ranges.get('solver_timeout', 600)  # Seconds before a hung PC-SAFT run is killed
+failed_evaluation_penalty = ranges.get('failed_evaluation_penalty', 1.0e4)  # RMSRD used for failed runs
+objective_only_mode = ranges.get('objective_only_mode', True)  # Trim SLE/LLE work during optimization
+pc_saft_backend = ranges.get('pc_saft_backend', 'executable')  # 'executable' or 'native' (NumPy PC-SAFT)
+archive_inp_files = ranges.get('archive_inp_files', False)  # Keep every rendered .inp in generated_inp_files
+sampling_method = ranges.get('sampling_method', 'sobol')  # 'sobol', 'lhs' or 'uniform'
+sampling_seed = ranges.get('sampling_seed', None)  # Set for a reproducible design
+sampling_batch_size = ranges.get('sampling_batch_size', num_datasets)  # Datasets drawn and evaluated per batch
+max_random_evaluations = ranges.get('max_random_evaluations', num_datasets)  # Budget for the random search
+target_rmsrd = ranges.get('target_rmsrd', None)  # Stop drawing batches once this RMSRD is reached
+surrogate_evaluations = ranges.get('surrogate_evaluations', 0)  # Extra solver runs proposed by a surrogate model (0 = off)
+surrogate_model = ranges.get('surrogate_model', 'gp')  # 'gp' (Gaussian process) or 'rbf'
+surrogate_batch_size = ranges.get('surrogate_batch_size', num_workers)  # Points proposed per surrogate batch
+optimizer_method = ranges.get('optimizer_method', 'nelder-mead')  # 'nelder-mead', 'parallel-nelder-mead', 'parallel-simplex', 'least-squares', 'cma-es', 'differential-evolution'
+least_squares_method = ranges.get('least_squares_method', 'trf')  # 'trf' or 'dogbox' (both respect the ranges)
+jacobian_scheme = ranges.get('jacobian_scheme', 'forward')  # 'forward' (8 runs per Jacobian) or 'central' (16)
+speculative_simplex = ranges.get('speculative_simplex', True)  # 'parallel-nelder-mead': evaluate all follow-up candidates at once (~2.7x the solver runs)
+bounded_simplex = ranges.get('bounded_simplex', True)  # Nelder-Mead on transformed A..H (False = clamp and penalty)
+bound_transform = ranges.get('bound_transform', 'sine')  # 'sine' or 'logit' map from the ranges to unit scale
+population_size = ranges.get('population_size', None)  # Points per generation (None = method default, rounded up to a multiple of num_workers)
+population_restarts = ranges.get('population_restarts', 2)  # Restarts with a doubled population after a run converges
+population_max_evaluations = ranges.get('population_max_evaluations', None)  # Cap on solver runs for 'cma-es' / 'differential-evolution' (maxiter counts generations)
+max_optimizer_evaluations = ranges.get('max_optimizer_evaluations', None)  # Stop the optimizer after this many runs
+max_optimizer_seconds = ranges.get('max_optimizer_seconds', None)  # Stop the optimizer after this wall-clock time
+plateau_window = ranges.get('plateau_window', 0)  # Evaluations over which the best RMSRD must improve (0 = off)
+plateau_tolerance = ranges.get('plateau_tolerance', 1e-3)  # Relative improvement below which the run has stalled
+optimizer_target_rmsrd = ranges.get('optimizer_target_rmsrd', None)  # Stop the optimizer once this RMSRD is reached
+campaign_max_evaluations = ranges.get('campaign_max_evaluations', None)  # Optimizer runs shared by all selected folders
+campaign_max_seconds = ranges.get('campaign_max_seconds', None)  # Optimizer time shared by all selected folders
+sensitivity_screening = ranges.get('sensitivity_screening', None)  # 'morris' or 'sobol' to freeze insensitive parameters
+screening_trajectories = ranges.get('screening_trajectories', 10)  # Morris trajectories (9 runs each)
+screening_levels = ranges.get('screening_levels', 4)  # Grid levels per parameter for the Morris trajectories
+freeze_threshold = ranges.get('freeze_threshold', 0.1)  # Freeze parameters below this fraction of the largest index
+warm_start_library = ranges.get('warm_start_library', 'pc_saft_library.sqlite')  # Fitted systems to seed from (None = off)
+warm_start_neighbours = ranges.get('warm_start_neighbours', 0)  # Most similar fitted systems seeding a new one (0 = off)
+warm_start_radius = ranges.get('warm_start_radius', 0.1)  # First-batch points within this fraction of each range
+warm_start_max_rmsrd = ranges.get('warm_start_max_rmsrd', None)  # Only seed from fits with an RMSRD up to this
+store_results = ranges.get('store_results', True)  # Keep every calculated curve in <name>_step1_results.npz
+use_results_database = ranges.get('use_results_database', True)  # Record every evaluation in pc_saft_results.sqlite
+write_dataset_files = ranges.get('write_dataset_files', False)  # One <name>_datasetN.txt per random dataset
+write_rmsrd_lines = ranges.get('write_rmsrd_lines', False)  # One line per evaluated dataset in <name>_RMSRD_values.txt
+checkpoint_interval = ranges.get('checkpoint_interval', 60)  # Seconds between checkpoint writes
+distributed_port = ranges.get('distributed_port', 0)  # Coordinate remote workers on this port (0 = run locally)
+distributed_host = ranges.get('distributed_host', '127.0.0.1')  # Interface the coordinator listens on ('0.0.0.0' for all)
+remote_token = ranges.get('remote_token')  # Shared token remote workers must present (default: PC_SAFT_REMOTE_TOKEN)
+remote_slots = ranges.get('remote_slots', num_workers)  # Concurrent evaluations handed to remote workers
+remote_max_retries = ranges.get('remote_max_retries', 2)  # Times an evaluation is requeued after losing its worker
+remote_heartbeat_timeout = ranges.get('remote_heartbeat_timeout', 30)  # Seconds without heartbeat before a worker is dropped
+remote_wait_timeout = ranges.get('remote_wait_timeout', 600)  # Seconds evaluations wait with no worker connected before they fail
+trace_evaluations = ranges.get('trace_evaluations', True)  # Timing of every evaluation in <name>_step1_trace.jsonl
+multistart_count = ranges.get('multistart_count', 1)  # Number of best random datasets refined in parallel
+multistart_dominance_ratio = ranges.get('multistart_dominance_ratio', 1.5)  # Cancel starts this much worse than the best
+multistart_min_evaluations = ranges.get('multistart_min_evaluations', 20)  # Evaluations before a start can be cancelled
+
+# Persistent evaluation cache shared by Step 1 and Step 2 (set use_cache = False to disable)
+evaluation_cache = None
+if ranges.get('use_cache', True) and pc_saft_backend == 'executable':
+    evaluation_cache = open_evaluation_cache(base_directory, executable_path, ranges.get('cache_max_mb', 512))
+
+# One results database per campaign; per-file output is opt-in (write_dataset_files, write_rmsrd_lines)
+results_database = open_results_database(base_directory) if use_results_database else None
+
+# Library of fitted systems: every result is recorded, similar systems seed the next ones (warm_start.py)
+solution_library = open_warm_start_library(base_directory, warm_start_library) if warm_start_library else None
+
+# Optimizer budget shared by every selected folder (campaign_max_evaluations, campaign_max_seconds)
+campaign_budget = CampaignBudget(campaign_max_evaluations, campaign_max_seconds)
+
+# Distributed mode: this process keeps the optimizers, remote workers (remote_workers.py) run the executable
+remote_coordinator = None
+if distributed_port and pc_saft_backend == 'executable':
+    remote_coordinator = WorkerCoordinator(distributed_host, distributed_port, remote_heartbeat_timeout,
+                                           remote_max_retries, remote_wait_timeout, remote_token)
+
+
+# Function to start the evaluation pool: local worker sandboxes, or slots served by the remote workers
+def open_evaluation_pool():
+    if remote_coordinator is not None:
+        return RemoteEvaluationPool(remote_coordinator, pc_saft_folder, remote_slots)
+    return EvaluationPool(pc_saft_folder, executable_path, num_workers)
 
 
 # Step 1: Generate random datasets
-def generate_random_datasets(num_datasets=num_datasets):
+def generate_random_datasets(num_datasets=num_datasets, first_index=1, design=None):
+    # The whole design matrix comes from one sampler call (Sobol, LHS or uniform) unless given (warm start)
+    if design is None:
+        design = parameter_sampler.next_batch(num_datasets)
+
     datasets = []
-    for i in range(1, num_datasets + 1):
-        A = random.uniform(*A_range)
-        B = random.uniform(*B_range)
-        C = random.uniform(*C_range)
-        D = random.uniform(*D_range)
-        E = random.uniform(*E_range)
-        F = random.uniform(*F_range)
-        G = random.uniform(*G_range)
-        H = random.uniform(*H_range)
-        dataset = {'A': A, 'B': B, 'C': C, 'D': D, 'E': E, 'F': F, 'G': G, 'H': H}
+    for i, row in enumerate(design, start=first_index):
+        dataset = {name: float(value) for name, value in zip(PARAMETER_NAMES, row)}
         datasets.append(dataset)
 
-        # Save dataset to file
-        dataset_file = os.path.join(generated_datasets_path, f"{drug_polymer_name}_dataset{i}.txt")
-        with open(dataset_file, "w") as f:
-            f.write(f"A: {A}\nB: {B}\nC: {C}\nD: {D}\nE: {E}\nF: {F}\nG: {G}\nH: {H}\n")
+        # Save dataset to file (opt-in; every evaluation is in the results database anyway)
+        if write_dataset_files:
+            dataset_file = os.path.join(generated_datasets_path, f"{drug_polymer_name}_dataset{i}.txt")
+            with open(dataset_file, "w") as f:
+                f.write("".join(f"{name}: {value}\n" for name, value in dataset.items()))
     return datasets
 
 
 # Step 2: Create .inp file
-def create_inp_file(dataset, file_index):
-    template_path = os.path.join(pc_saft_folder, "Input_ASD_template.inp")
-    with open(template_path, "r") as template_file:
-        content = template_file.read()
-
-    # Replace placeholders in template with dataset values
-    content = content.replace("A*", str(dataset['A']))
-    content = content.replace("B*", str(dataset['B']))
-    content = content.replace("C*", str(dataset['C']))
-    content = content.replace("D*", str(dataset['D']))
-    content = content.replace("E*", str(dataset['E']))
-    content = content.replace("F*", str(dataset['F']))
-    content = content.replace("G*", str(dataset['G']))
-    content = content.replace("H*", str(dataset['H']))
-
-    inp_file_path = os.path.join(generated_inp_files_path,
-                                 f"{drug_polymer_name}_dataset_{file_index}.inp")  # Updated file name
-    with open(inp_file_path, "w") as inp_file:
-        inp_file.write(content)
+def create_inp_file(dataset, file_index, objective_only=False, work_folder=None):
+    if work_folder is None:
+        work_folder = pc_saft_folder
+
+    with tracer.stage('render'):
+        # Objective evaluations only need the SLE points at the experimental temperatures (no full curve, no LLE)
+        template = objective_template if objective_only else full_template
+        content = template.render(dataset)
+
+        # Render straight into the solver's working input
+        inp_file_path = os.path.join(work_folder, "Input_ASD.inp")
+        with open(inp_file_path, "w") as inp_file:
+            inp_file.write(content)
+
+        # Keep a copy in generated_inp_files only when asked for
+        if archive_inp_files:
+            archive_path = os.path.join(generated_inp_files_path, f"{drug_polymer_name}_dataset_{file_index}.inp")
+            with open(archive_path, "w") as archive_file:
+                archive_file.write(content)
 
     return inp_file_path
 
 
 # Step 3: Run PC-SAFT
-def run_pc_saft(inp_file_path):
-    shutil.copy(inp_file_path, pc_saft_folder)
-    target_inp_file = os.path.join(pc_saft_folder, "Input_ASD.inp")
-
-    if os.path.exists(target_inp_file):
-        os.remove(target_inp_file)
-
-    os.rename(os.path.join(pc_saft_folder, os.path.basename(inp_file_path)), target_inp_file)
-
-    calc_data_file = os.path.join(pc_saft_folder, "Calc_data_SLE.dat")
-    if os.path.exists(calc_data_file):
-        os.remove(calc_data_file)
-
-    subprocess.run([executable_path], cwd=pc_saft_folder)
-
-    while not os.path.exists(calc_data_file):
-        time.sleep(1)
+def run_pc_saft(inp_file_path, work_folder=None, executable=None, dataset=None, objective_only=False):
+    # Default to the shared folder; pool workers pass their own scratch directory and executable copy
+    if work_folder is None:
+        work_folder = pc_saft_folder
+    if executable is None:
+        executable = RemoteSolver(remote_coordinator) if remote_coordinator is not None else executable_path
+
+    # Inputs rendered by create_inp_file are already in place; anything else is copied in
+    with tracer.stage('stage_files'):
+        target_inp_file = os.path.join(work_folder, "Input_ASD.inp")
+        if os.path.abspath(inp_file_path) != os.path.abspath(target_inp_file):
+            shutil.copyfile(inp_file_path, target_inp_file)
+
+        calc_data_file = os.path.join(work_folder, "Calc_data_SLE.dat")
+        if os.path.exists(calc_data_file):
+            os.remove(calc_data_file)
+
+    # The NumPy backend reads the same Input_ASD.inp and writes a compatible Calc_data_SLE.dat
+    if pc_saft_backend == 'native':
+        with tracer.stage('solver'):
+            return run_native(work_folder)
+
+    # Reuse the stored output if this system was already evaluated at these parameters against the same
+    # experimental data (a cached full run also answers an objective-only one)
+    cache_key = None
+    if evaluation_cache is not None:
+        exp_data_file = os.path.join(work_folder, "Exp_data_SLE.dat")
+        with tracer.stage('cache'):
+            cache_key, cache_hit = restore_cached_output(
+                evaluation_cache, target_inp_file, exp_data_file, calc_data_file,
+                full_template.render(dataset) if dataset is not None else None, objective_only)
+        if cache_hit:
+            tracer.note(status='cached')
+            return calc_data_file
+
+    # The process exit is the completion signal; hung or failed runs raise SolverError
+    timings = {}
+    try:
+        if isinstance(executable, RemoteSolver):
+            # Distributed mode: a remote worker runs the executable on the files prepared here
+            calc_data_file = executable.run(work_folder, timeout=solver_timeout, timings=timings)
+        else:
+            calc_data_file = run_solver(executable, work_folder, timeout=solver_timeout, timings=timings)
+    finally:
+        for stage_name, seconds in timings.items():
+            tracer.add_stage(stage_name, seconds)
+
+    if cache_key is not None:
+        with tracer.stage('cache'):
+            try:
+                rmsrd_value = extract_rmsrd(calc_data_file)
+            except ValueError:
+                rmsrd_value = None
+            store_output(evaluation_cache, cache_key, calc_data_file, rmsrd_value)
 
     return calc_data_file
 
 
 # Step 4: Extract RMSRD
 def extract_rmsrd(calc_data_file):
-    with open(calc_data_file, 'r') as file:
-        for line in file:
-            # Check if the line starts with "# RMSRD/%"
-            if line.strip().startswith("# RMSRD/%"):
-                # Split the line into components
-                target_line = line.strip().split()
-                logging.info(f"Found RMSRD line: {target_line}")
+    rmsrd_value = output_rmsrd(parse_calc_output(calc_data_file))
+    logging.info(f"Found RMSRD {rmsrd_value} in {calc_data_file}")
+    return rmsrd_value
 
-                # Check if there's enough content and that the value is numeric
-                if len(target_line) > 3 and target_line[2].replace('.', '', 1).isdigit():
-                    rmsrd_value = float(target_line[2])
-                    return rmsrd_value if np.isfinite(rmsrd_value) else float('inf')
 
-    raise ValueError("RMSRD value not found or is not valid.")
+# Function to append one evaluation of the current run (and phase) to the results database
+def record_evaluation(dataset_index, params, rmsrd_value, status, wall_time, error=None):
+    if results_database is not None:
+        results_database.add_evaluation(run_id, evaluation_phase, dataset_index, params, rmsrd_value, status,
+                                        wall_time, error)
 
 
-# Step 5: Save RMSRD values to a file
-def save_rmsrd_to_file(dataset, rmsrd_value, file_index, rmsrd_file_path):
+# Function to record an evaluation answered by the checkpoint (no solver time) in the resumed run
+def record_replayed(dataset_index, params, recorded):
+    if isinstance(recorded, Exception):
+        record_evaluation(dataset_index, params, None, 'failed', 0.0, str(recorded))
+    else:
+        record_evaluation(dataset_index, params, recorded[0], 'ok', 0.0)
+
+
+# Function to evaluate one dataset: returns the RMSRD and the calculated solubility at the experimental
+# temperatures; evaluations recorded in the checkpoint are not run again
+def evaluate_point(dataset, file_index, work_folder=None, executable=None):
+    params = [dataset[name] for name in PARAMETER_NAMES]
+    recorded = checkpoint.lookup(params)
+    if recorded is not None:
+        record_replayed(file_index, params, recorded)
+    if isinstance(recorded, Exception):
+        raise recorded
+    if recorded is not None:
+        return recorded
+
+    start_time = time.perf_counter()
+    with tracer.evaluation(evaluation_phase, file_index):
+        inp_file_path = create_inp_file(dataset, file_index, objective_only_mode, work_folder)
+        try:
+            calc_data_file = run_pc_saft(inp_file_path, work_folder, executable, dataset, objective_only_mode)
+            with tracer.stage('parse'):
+                calc_output = parse_calc_output(calc_data_file)
+                rmsrd_value = output_rmsrd(calc_output)
+        except (SolverError, ValueError) as e:
+            with tracer.stage('record'):
+                checkpoint.record(params, e)
+                record_evaluation(file_index, params, None, 'failed', time.perf_counter() - start_time, str(e))
+            raise
+        with tracer.stage('parse'):
+            w_calc = calculated_at_temperatures(calc_output, exp_temperatures)
+        with tracer.stage('record'):
+            checkpoint.record(params, (rmsrd_value, w_calc))
+            record_evaluation(file_index, params, rmsrd_value, 'ok', time.perf_counter() - start_time)
+            if results_store is not None:
+                results_store.add(params, rmsrd_value, calc_output)
+    return rmsrd_value, w_calc
+
+
+# Function to compute the RMSRD of one dataset
+def evaluate_rmsrd(dataset, file_index, work_folder=None, executable=None):
+    return evaluate_point(dataset, file_index, work_folder, executable)[0]
+
+
+# Function to compute the least-squares residual vector of one parameter set (its norm is the RMSRD)
+def evaluate_residuals(params, work_folder=None, executable=None):
+    try:
+        rmsrd_value, w_calc = evaluate_point(dict(zip(PARAMETER_NAMES, params)), 1, work_folder, executable)
+    except (SolverError, ValueError) as e:
+        logging.error(f"Failed evaluation, using penalty RMSRD={failed_evaluation_penalty}: {e}")
+        return scaled_residuals([], exp_solubilities, None, failed_evaluation_penalty)
+    return scaled_residuals(w_calc, exp_solubilities, rmsrd_value, failed_evaluation_penalty)
+
+
+# Function to evaluate one random dataset inside a pool worker's scratch directory
+def evaluate_dataset_in_worker(item, worker_folder, worker_executable):
+    index, dataset = item
+    try:
+        return evaluate_rmsrd(dataset, index, worker_folder, worker_executable)
+    except (SolverError, ValueError) as e:
+        return e
+
+
+# Function to score all random datasets with the native backend in one vectorized call
+def evaluate_datasets_native(datasets):
+    params = np.array([[dataset[name] for name in PARAMETER_NAMES] for dataset in datasets])
+    results = [checkpoint.lookup(row) for row in params]
+    missing = [i for i, result in enumerate(results) if result is None]
+    for i, result in enumerate(results):
+        if result is not None:
+            record_replayed(None, params[i], result)
+    if missing:
+        # Traced as one evaluation of len(missing) points
+        with tracer.evaluation(evaluation_phase, points=len(missing)):
+            start_time = time.perf_counter()
+            with tracer.stage('solver'):
+                rmsrd_values, w_calc = evaluate_batch(full_template.content,
+                                                      os.path.join(pc_saft_folder, "Exp_data_SLE.dat"),
+                                                      params[missing], return_solubility=True)
+            wall_time = (time.perf_counter() - start_time) / len(missing)
+            with tracer.stage('record'):
+                for i, value, w_row in zip(missing, rmsrd_values, w_calc):
+                    if np.isfinite(value):
+                        results[i] = (float(value), w_row)
+                        record_evaluation(None, params[i], value, 'ok', wall_time)
+                    else:
+                        results[i] = ValueError("Native PC-SAFT backend did not converge")
+                        record_evaluation(None, params[i], None, 'failed', wall_time, str(results[i]))
+                    checkpoint.record(params[i], results[i])
+                    if results_store is not None:
+                        results_store.add(params[i], value, w_calc=w_row)
+    return [result[0] if isinstance(result, tuple) else result for result in results]
+
+
+# Function to score surrogate-proposed and screening points like random datasets (failed runs get the penalty RMSRD)
+def evaluate_surrogate_points(points):
+    global evaluated_datasets
+    indexed_datasets = [(index, {name: float(value) for name, value in zip(PARAMETER_NAMES, point)})
+                        for index, point in enumerate(points, start=evaluated_datasets + 1)]
+    evaluated_datasets += len(indexed_datasets)
+
+    if pc_saft_backend == 'native':
+        rmsrd_results = evaluate_datasets_native([dataset for _, dataset in indexed_datasets])
+    else:
+        rmsrd_results = pool.map(evaluate_dataset_in_worker, indexed_datasets)
+
+    values = []
+    for (index, dataset), rmsrd_value in zip(indexed_datasets, rmsrd_results):
+        if isinstance(rmsrd_value, Exception):
+            logging.error(rmsrd_value)
+            rmsrd_value = failed_evaluation_penalty
+        values.append(rmsrd_value)
+    if write_rmsrd_lines:
+        save_rmsrd_to_file([(index, dataset, value) for (index, dataset), value in zip(indexed_datasets, values)],
+                           rmsrd_file_path)
+    return values
+
+
+# Step 5: Save RMSRD values of a batch of (index, dataset, rmsrd) entries to a file in one write
+def save_rmsrd_to_file(entries, rmsrd_file_path):
     with open(rmsrd_file_path, "a") as f:
-        f.write(f"Dataset {file_index}: A={dataset['A']}, B={dataset['B']}, C={dataset['C']}, "
-                f"D={dataset['D']}, E={dataset['E']}, F={dataset['F']}, G={dataset['G']}, H={dataset['H']} => RMSRD={rmsrd_value}\n")
+        f.write("".join(f"Dataset {file_index}: A={dataset['A']}, B={dataset['B']}, C={dataset['C']}, "
+                        f"D={dataset['D']}, E={dataset['E']}, F={dataset['F']}, G={dataset['G']}, H={dataset['H']} "
+                        f"=> RMSRD={rmsrd_value}\n" for file_index, dataset, rmsrd_value in entries))
 
 
 # Step 6: Optimize parameters using Nelder-Mead method with boundary constraints
-def optimize_parameters(initial_guess):
-    def objective_function(params):
+def optimize_parameters(initial_guess, work_folder=None, executable=None, monitor=None, pool=None):
+    def objective_function(params, work_folder=work_folder, executable=executable):
         # Enforce boundaries by adding a penalty for out-of-bounds parameters
         penalty = 0.0
         bounded_params = []
@@ -239,12 +537,17 @@ def optimize_parameters(initial_guess):
             'H': bounded_params[7]
         }
 
-        # Create .inp file for the current parameters
-        inp_file_path = create_inp_file(dataset, 1)  # Just use file index 1 for optimization
-        calc_data_file = run_pc_saft(inp_file_path)
+        # Get the RMSRD value (file index 1 for optimization); failed or timed-out runs get a finite penalty so
+        # the optimizer can carry on
+        try:
+            rmsrd_value = evaluate_rmsrd(dataset, 1, work_folder, executable)
+        except (SolverError, ValueError) as e:
+            logging.error(f"Failed evaluation, using penalty RMSRD={failed_evaluation_penalty}: {e}")
+            rmsrd_value = failed_evaluation_penalty
 
-        # Get the RMSRD value
-        rmsrd_value = extract_rmsrd(calc_data_file)
+        # Multi-start runs track every evaluation (and may cancel a dominated start from here)
+        if monitor is not None:
+            monitor(bounded_params, rmsrd_value + penalty)
 
         # Return the RMSRD with the penalty for out-of-bound values
         return rmsrd_value + penalty
@@ -261,53 +564,276 @@ def optimize_parameters(initial_guess):
         np.clip(initial_guess[7], *H_range)
     ]
 
-    result = minimize(objective_function, bounded_initial_guess, method='Nelder-Mead', options={'maxiter': maxiter})
+    # Simplex candidates evaluated concurrently, one worker sandbox per point
+    def batch_objective(points):
+        return pool.map(lambda params, folder, exe: objective_function(params, folder, exe), points)
+
+    # Per-point residuals with bounded trust-region steps; each Jacobian is one batch on the pool
+    def residual_function(params, work_folder=work_folder, executable=executable):
+        residuals = evaluate_residuals(params, work_folder, executable)
+        if monitor is not None:
+            monitor(params, float(np.linalg.norm(residuals)))
+        return residuals
+
+    def batch_residuals(points):
+        if pool is None:
+            return [residual_function(params) for params in points]
+        return pool.map(lambda params, folder, exe: residual_function(params, folder, exe), points)
+
+    # Progress of the population methods: one line per generation in the RMSRD values file
+    def report_generation(record):
+        with open(rmsrd_file_path, "a") as f:
+            f.write(format_generation(optimizer_method, record))
+
+    # The stopping criteria see every objective call in physical units (outside the bounded transform) and end
+    # the run by raising StopOptimization; the best point evaluated so far is then the result. Parameters frozen
+    # by the sensitivity screening keep their starting values, the optimizers only see the free ones.
+    subspace = ParameterSubspace(bounded_initial_guess, free_parameters)
+    simplex_objective = subspace.wrap(stopping_policy.checked(objective_function))
+    simplex_batch_objective = subspace.wrap_batch(stopping_policy.checked(batch_objective, batch=True))
+    start, bounds = subspace.reduce(bounded_initial_guess), subspace.reduce(parameter_bounds)
+    try:
+        stopping_policy.check()  # Earlier systems may have spent the campaign budget
+
+        # Every objective call is traced as one optimizer step, to separate the optimizer's own time from PC-SAFT's
+        if optimizer_method == 'least-squares':
+            checked_residuals = subspace.wrap_batch(stopping_policy.checked(
+                batch_residuals, batch=True, value=lambda residuals: float(np.linalg.norm(residuals))))
+            result = parallel_least_squares(tracer.traced_objective(checked_residuals, optimizer_method, batch=True),
+                                            start, bounds, maxiter, least_squares_method,
+                                            central=(jacobian_scheme == 'central'))
+        elif optimizer_method in POPULATION_METHODS:
+            # Global search over the ranges: every generation is one batch on the pool; maxiter counts generations,
+            # population_max_evaluations caps the solver runs
+            result = population_optimize(
+                tracer.traced_objective(simplex_batch_objective, optimizer_method, batch=True), bounds, start,
+                optimizer_method, population_size, maxiter, population_restarts, run_seed, pool.num_workers,
+                callback=report_generation, max_evaluations=population_max_evaluations)
+        else:
+            # With bounded_simplex the simplex lives in the internal coordinates of the transform, so every vertex
+            # is a distinct in-range parameter set and A..H move on the same scale
+            # A warm start sizes the initial simplex by the spread of the similar systems' solutions
+            initial_simplex = None
+            if simplex_steps is not None:
+                initial_simplex = steps_simplex(start, subspace.reduce(simplex_steps), bounds)
+            if bounded_simplex:
+                transform = BoundedTransform(bounds, bound_transform)
+                simplex_objective = transform.wrap(simplex_objective)
+                simplex_batch_objective = transform.wrap_batch(simplex_batch_objective)
+                if initial_simplex is None:
+                    initial_simplex = transform.initial_simplex(start)
+                else:
+                    initial_simplex = np.array([transform.to_internal(vertex) for vertex in initial_simplex])
+                start = transform.to_internal(start)
+
+            if optimizer_method in PARALLEL_METHODS and pool is not None:
+                result = parallel_nelder_mead(
+                    tracer.traced_objective(simplex_batch_objective, optimizer_method, batch=True), start, maxiter,
+                    pool.num_workers, PARALLEL_METHODS[optimizer_method], initial_simplex=initial_simplex,
+                    speculate=speculative_simplex)
+            else:
+                result = minimize(tracer.traced_objective(simplex_objective, 'nelder-mead'), start,
+                                  method='Nelder-Mead', options={'maxiter': maxiter, 'initial_simplex': initial_simplex})
+            if bounded_simplex:
+                result.x = transform.to_external(result.x)
+        result.x = subspace.expand(result.x)
+    except StopOptimization:
+        if monitor is not None:
+            raise  # Multi-start reports the start as stopped and keeps its best point
+        result = stopping_policy.best_result(bounded_initial_guess)
     logging.info(f"Optimization result: {result}")
+
+    # A multi-start run ends when all its starts have, see the main loop
+    if monitor is None:
+        stopping_policy.finish(result.message)
     return result.x  # Return the optimized parameters
 
 
 # Main process
-selected_drug_polymer_folders = select_drug_polymer_folders(pc_saft_folder)
+selected_drug_polymer_folders = args.folders or select_drug_polymer_folders(pc_saft_folder)
 
 for folder in selected_drug_polymer_folders:
     copy_template_and_exp_data_files(folder)
     drug_polymer_name = read_drug_polymer_name(os.path.join(folder, "Input_ASD_template.inp"))
 
+    # Compile the template once per system: full input for the final run, trimmed input for the optimizer
+    full_template = CompiledTemplate.from_file(os.path.join(pc_saft_folder, "Input_ASD_template.inp"))
+    objective_template = full_template.objective_only(
+        read_experimental_temperatures(os.path.join(pc_saft_folder, "Exp_data_SLE.dat")))
+
     # Display the parameters to the user
     print(f"Starting optimization for drug_polymer: {drug_polymer_name}")
-    print(f"Number of randomly generated datasets: {num_datasets}")
+    print(f"Number of randomly generated datasets: {max_random_evaluations} "
+          f"(batches of {sampling_batch_size}, {sampling_method} sampling)")
     print(f"Maximum number of iterations for optimization: {maxiter}\n")
 
-    datasets = generate_random_datasets(num_datasets)
-
     rmsrd_file_path = os.path.join(generated_RMSRD_values_path, f"{drug_polymer_name}_RMSRD_values.txt")
 
-    # Clear the RMSRD values file
-    with open(rmsrd_file_path, "w") as f:
-        f.write("RMSRD values for generated datasets:\n")
+    # Every finished evaluation is journaled; --resume replays the journal instead of re-running the solver
+    checkpoint = open_checkpoint(os.path.join(base_directory, "checkpoints", f"{drug_polymer_name}_step1.pkl"),
+                                 args.resume, checkpoint_interval)
+
+    # Columnar archive of every evaluated curve, for re-scoring with other objectives (see results_store.py)
+    exp_temperatures, exp_solubilities = read_exp_data(os.path.join(pc_saft_folder, "Exp_data_SLE.dat"))
+    results_store = None
+    if store_results:
+        results_store = ResultsStore(
+            os.path.join(generated_RMSRD_values_path, f"{drug_polymer_name}_step1_results.npz"),
+            exp_temperatures, exp_solubilities)
+    run_seed = checkpoint_seed(checkpoint, 'sampling_seed', sampling_seed)
+
+    # Register this system's run; evaluations are tagged with the phase they belong to
+    run_id = results_database.start_run(drug_polymer_name, 1, ranges) if results_database is not None else None
+    evaluation_phase = 'random'
+
+    # Timing breakdown of every evaluation and optimizer step (JSON lines, see evaluation_trace.py)
+    tracer = EvaluationTracer(
+        os.path.join(generated_RMSRD_values_path, f"{drug_polymer_name}_step1_trace.jsonl") if trace_evaluations
+        else None, drug_polymer_name, 1)
+
+    # Start the RMSRD values file; a resumed run keeps the interrupted run's lines and appends the replayed ones
+    if checkpoint.resumed:
+        with open(rmsrd_file_path, "a") as f:
+            f.write(f"\nResumed from checkpoint ({len(checkpoint.evaluations)} recorded evaluations), "
+                    f"RMSRD values for generated datasets:\n")
+    else:
+        with open(rmsrd_file_path, "w") as f:
+            f.write("RMSRD values for generated datasets:\n")
 
     best_rmsrd_value = float('inf')
     best_parameters = None
 
-    for index, dataset in enumerate(datasets, start=1):
-        inp_file_path = create_inp_file(dataset, index)
-        calc_data_file = run_pc_saft(inp_file_path)
+    random_results = []
+
+    # Evaluate random datasets concurrently, one scratch directory per worker
+    pool = open_evaluation_pool()
+
+    # Warm start: the most similar systems fitted so far propose the first batch and size the initial simplex
+    system_descriptor_values = system_descriptors(os.path.join(pc_saft_folder, "Input_ASD_template.inp"))
+    neighbours = []
+    if solution_library is not None and warm_start_neighbours > 0:
+        neighbours = solution_library.nearest(system_descriptor_values, warm_start_neighbours, warm_start_max_rmsrd)
+    first_design, simplex_steps = None, None
+    if neighbours:
+        first_design = warm_start_design(neighbours, parameter_bounds,
+                                         min(sampling_batch_size, max_random_evaluations), warm_start_radius, run_seed)
+        simplex_steps = warm_start_steps(neighbours, parameter_bounds)
+        with open(rmsrd_file_path, "a") as f:
+            f.write(format_neighbours(neighbours))
+
+    # Draw batches from the sampler until the evaluation budget or the target RMSRD is reached
+    parameter_sampler = ParameterSampler(parameter_bounds, sampling_method, run_seed)
+    evaluated_datasets = 0
+    while evaluated_datasets < max_random_evaluations:
+        batch_size = min(sampling_batch_size, max_random_evaluations - evaluated_datasets)
+        datasets = generate_random_datasets(batch_size, evaluated_datasets + 1,
+                                            first_design if evaluated_datasets == 0 else None)
+        indexed_datasets = list(enumerate(datasets, start=evaluated_datasets + 1))
+        evaluated_datasets += batch_size
+
+        with tracer.optimizer_step('random', batch_size):
+            if pc_saft_backend == 'native':
+                rmsrd_results = evaluate_datasets_native(datasets)
+            else:
+                rmsrd_results = pool.map(evaluate_dataset_in_worker, indexed_datasets)
 
-        try:
-            rmsrd_value = extract_rmsrd(calc_data_file)
-            save_rmsrd_to_file(dataset, rmsrd_value, index, rmsrd_file_path)
+        rmsrd_entries = []
+        for (index, dataset), rmsrd_value in zip(indexed_datasets, rmsrd_results):
+            if isinstance(rmsrd_value, Exception):
+                logging.error(rmsrd_value)
+                continue
+
+            rmsrd_entries.append((index, dataset, rmsrd_value))
+            random_results.append((rmsrd_value, [dataset[name] for name in PARAMETER_NAMES]))
 
             # Update best parameters if this RMSRD is the lowest found
             if rmsrd_value < best_rmsrd_value:
                 best_rmsrd_value = rmsrd_value
                 best_parameters = [dataset['A'], dataset['B'], dataset['C'], dataset['D'],
                                    dataset['E'], dataset['F'], dataset['G'], dataset['H']]
-        except ValueError as e:
-            logging.error(e)
 
-    # Optimize parameters using the best dataset
-    optimized_parameters = optimize_parameters(best_parameters)
+        if write_rmsrd_lines:
+            save_rmsrd_to_file(rmsrd_entries, rmsrd_file_path)
+
+        logging.info(f"Evaluated {evaluated_datasets}/{max_random_evaluations} datasets ({sampling_method}), "
+                     f"best RMSRD so far {best_rmsrd_value}")
+        if target_rmsrd is not None and best_rmsrd_value <= target_rmsrd:
+            logging.info(f"Target RMSRD {target_rmsrd} reached after {evaluated_datasets} datasets")
+            break
+
+    if best_parameters is None:
+        # Every random dataset failed (e.g. no remote worker connected): there is no point to optimize from
+        pool.close()
+        if remote_coordinator is not None:
+            remote_coordinator.close()
+        raise SystemExit(f"All {evaluated_datasets} random datasets failed for {drug_polymer_name}; see the errors above")
+
+    # Rank A..H by their influence on RMSRD and freeze the insensitive ones at their best values: Sobol indices
+    # from the random samples cost no runs, Morris trajectories are one extra batch
+    free_parameters = np.ones(len(PARAMETER_NAMES), dtype=bool)
+    if sensitivity_screening is not None:
+        if sensitivity_screening not in SCREENING_METHODS:
+            raise ValueError(f"Unknown sensitivity screening '{sensitivity_screening}', expected one of "
+                             f"{', '.join(SCREENING_METHODS)}")
+        if sensitivity_screening == 'morris':
+            evaluation_phase = 'screening'
+            screening = screen_morris(tracer.traced_objective(evaluate_surrogate_points, 'screening', batch=True),
+                                      parameter_bounds, screening_trajectories, screening_levels, run_seed,
+                                      freeze_threshold)
+            random_results.extend(zip(screening.y.tolist(), screening.X.tolist()))
+            if screening.fun < best_rmsrd_value:
+                best_rmsrd_value = screening.fun
+                best_parameters = list(screening.x)
+        else:
+            screening = screen_samples([parameters for _, parameters in random_results],
+                                       [rmsrd_value for rmsrd_value, _ in random_results], parameter_bounds,
+                                       freeze_threshold)
+        free_parameters = screening.free
+        with open(rmsrd_file_path, "a") as f:
+            f.write("\n" + format_screening_table(screening, PARAMETER_NAMES))
+
+    if surrogate_evaluations > 0:
+        evaluation_phase = 'surrogate'
+        # Let a surrogate fitted to all evaluations so far propose further batches, then refine locally as usual
+        num_random_results = len(random_results)
+        surrogate_result = surrogate_optimize(tracer.traced_objective(evaluate_surrogate_points, 'surrogate',
+                                                                      batch=True), parameter_bounds,
+                                              [parameters for _, parameters in random_results],
+                                              [rmsrd_value for rmsrd_value, _ in random_results],
+                                              surrogate_evaluations, surrogate_batch_size, surrogate_model,
+                                              run_seed, target_rmsrd)
+        random_results.extend(zip(surrogate_result.y[num_random_results:].tolist(),
+                                  surrogate_result.X[num_random_results:].tolist()))
+        if surrogate_result.fun < best_rmsrd_value:
+            best_rmsrd_value = surrogate_result.fun
+            best_parameters = list(surrogate_result.x)
+
+    evaluation_phase = 'optimizer'
+    stopping_policy = StoppingPolicy(max_optimizer_evaluations, max_optimizer_seconds, plateau_window,
+                                     plateau_tolerance, optimizer_target_rmsrd, campaign_budget)
+    if multistart_count > 1 and optimizer_method in POPULATION_METHODS:
+        logging.warning(f"multistart_count is ignored with optimizer_method '{optimizer_method}'; its population "
+                        f"already spreads over the workers")
+    if multistart_count > 1 and optimizer_method not in POPULATION_METHODS:
+        # Refine the k best random datasets at the same time, each start in its own worker sandbox
+        top_starts = sorted(random_results, key=lambda result: result[0])[:multistart_count]
+        multistart_results = run_multistart(optimize_parameters, top_starts, pool,
+                                            multistart_dominance_ratio, multistart_min_evaluations)
+        with open(rmsrd_file_path, "a") as f:
+            f.write("\n" + format_multistart_table(multistart_results, PARAMETER_NAMES))
+        optimized_parameters = multistart_results[0]['parameters']
+        if optimized_parameters is None:
+            # No start got to evaluate anything: fall back to the best random dataset
+            optimized_parameters = stopping_policy.best_result(best_parameters).x
+        stopping_policy.finish("every start finished or was cancelled")
+    else:
+        # Optimize parameters using the best dataset
+        optimized_parameters = optimize_parameters(best_parameters, pool=pool)
+    pool.close()
     logging.info(f"Optimized parameters: {optimized_parameters}")
+    with open(rmsrd_file_path, "a") as f:
+        f.write(f"\nOptimization ended by: {stopping_policy.reason} "
+                f"({stopping_policy.evaluations} evaluations, {stopping_policy.duration:.1f} s)\n")
 
     # Create an .inp file for the optimized parameters and run PC-SAFT
     optimized_dataset = {
@@ -320,11 +846,21 @@ for folder in selected_drug_polymer_folders:
         'G': optimized_parameters[6],
         'H': optimized_parameters[7]
     }
-    optimized_inp_file_path = create_inp_file(optimized_dataset, 1)  # Using index 1 for consistency
-    optimized_calc_data_file = run_pc_saft(optimized_inp_file_path)
-
-    # Extract RMSRD for the optimized parameters
-    optimized_rmsrd_value = extract_rmsrd(optimized_calc_data_file)
+    # Full SLE curve (and LLE if requested in the template) is only computed for the final parameters
+    evaluation_phase = 'final'
+    start_time = time.perf_counter()
+    with tracer.evaluation(evaluation_phase):
+        optimized_inp_file_path = create_inp_file(optimized_dataset, 1)  # Using index 1 for consistency
+        optimized_calc_data_file = run_pc_saft(optimized_inp_file_path, dataset=optimized_dataset)
+
+        # Extract RMSRD for the optimized parameters (the full curve replaces the trimmed one in the archive)
+        with tracer.stage('parse'):
+            optimized_calc_output = parse_calc_output(optimized_calc_data_file)
+            optimized_rmsrd_value = output_rmsrd(optimized_calc_output)
+    record_evaluation(None, optimized_parameters, optimized_rmsrd_value, 'ok', time.perf_counter() - start_time)
+    if results_store is not None:
+        results_store.add(optimized_parameters, optimized_rmsrd_value, optimized_calc_output)
+        results_store.close()
 
     # Write optimized parameters and their RMSRD value to the RMSRD file
     with open(rmsrd_file_path, "a") as f:
@@ -332,3 +868,24 @@ for folder in selected_drug_polymer_folders:
                 f"C={optimized_parameters[2]}, D={optimized_parameters[3]}, E={optimized_parameters[4]}, "
                 f"F={optimized_parameters[5]}, G={optimized_parameters[6]}, H={optimized_parameters[7]} => "
                 f"RMSRD={optimized_rmsrd_value}\n")
+    checkpoint.remove()
+    if results_database is not None:
+        results_database.finish_run(run_id)
+    if solution_library is not None:
+        solution_library.add(drug_polymer_name, system_descriptor_values, optimized_parameters, optimized_rmsrd_value, 1)
+
+    # Where the wall-clock time went: per-stage percentiles, evaluations/s and optimizer overhead
+    timing_summary = tracer.summary()
+    tracer.close()
+    print(timing_summary)
+    with open(rmsrd_file_path, "a") as f:
+        f.write("\n" + timing_summary)
+
+if evaluation_cache is not None:
+    evaluation_cache.close()
+if results_database is not None:
+    results_database.close()
+if solution_library is not None:
+    solution_library.close()
+if remote_coordinator is not None:
+    remote_coordinator.close()
@@ -1,12 +1,29 @@
 import os
-import shutil
-import subprocess
 import time
+import shutil
+import argparse
 import numpy as np
 import logging
 from scipy.optimize import minimize
-from tkinter import Tk
-from tkinter import filedialog
+from solver_runner import run_solver, SolverError
+from evaluation_pool import EvaluationPool
+from remote_workers import WorkerCoordinator, RemoteSolver, RemoteEvaluationPool
+from parallel_nelder_mead import parallel_nelder_mead, PARALLEL_METHODS
+from surrogate_optimizer import surrogate_optimize
+from least_squares_fit import parallel_least_squares
+from population_optimizer import population_optimize, format_generation, POPULATION_METHODS
+from bounded_transform import BoundedTransform
+from stopping_criteria import StoppingPolicy, CampaignBudget, StopOptimization
+from sensitivity_screening import screen_morris, format_screening_table, ParameterSubspace, SCREENING_METHODS
+from warm_start import open_warm_start_library, system_descriptors, warm_start_steps, steps_simplex, format_neighbours
+from checkpoint import open_checkpoint, checkpoint_seed
+from calc_output import parse_calc_output, output_rmsrd, calculated_at_temperatures, scaled_residuals
+from results_store import ResultsStore
+from results_db import open_results_database
+from evaluation_trace import EvaluationTracer
+from evaluation_cache import open_evaluation_cache, restore_cached_output, store_output
+from inp_template import CompiledTemplate, read_experimental_temperatures, PARAMETER_NAMES
+from pc_saft_native import run_native, read_exp_data
 
 
 # Function to read parameter ranges from a file
@@ -35,8 +52,44 @@ def read_drug_polymer_name(template_file_path):
     return drug_polymer_name
 
 
+# Function to parse the command line; without --base-dir the directories are chosen in Tk dialogs
+def parse_command_line():
+    parser = argparse.ArgumentParser(description="Step 2: Nelder-Mead optimization from initial_dataset.txt. "
+                                                 "Run without arguments to choose the directories interactively.")
+    parser.add_argument("--base-dir", help="Main program directory (executable, ranges_variables.txt, output folders)")
+    parser.add_argument("--folder", action="append", dest="folders",
+                        help="drug_polymer folder to process (repeat for several folders)")
+    parser.add_argument("--workspace", help="Directory the solver runs in (default: the main program directory); "
+                                            "give every concurrent run its own workspace")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its checkpoint without repeating solver runs")
+    parser.add_argument("--set", action="append", default=[], dest="overrides", metavar="KEY=VALUE",
+                        help="Override a ranges_variables.txt setting, e.g. --set num_workers=4")
+    return parser.parse_args()
+
+
+# Function to parse KEY=VALUE overrides (values are read like ranges_variables.txt, bare words as strings)
+def parse_setting_overrides(items):
+    overrides = {}
+    for item in items:
+        key, value = item.split('=', 1)
+        try:
+            overrides[key.strip()] = eval(value.strip())
+        except (NameError, SyntaxError):
+            overrides[key.strip()] = value.strip()
+    return overrides
+
+
+# Function to ask for a directory in a Tk dialog (tkinter is only imported for interactive runs)
+def ask_directory(title):
+    from tkinter import Tk, filedialog
+    Tk().withdraw()  # Hide the root window
+    return filedialog.askdirectory(title=title)
+
+
 # Function to select drug_polymer folders
 def select_drug_polymer_folders(base_directory):
+    from tkinter import Tk, filedialog
     Tk().withdraw()  # Close the root window
     selected_folders = []
     while True:
@@ -86,9 +139,11 @@ def read_initial_dataset(file_path):
     return initial_dataset
 
 
-# Ask the user to select the main program directory using a file dialog
-Tk().withdraw()  # Hide the root window
-base_directory = filedialog.askdirectory(title="Select the Main Program Directory")
+# Headless runs (e.g. from batch_scheduler.py) pass the directories on the command line
+args = parse_command_line()
+
+# Otherwise ask the user to select the main program directory using a file dialog
+base_directory = args.base_dir or ask_directory("Select the Main Program Directory")
 
 # Check if a valid directory was chosen
 if not base_directory:
@@ -100,6 +155,10 @@ base_directory = base_directory.rstrip(os.sep) + os.sep
 
 # File paths
 pc_saft_folder = os.path.join(base_directory)
+if args.workspace:
+    # Separate solver directory so several systems can run at once from the same main directory
+    pc_saft_folder = os.path.abspath(args.workspace)
+    os.makedirs(pc_saft_folder, exist_ok=True)
 executable_path = os.path.join(base_directory, "PC_SAFT_ASD_v2022.12.exe")
 generated_inp_files_path = os.path.join(base_directory, "generated_inp_files")
 generated_RMSRD_values_path = os.path.join(base_directory, "generated_RMSRD_values")
@@ -110,99 +169,351 @@ print(f"Executable path: {executable_path}")
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 
+# Optional run settings shared with Step 1 (the parameter ranges are only used by the surrogate search)
+ranges_variables_file_path = os.path.join(base_directory, "ranges_variables.txt")
+settings = read_parameter_ranges(ranges_variables_file_path) if os.path.exists(ranges_variables_file_path) else {}
+settings.update(parse_setting_overrides(args.overrides))
+num_workers = settings.get('num_workers', os.cpu_count() or 1)  # Default to one worker per core
+solver_timeout = settings.get('solver_timeout', 600)  # Seconds before a hung PC-SAFT run is killed
+failed_evaluation_penalty = settings.get('failed_evaluation_penalty', 1.0e4)  # RMSRD used for failed runs
+objective_only_mode = settings.get('objective_only_mode', True)  # Trim SLE/LLE work during optimization
+pc_saft_backend = settings.get('pc_saft_backend', 'executable')  # 'executable' or 'native' (NumPy PC-SAFT)
+archive_inp_files = settings.get('archive_inp_files', False)  # Keep every rendered .inp in generated_inp_files
+surrogate_evaluations = settings.get('surrogate_evaluations', 0)  # Surrogate search before refinement (needs A_range..H_range)
+surrogate_model = settings.get('surrogate_model', 'gp')  # 'gp' (Gaussian process) or 'rbf'
+surrogate_batch_size = settings.get('surrogate_batch_size', num_workers)  # Points proposed per surrogate batch
+store_results = settings.get('store_results', True)  # Keep every calculated curve in <name>_step2_results.npz
+use_results_database = settings.get('use_results_database', True)  # Record every evaluation in pc_saft_results.sqlite
+checkpoint_interval = settings.get('checkpoint_interval', 60)  # Seconds between checkpoint writes
+distributed_port = settings.get('distributed_port', 0)  # Coordinate remote workers on this port (0 = run locally)
+distributed_host = settings.get('distributed_host', '127.0.0.1')  # Interface the coordinator listens on ('0.0.0.0' for all)
+remote_token = settings.get('remote_token')  # Shared token remote workers must present (default: PC_SAFT_REMOTE_TOKEN)
+remote_slots = settings.get('remote_slots', num_workers)  # Concurrent evaluations handed to remote workers
+remote_max_retries = settings.get('remote_max_retries', 2)  # Times an evaluation is requeued after losing its worker
+remote_heartbeat_timeout = settings.get('remote_heartbeat_timeout', 30)  # Seconds without heartbeat before a worker is dropped
+remote_wait_timeout = settings.get('remote_wait_timeout', 600)  # Seconds evaluations wait with no worker connected before they fail
+trace_evaluations = settings.get('trace_evaluations', True)  # Timing of every evaluation in <name>_step2_trace.jsonl
+optimizer_method = settings.get('optimizer_method', 'nelder-mead')  # 'nelder-mead', 'parallel-nelder-mead', 'parallel-simplex', 'least-squares', 'cma-es', 'differential-evolution'
+least_squares_method = settings.get('least_squares_method', 'trf')  # 'trf' or 'dogbox'
+jacobian_scheme = settings.get('jacobian_scheme', 'forward')  # 'forward' (8 runs per Jacobian) or 'central' (16)
+speculative_simplex = settings.get('speculative_simplex', True)  # 'parallel-nelder-mead': evaluate all follow-up candidates at once (~2.7x the solver runs)
+bounded_simplex = settings.get('bounded_simplex', True)  # Nelder-Mead on transformed A..H (needs A_range..H_range)
+bound_transform = settings.get('bound_transform', 'sine')  # 'sine' or 'logit' map from the ranges to unit scale
+population_size = settings.get('population_size', None)  # Points per generation (None = method default, rounded up to a multiple of num_workers)
+population_restarts = settings.get('population_restarts', 2)  # Restarts with a doubled population after a run converges
+population_max_evaluations = settings.get('population_max_evaluations', None)  # Cap on solver runs for 'cma-es' / 'differential-evolution' (maxiter counts generations)
+max_optimizer_evaluations = settings.get('max_optimizer_evaluations', None)  # Stop the optimizer after this many runs
+max_optimizer_seconds = settings.get('max_optimizer_seconds', None)  # Stop the optimizer after this wall-clock time
+plateau_window = settings.get('plateau_window', 0)  # Evaluations over which the best RMSRD must improve (0 = off)
+plateau_tolerance = settings.get('plateau_tolerance', 1e-3)  # Relative improvement below which the run has stalled
+optimizer_target_rmsrd = settings.get('optimizer_target_rmsrd', None)  # Stop the optimizer once this RMSRD is reached
+campaign_max_evaluations = settings.get('campaign_max_evaluations', None)  # Optimizer runs shared by all selected folders
+campaign_max_seconds = settings.get('campaign_max_seconds', None)  # Optimizer time shared by all selected folders
+sensitivity_screening = settings.get('sensitivity_screening', None)  # 'morris' to freeze insensitive parameters (needs A_range..H_range)
+screening_trajectories = settings.get('screening_trajectories', 10)  # Morris trajectories (9 runs each)
+screening_levels = settings.get('screening_levels', 4)  # Grid levels per parameter for the Morris trajectories
+freeze_threshold = settings.get('freeze_threshold', 0.1)  # Freeze parameters below this fraction of the largest index
+warm_start_library = settings.get('warm_start_library', 'pc_saft_library.sqlite')  # Fitted systems to seed from (None = off)
+warm_start_neighbours = settings.get('warm_start_neighbours', 0)  # Most similar fitted systems seeding a new one (0 = off)
+warm_start_max_rmsrd = settings.get('warm_start_max_rmsrd', None)  # Only seed from fits with an RMSRD up to this
+
+# Bounds from ranges_variables.txt when present, otherwise the optimizers run unbounded
+parameter_bounds = None
+if all(f"{name}_range" in settings for name in PARAMETER_NAMES):
+    parameter_bounds = [settings[f"{name}_range"] for name in PARAMETER_NAMES]
+
+# Persistent evaluation cache shared by Step 1 and Step 2 (set use_cache = False to disable)
+evaluation_cache = None
+if settings.get('use_cache', True) and pc_saft_backend == 'executable':
+    evaluation_cache = open_evaluation_cache(base_directory, executable_path, settings.get('cache_max_mb', 512))
+
+# One results database per campaign, shared with Step 1
+results_database = open_results_database(base_directory) if use_results_database else None
+
+# Library of fitted systems: every result is recorded, similar systems seed the next ones (warm_start.py)
+solution_library = open_warm_start_library(base_directory, warm_start_library) if warm_start_library else None
+
+# Optimizer budget shared by every selected folder (campaign_max_evaluations, campaign_max_seconds)
+campaign_budget = CampaignBudget(campaign_max_evaluations, campaign_max_seconds)
+
+# Distributed mode: this process keeps the optimizers, remote workers (remote_workers.py) run the executable
+remote_coordinator = None
+if distributed_port and pc_saft_backend == 'executable':
+    remote_coordinator = WorkerCoordinator(distributed_host, distributed_port, remote_heartbeat_timeout,
+                                           remote_max_retries, remote_wait_timeout, remote_token)
+
+
+# Function to start the evaluation pool: local worker sandboxes, or slots served by the remote workers
+def open_evaluation_pool():
+    if remote_coordinator is not None:
+        return RemoteEvaluationPool(remote_coordinator, pc_saft_folder, remote_slots)
+    return EvaluationPool(pc_saft_folder, executable_path, num_workers)
+
 
 # Step 2: Create .inp file
-def create_inp_file(dataset, file_index):
-    template_path = os.path.join(pc_saft_folder, "Input_ASD_template.inp")
-    with open(template_path, "r") as template_file:
-        content = template_file.read()
-
-    # Replace placeholders in template with dataset values
-    content = content.replace("A*", str(dataset['A']))
-    content = content.replace("B*", str(dataset['B']))
-    content = content.replace("C*", str(dataset['C']))
-    content = content.replace("D*", str(dataset['D']))
-    content = content.replace("E*", str(dataset['E']))
-    content = content.replace("F*", str(dataset['F']))
-    content = content.replace("G*", str(dataset['G']))
-    content = content.replace("H*", str(dataset['H']))
-
-    inp_file_path = os.path.join(generated_inp_files_path,
-                                 f"{drug_polymer_name}_dataset_{file_index}.inp")  # Updated file name
-    with open(inp_file_path, "w") as inp_file:
-        inp_file.write(content)
+def create_inp_file(dataset, file_index, objective_only=False, work_folder=None):
+    if work_folder is None:
+        work_folder = pc_saft_folder
+
+    with tracer.stage('render'):
+        # Objective evaluations only need the SLE points at the experimental temperatures (no full curve, no LLE)
+        template = objective_template if objective_only else full_template
+        content = template.render(dataset)
+
+        # Render straight into the solver's working input
+        inp_file_path = os.path.join(work_folder, "Input_ASD.inp")
+        with open(inp_file_path, "w") as inp_file:
+            inp_file.write(content)
+
+        # Keep a copy in generated_inp_files only when asked for
+        if archive_inp_files:
+            archive_path = os.path.join(generated_inp_files_path, f"{drug_polymer_name}_dataset_{file_index}.inp")
+            with open(archive_path, "w") as archive_file:
+                archive_file.write(content)
 
     return inp_file_path
 
 
 # Step 3: Run PC-SAFT
-def run_pc_saft(inp_file_path):
-    shutil.copy(inp_file_path, pc_saft_folder)
-    target_inp_file = os.path.join(pc_saft_folder, "Input_ASD.inp")
+def run_pc_saft(inp_file_path, work_folder=None, executable=None, dataset=None, objective_only=False):
+    # Default to the shared folder; pool workers pass their own scratch directory and executable copy
+    if work_folder is None:
+        work_folder = pc_saft_folder
+    if executable is None:
+        executable = RemoteSolver(remote_coordinator) if remote_coordinator is not None else executable_path
+
+    # Inputs rendered by create_inp_file are already in place; anything else is copied in
+    with tracer.stage('stage_files'):
+        target_inp_file = os.path.join(work_folder, "Input_ASD.inp")
+        if os.path.abspath(inp_file_path) != os.path.abspath(target_inp_file):
+            shutil.copyfile(inp_file_path, target_inp_file)
+
+        calc_data_file = os.path.join(work_folder, "Calc_data_SLE.dat")
+        if os.path.exists(calc_data_file):
+            os.remove(calc_data_file)
+
+    # The NumPy backend reads the same Input_ASD.inp and writes a compatible Calc_data_SLE.dat
+    if pc_saft_backend == 'native':
+        with tracer.stage('solver'):
+            return run_native(work_folder)
+
+    # Reuse the stored output if this system was already evaluated at these parameters against the same
+    # experimental data (a cached full run also answers an objective-only one)
+    cache_key = None
+    if evaluation_cache is not None:
+        exp_data_file = os.path.join(work_folder, "Exp_data_SLE.dat")
+        with tracer.stage('cache'):
+            cache_key, cache_hit = restore_cached_output(
+                evaluation_cache, target_inp_file, exp_data_file, calc_data_file,
+                full_template.render(dataset) if dataset is not None else None, objective_only)
+        if cache_hit:
+            tracer.note(status='cached')
+            return calc_data_file
+
+    # The process exit is the completion signal; hung or failed runs raise SolverError
+    timings = {}
+    try:
+        if isinstance(executable, RemoteSolver):
+            # Distributed mode: a remote worker runs the executable on the files prepared here
+            calc_data_file = executable.run(work_folder, timeout=solver_timeout, timings=timings)
+        else:
+            calc_data_file = run_solver(executable, work_folder, timeout=solver_timeout, timings=timings)
+    finally:
+        for stage_name, seconds in timings.items():
+            tracer.add_stage(stage_name, seconds)
+
+    if cache_key is not None:
+        with tracer.stage('cache'):
+            try:
+                rmsrd_value = extract_rmsrd(calc_data_file)
+            except ValueError:
+                rmsrd_value = None
+            store_output(evaluation_cache, cache_key, calc_data_file, rmsrd_value)
 
-    if os.path.exists(target_inp_file):
-        os.remove(target_inp_file)
+    return calc_data_file
 
-    os.rename(os.path.join(pc_saft_folder, os.path.basename(inp_file_path)), target_inp_file)
 
-    calc_data_file = os.path.join(pc_saft_folder, "Calc_data_SLE.dat")
-    if os.path.exists(calc_data_file):
-        os.remove(calc_data_file)
+# Step 4: Extract RMSRD
+def extract_rmsrd(calc_data_file):
+    return output_rmsrd(parse_calc_output(calc_data_file))
+
+
+# Step 5: Evaluate one parameter set, optionally inside a pool worker's scratch directory
+# Returns (RMSRD, calculated solubility at the experimental temperatures) or the exception of a failed run;
+# evaluations recorded in the checkpoint (including failures) are answered without running the solver
+def evaluate_point(params, work_folder=None, executable=None):
+    dataset = {
+        'A': params[0],
+        'B': params[1],
+        'C': params[2],
+        'D': params[3],
+        'E': params[4],
+        'F': params[5],
+        'G': params[6],
+        'H': params[7]
+    }
+
+    recorded = checkpoint.lookup(params)
+    if recorded is not None:
+        record_replayed(params, recorded)
+    else:
+        start_time = time.perf_counter()
+        with tracer.evaluation(evaluation_phase) as trace_record:
+            inp_file_path = create_inp_file(dataset, 1, objective_only_mode, work_folder)
+            try:
+                calc_data_file = run_pc_saft(inp_file_path, work_folder, executable, dataset, objective_only_mode)
+                with tracer.stage('parse'):
+                    calc_output = parse_calc_output(calc_data_file)
+                    rmsrd_value = output_rmsrd(calc_output)
+                    recorded = (rmsrd_value, calculated_at_temperatures(calc_output, exp_temperatures))
+                with tracer.stage('record'):
+                    record_evaluation(params, rmsrd_value, 'ok', time.perf_counter() - start_time)
+                    if results_store is not None:
+                        results_store.add(params, rmsrd_value, calc_output)
+            except (SolverError, ValueError) as e:
+                recorded = e
+                trace_record['status'] = 'failed'
+                record_evaluation(params, None, 'failed', time.perf_counter() - start_time, str(e))
+            with tracer.stage('record'):
+                checkpoint.record(params, recorded)
+    return recorded
+
+
+# Function to append one evaluation of the current run (and phase) to the results database
+def record_evaluation(params, rmsrd_value, status, wall_time, error=None):
+    if results_database is not None:
+        results_database.add_evaluation(run_id, evaluation_phase, None, params, rmsrd_value, status, wall_time,
+                                        error)
+
+
+# Function to record an evaluation answered by the checkpoint (no solver time) in the resumed run
+def record_replayed(params, recorded):
+    if isinstance(recorded, Exception):
+        record_evaluation(params, None, 'failed', 0.0, str(recorded))
+    else:
+        record_evaluation(params, recorded[0], 'ok', 0.0)
 
-    subprocess.run([executable_path], cwd=pc_saft_folder)
 
-    while not os.path.exists(calc_data_file):
-        time.sleep(1)
+# Objective for one parameter set; failed or timed-out runs get a finite penalty so the optimizer can carry on
+def objective_function(params, work_folder=None, executable=None):
+    recorded = evaluate_point(params, work_folder, executable)
+    if isinstance(recorded, Exception):
+        logging.error(f"Failed evaluation, using penalty RMSRD={failed_evaluation_penalty}: {recorded}")
+        rmsrd_value = failed_evaluation_penalty
+    else:
+        rmsrd_value = recorded[0]
 
-    return calc_data_file
+    logging.info(f"RMSRD for parameters {params} = {rmsrd_value}")
+    return rmsrd_value
 
 
-# Step 4: Extract RMSRD
-def extract_rmsrd(calc_data_file):
-    with open(calc_data_file, 'r') as file:
-        for line in file:
-            if line.strip().startswith("# RMSRD/%"):
-                target_line = line.strip().split()
-                if len(target_line) > 3 and target_line[2].replace('.', '', 1).isdigit():
-                    rmsrd_value = float(target_line[2])
-                    return rmsrd_value if np.isfinite(rmsrd_value) else float('inf')
+# Residual vector for the least-squares mode (its norm is the RMSRD)
+def residual_function(params, work_folder=None, executable=None):
+    recorded = evaluate_point(params, work_folder, executable)
+    if isinstance(recorded, Exception):
+        logging.error(f"Failed evaluation, using penalty RMSRD={failed_evaluation_penalty}: {recorded}")
+        return scaled_residuals([], exp_solubilities, None, failed_evaluation_penalty)
 
-    raise ValueError("RMSRD value not found or is not valid.")
+    logging.info(f"RMSRD for parameters {params} = {recorded[0]}")
+    return scaled_residuals(recorded[1], exp_solubilities, recorded[0], failed_evaluation_penalty)
 
 
 # Step 6: Optimize parameters using Nelder-Mead method
-def optimize_parameters(initial_guess, maxiter):
-    def objective_function(params):
-        dataset = {
-            'A': params[0],
-            'B': params[1],
-            'C': params[2],
-            'D': params[3],
-            'E': params[4],
-            'F': params[5],
-            'G': params[6],
-            'H': params[7]
-        }
-
-        inp_file_path = create_inp_file(dataset, 1)
-        calc_data_file = run_pc_saft(inp_file_path)
-        rmsrd_value = extract_rmsrd(calc_data_file)
-
-        logging.info(f"RMSRD for parameters {params} = {rmsrd_value}")
-        return rmsrd_value
-
-    result = minimize(objective_function, initial_guess, method='Nelder-Mead', options={'maxiter': maxiter})
+def optimize_parameters(initial_guess, maxiter, pool=None):
+    # Simplex candidates evaluated concurrently, one worker sandbox per point
+    def batch_objective(points):
+        return pool.map(lambda params, folder, exe: objective_function(params, folder, exe), points)
+
+    # Per-point residuals with bounded trust-region steps; each Jacobian is one batch on the pool
+    def batch_residuals(points):
+        if pool is None:
+            return [residual_function(params) for params in points]
+        return pool.map(lambda params, folder, exe: residual_function(params, folder, exe), points)
+
+    # Progress of the population methods: one line per generation in the RMSRD values file
+    def report_generation(record):
+        with open(rmsrd_file_path, "a") as f:
+            f.write(format_generation(optimizer_method, record))
+
+    # The stopping criteria see every objective call in physical units (outside the bounded transform) and end
+    # the run by raising StopOptimization; the best point evaluated so far is then the result. Parameters frozen
+    # by the sensitivity screening keep their starting values, the optimizers only see the free ones.
+    subspace = ParameterSubspace(initial_guess, free_parameters)
+    simplex_objective = subspace.wrap(stopping_policy.checked(objective_function))
+    simplex_batch_objective = subspace.wrap_batch(stopping_policy.checked(batch_objective, batch=True))
+    start = subspace.reduce(initial_guess)
+    bounds = subspace.reduce(parameter_bounds) if parameter_bounds is not None else None
+    try:
+        stopping_policy.check()  # Earlier systems may have spent the campaign budget
+
+        if optimizer_method == 'least-squares':
+            checked_residuals = subspace.wrap_batch(stopping_policy.checked(
+                batch_residuals, batch=True, value=lambda residuals: float(np.linalg.norm(residuals))))
+            result = parallel_least_squares(tracer.traced_objective(checked_residuals, optimizer_method, batch=True),
+                                            start, bounds, maxiter, least_squares_method,
+                                            central=(jacobian_scheme == 'central'))
+        elif optimizer_method in POPULATION_METHODS:
+            # Global search over the ranges: every generation is one batch on the pool; maxiter counts generations,
+            # population_max_evaluations caps the solver runs
+            if bounds is None:
+                raise ValueError(f"optimizer_method '{optimizer_method}' needs A_range..H_range in "
+                                 f"ranges_variables.txt")
+            result = population_optimize(
+                tracer.traced_objective(simplex_batch_objective, optimizer_method, batch=True), bounds, start,
+                optimizer_method, population_size, maxiter, population_restarts,
+                checkpoint_seed(checkpoint, 'population_seed'), pool.num_workers, callback=report_generation,
+                max_evaluations=population_max_evaluations)
+        else:
+            # With bounded_simplex (and the ranges known) the simplex lives in the internal coordinates of the
+            # transform: the search stays inside the ranges and A..H move on the same scale
+            # A warm start sizes the initial simplex by the spread of the similar systems' solutions
+            transform = None
+            initial_simplex = None
+            if simplex_steps is not None:
+                initial_simplex = steps_simplex(start, subspace.reduce(simplex_steps), bounds)
+            if bounded_simplex and bounds is not None:
+                transform = BoundedTransform(bounds, bound_transform)
+                if np.any(np.asarray(start) != np.clip(start, transform.lower, transform.upper)):
+                    logging.warning("Initial dataset lies outside A_range..H_range; starting from the nearest "
+                                    "in-range point")
+                simplex_objective = transform.wrap(simplex_objective)
+                simplex_batch_objective = transform.wrap_batch(simplex_batch_objective)
+                if initial_simplex is None:
+                    initial_simplex = transform.initial_simplex(start)
+                else:
+                    initial_simplex = np.array([transform.to_internal(vertex) for vertex in initial_simplex])
+                start = transform.to_internal(start)
+
+            if optimizer_method in PARALLEL_METHODS and pool is not None:
+                result = parallel_nelder_mead(
+                    tracer.traced_objective(simplex_batch_objective, optimizer_method, batch=True), start, maxiter,
+                    pool.num_workers, PARALLEL_METHODS[optimizer_method], initial_simplex=initial_simplex,
+                    speculate=speculative_simplex)
+            else:
+                result = minimize(tracer.traced_objective(simplex_objective, 'nelder-mead'), start,
+                                  method='Nelder-Mead', options={'maxiter': maxiter, 'initial_simplex': initial_simplex})
+            if transform is not None:
+                result.x = transform.to_external(result.x)
+        result.x = subspace.expand(result.x)
+    except StopOptimization:
+        result = stopping_policy.best_result(initial_guess)
     logging.info(f"Optimization result: {result}")
+    stopping_policy.finish(result.message)
     return result.x
 
 
 # Main process
-selected_drug_polymer_folders = select_drug_polymer_folders(pc_saft_folder)
+selected_drug_polymer_folders = args.folders or select_drug_polymer_folders(pc_saft_folder)
 
 for folder in selected_drug_polymer_folders:
     copy_template_and_exp_data_files(folder)
     drug_polymer_name = read_drug_polymer_name(os.path.join(folder, "Input_ASD_template.inp"))
 
+    # Compile the template once per system: full input for the final run, trimmed input for the optimizer
+    full_template = CompiledTemplate.from_file(os.path.join(pc_saft_folder, "Input_ASD_template.inp"))
+    objective_template = full_template.objective_only(
+        read_experimental_temperatures(os.path.join(pc_saft_folder, "Exp_data_SLE.dat")))
+
     # Read initial dataset
     initial_dataset_file = os.path.join(folder, "initial_dataset.txt")
     initial_dataset = read_initial_dataset(initial_dataset_file)
@@ -220,12 +531,120 @@ for folder in selected_drug_polymer_folders:
     ]
 
     rmsrd_file_path = os.path.join(generated_RMSRD_values_path, f"{drug_polymer_name}_RMSRD_values.txt")
-    with open(rmsrd_file_path, "w") as f:
-        f.write("Starting Nelder-Mead Optimization:\n")
+
+    # Every finished evaluation is journaled; --resume replays the journal instead of re-running the solver
+    checkpoint = open_checkpoint(os.path.join(base_directory, "checkpoints", f"{drug_polymer_name}_step2.pkl"),
+                                 args.resume, checkpoint_interval)
+
+    # Columnar archive of every evaluated curve, for re-scoring with other objectives (see results_store.py)
+    exp_temperatures, exp_solubilities = read_exp_data(os.path.join(pc_saft_folder, "Exp_data_SLE.dat"))
+    results_store = None
+    if store_results:
+        results_store = ResultsStore(
+            os.path.join(generated_RMSRD_values_path, f"{drug_polymer_name}_step2_results.npz"),
+            exp_temperatures, exp_solubilities)
+    # A resumed run keeps the interrupted run's lines and appends the replayed ones
+    if checkpoint.resumed:
+        with open(rmsrd_file_path, "a") as f:
+            f.write(f"\nResumed from checkpoint ({len(checkpoint.evaluations)} recorded evaluations), "
+                    f"starting Nelder-Mead Optimization:\n")
+    else:
+        with open(rmsrd_file_path, "w") as f:
+            f.write("Starting Nelder-Mead Optimization:\n")
+
+    # Register this system's run; evaluations are tagged with the phase they belong to
+    run_id = results_database.start_run(drug_polymer_name, 2, settings) if results_database is not None else None
+    evaluation_phase = 'optimizer'
+
+    # Timing breakdown of every evaluation and optimizer step (JSON lines, see evaluation_trace.py)
+    tracer = EvaluationTracer(
+        os.path.join(generated_RMSRD_values_path, f"{drug_polymer_name}_step2_trace.jsonl") if trace_evaluations
+        else None, drug_polymer_name, 2)
 
     # Optimize parameters using the initial dataset as the starting point
-    optimized_parameters = optimize_parameters(initial_guess, maxiter)
+    pool = None
+    system_descriptor_values = system_descriptors(os.path.join(pc_saft_folder, "Input_ASD_template.inp"))
+    neighbours = []
+    if solution_library is not None and warm_start_neighbours > 0:
+        neighbours = solution_library.nearest(system_descriptor_values, warm_start_neighbours, warm_start_max_rmsrd)
+    if (optimizer_method in PARALLEL_METHODS or optimizer_method in POPULATION_METHODS
+            or optimizer_method == 'least-squares' or surrogate_evaluations > 0 or sensitivity_screening is not None
+            or neighbours):
+        pool = open_evaluation_pool()
+
+    # Warm-start, screening and surrogate batches run on the pool, one worker sandbox per point
+    def batch_objective(points):
+        return pool.map(lambda params, folder, exe: objective_function(params, folder, exe), points)
+
+    # Warm start: the initial dataset and the solutions of the most similar systems fitted so far are evaluated
+    # as one batch; the best becomes the starting point and their spread sizes the initial simplex
+    simplex_steps = None
+    if neighbours:
+        evaluation_phase = 'warm_start'
+        candidates = [np.array(initial_guess, dtype=float)]
+        for neighbour in neighbours:
+            candidates.append(neighbour['parameters'] if parameter_bounds is None else
+                              np.clip(neighbour['parameters'], *np.transpose(parameter_bounds)))
+        candidate_values = tracer.traced_objective(batch_objective, 'warm_start', batch=True)(candidates)
+        best_candidate = int(np.argmin(candidate_values))
+        initial_guess = list(candidates[best_candidate])
+        simplex_steps = warm_start_steps(neighbours, parameter_bounds)
+        with open(rmsrd_file_path, "a") as f:
+            f.write(format_neighbours(neighbours))
+            f.write(f"Initial dataset RMSRD={candidate_values[0]}, starting from "
+                    f"{'the initial dataset' if best_candidate == 0 else neighbours[best_candidate - 1]['system']} "
+                    f"(RMSRD={candidate_values[best_candidate]})\n")
+        evaluation_phase = 'optimizer'
+
+    # Rank A..H by their influence on RMSRD with Morris trajectories over the A_range..H_range box (one batch) and
+    # freeze the insensitive ones; Step 2 has no random samples to estimate Sobol indices from
+    free_parameters = np.ones(len(PARAMETER_NAMES), dtype=bool)
+    if sensitivity_screening is not None:
+        if sensitivity_screening not in SCREENING_METHODS:
+            raise ValueError(f"Unknown sensitivity screening '{sensitivity_screening}', expected one of "
+                             f"{', '.join(SCREENING_METHODS)}")
+        if parameter_bounds is None:
+            logging.warning("Sensitivity screening needs A_range..H_range in ranges_variables.txt; skipped")
+        else:
+            if sensitivity_screening != 'morris':
+                logging.warning(f"Sensitivity screening '{sensitivity_screening}' needs Step 1's random samples; "
+                                f"using Morris trajectories")
+            evaluation_phase = 'screening'
+            screening = screen_morris(tracer.traced_objective(batch_objective, 'screening', batch=True),
+                                      parameter_bounds, screening_trajectories, screening_levels,
+                                      checkpoint_seed(checkpoint, 'screening_seed'), freeze_threshold)
+            free_parameters = screening.free
+            with open(rmsrd_file_path, "a") as f:
+                f.write(format_screening_table(screening, PARAMETER_NAMES))
+            evaluation_phase = 'optimizer'
+
+    if surrogate_evaluations > 0 and parameter_bounds is None:
+        logging.warning("Surrogate search needs A_range..H_range in ranges_variables.txt; skipped")
+    elif surrogate_evaluations > 0:
+        evaluation_phase = 'surrogate'
+
+        # Surrogate search over the A_range..H_range box, seeded with the initial dataset; the best point
+        # found becomes the starting point of the local refinement
+        surrogate_objective = tracer.traced_objective(batch_objective, 'surrogate', batch=True)
+        surrogate_result = surrogate_optimize(surrogate_objective, parameter_bounds, [initial_guess],
+                                              surrogate_objective([initial_guess]), surrogate_evaluations,
+                                              surrogate_batch_size, surrogate_model,
+                                              checkpoint_seed(checkpoint, 'surrogate_seed'))
+        with open(rmsrd_file_path, "a") as f:
+            f.write(f"Surrogate search ({surrogate_model}, {surrogate_result.nfev} evaluations): best RMSRD="
+                    f"{surrogate_result.fun}\n")
+        initial_guess = list(surrogate_result.x)
+        evaluation_phase = 'optimizer'
+
+    stopping_policy = StoppingPolicy(max_optimizer_evaluations, max_optimizer_seconds, plateau_window,
+                                     plateau_tolerance, optimizer_target_rmsrd, campaign_budget)
+    optimized_parameters = optimize_parameters(initial_guess, maxiter, pool)
+    if pool is not None:
+        pool.close()
     logging.info(f"Optimized parameters: {optimized_parameters}")
+    with open(rmsrd_file_path, "a") as f:
+        f.write(f"Optimization ended by: {stopping_policy.reason} "
+                f"({stopping_policy.evaluations} evaluations, {stopping_policy.duration:.1f} s)\n")
 
     # Create an .inp file for the optimized parameters and run PC-SAFT
     optimized_dataset = {
@@ -238,11 +657,21 @@ for folder in selected_drug_polymer_folders:
         'G': optimized_parameters[6],
         'H': optimized_parameters[7]
     }
-    optimized_inp_file_path = create_inp_file(optimized_dataset, 1)
-    optimized_calc_data_file = run_pc_saft(optimized_inp_file_path)
-
-    # Extract RMSRD for the optimized parameters
-    optimized_rmsrd_value = extract_rmsrd(optimized_calc_data_file)
+    # Full SLE curve (and LLE if requested in the template) is only computed for the final parameters
+    evaluation_phase = 'final'
+    start_time = time.perf_counter()
+    with tracer.evaluation(evaluation_phase):
+        optimized_inp_file_path = create_inp_file(optimized_dataset, 1)
+        optimized_calc_data_file = run_pc_saft(optimized_inp_file_path, dataset=optimized_dataset)
+
+        # Extract RMSRD for the optimized parameters (the full curve replaces the trimmed one in the archive)
+        with tracer.stage('parse'):
+            optimized_calc_output = parse_calc_output(optimized_calc_data_file)
+            optimized_rmsrd_value = output_rmsrd(optimized_calc_output)
+    record_evaluation(optimized_parameters, optimized_rmsrd_value, 'ok', time.perf_counter() - start_time)
+    if results_store is not None:
+        results_store.add(optimized_parameters, optimized_rmsrd_value, optimized_calc_output)
+        results_store.close()
 
     # Write optimized parameters and RMSRD value to the file
     with open(rmsrd_file_path, "a") as f:
@@ -250,3 +679,24 @@ for folder in selected_drug_polymer_folders:
                 f"C={optimized_parameters[2]}, D={optimized_parameters[3]}, E={optimized_parameters[4]}, "
                 f"F={optimized_parameters[5]}, G={optimized_parameters[6]}, H={optimized_parameters[7]} => "
                 f"RMSRD={optimized_rmsrd_value}\n")
+    checkpoint.remove()
+    if results_database is not None:
+        results_database.finish_run(run_id)
+    if solution_library is not None:
+        solution_library.add(drug_polymer_name, system_descriptor_values, optimized_parameters, optimized_rmsrd_value, 2)
+
+    # Where the wall-clock time went: per-stage percentiles, evaluations/s and optimizer overhead
+    timing_summary = tracer.summary()
+    tracer.close()
+    print(timing_summary)
+    with open(rmsrd_file_path, "a") as f:
+        f.write("\n" + timing_summary)
+
+if evaluation_cache is not None:
+    evaluation_cache.close()
+if results_database is not None:
+    results_database.close()
+if solution_library is not None:
+    solution_library.close()
+if remote_coordinator is not None:
+    remote_coordinator.close()
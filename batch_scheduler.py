@@ -0,0 +1,242 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import subprocess
+from results_db import RESULTS_DATABASE_NAME
+
+
+STEP_SCRIPTS = {1: "Step_1.py", 2: "Step_2.py"}
+SCRIPT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+OPTIMIZED_RMSRD_PATTERN = re.compile(r"Optimized Parameters: .* => RMSRD=(\S+)")
+
+
+# Function to read the job manifest (JSON) and fill in the defaults of every job
+def load_manifest(manifest_path):
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    base_directory = os.path.abspath(manifest['base_directory'])
+    max_cores = manifest.get('max_cores', os.cpu_count() or 1)
+    defaults = manifest.get('defaults', {})
+
+    jobs = []
+    for order, entry in enumerate(manifest['jobs']):
+        job = {**defaults, **entry}
+        job['settings'] = {**defaults.get('settings', {}), **entry.get('settings', {})}
+        job['folder'] = os.path.join(base_directory, job['folder'])
+        job['step'] = int(job.get('step', 1))
+        job['priority'] = job.get('priority', 0)
+        job['workers'] = max(1, min(int(job.get('workers', 1)), max_cores))
+        job['name'] = job.get('name', f"{os.path.basename(os.path.normpath(job['folder']))}_step{job['step']}")
+        job['workspace'] = os.path.join(base_directory, "workspaces", job['name'])
+        job['order'] = order
+        job['status'] = 'queued'
+        jobs.append(job)
+
+    # Highest priority first, manifest order among equal priorities
+    jobs.sort(key=lambda job: (-job['priority'], job['order']))
+    return base_directory, max_cores, jobs
+
+
+# Function to build the headless command line for one job
+def build_command(job, base_directory, resume=False):
+    command = [sys.executable, os.path.join(SCRIPT_FOLDER, STEP_SCRIPTS[job['step']]),
+               "--base-dir", base_directory, "--folder", job['folder'], "--workspace", job['workspace'],
+               "--set", f"num_workers={job['workers']}"]
+    for key, value in job['settings'].items():
+        command += ["--set", f"{key}={value!r}"]
+    if resume:
+        command.append("--resume")
+    return command
+
+
+# Function to read the drug_polymer name of a job from its template (None if unreadable)
+def read_system_name(job):
+    try:
+        with open(os.path.join(job['folder'], "Input_ASD_template.inp"), 'r') as f:
+            return f.readlines()[1].strip().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+# Function to count the solver runs of a job's run from its evaluation trace: the points of every evaluation
+# after the run header written since the job started, without cache hits (checkpoint replays are not traced)
+# Returns None if the job has not written a trace (trace_evaluations off, or not started yet)
+def count_traced_runs(trace_file, started):
+    runs = None
+    try:
+        with open(trace_file, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Line still being written
+                if record['type'] == 'run':
+                    runs = 0 if record['started'] >= started else None
+                elif runs is not None and record['type'] == 'evaluation' and record['status'] != 'cached':
+                    runs += record['points']
+    except OSError:
+        return None
+    return runs
+
+
+# Function to count the solver runs of a job's run from the results database (rows are written in batches, so
+# the count lags while the job runs); replayed checkpoint evaluations have no wall time and are left out
+def count_recorded_runs(base_directory, system, step, started):
+    database_path = os.path.join(base_directory, RESULTS_DATABASE_NAME)
+    if not os.path.exists(database_path):
+        return None
+    try:
+        connection = sqlite3.connect(database_path, timeout=60)
+        try:
+            (runs,) = connection.execute(
+                "SELECT COUNT(e.id) FROM runs r JOIN evaluations e ON e.run_id = r.run_id WHERE r.system = ? "
+                "AND r.step = ? AND r.started >= ? AND e.wall_time > 0", (system, step, started)).fetchone()
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return None
+    return runs
+
+
+# Function to count the solver runs of a job so far, whatever the backend (executable, native or remote)
+def count_solver_runs(job, base_directory):
+    system = read_system_name(job)
+    if system is None:
+        return 0
+    trace_file = os.path.join(base_directory, "generated_RMSRD_values", f"{system}_step{job['step']}_trace.jsonl")
+    runs = count_traced_runs(trace_file, job['started'])
+    if runs is None:
+        runs = count_recorded_runs(base_directory, system, job['step'], job['started'])
+    return runs or 0
+
+
+# Function to read the final RMSRD a job wrote to its RMSRD values file
+def read_optimized_rmsrd(job, base_directory):
+    system = read_system_name(job)
+    if system is None:
+        return None
+    rmsrd_file = os.path.join(base_directory, "generated_RMSRD_values", f"{system}_RMSRD_values.txt")
+    try:
+        with open(rmsrd_file, 'r') as f:
+            matches = OPTIMIZED_RMSRD_PATTERN.findall(f.read())
+    except OSError:
+        return None
+    return float(matches[-1]) if matches else None
+
+
+# Function to start one job as a subprocess with its output in <workspace>/run.log
+def start_job(job, base_directory, resume=False):
+    os.makedirs(job['workspace'], exist_ok=True)
+    job['log_file'] = os.path.join(job['workspace'], "run.log")
+    job['log_handle'] = open(job['log_file'], 'w')
+    job['process'] = subprocess.Popen(build_command(job, base_directory, resume), cwd=base_directory,
+                                      stdin=subprocess.DEVNULL, stdout=job['log_handle'], stderr=subprocess.STDOUT)
+    job['start_time'] = time.perf_counter()
+    job['started'] = time.time()  # Wall clock, to find the job's run in its trace and the results database
+    job['status'] = 'running'
+    print(f"Started {job['name']} (step {job['step']}, priority {job['priority']}, {job['workers']} worker(s))")
+
+
+# Function to print one progress line per running job
+def print_progress(jobs, base_directory):
+    counts = {status: sum(1 for job in jobs if job['status'] == status)
+              for status in ('queued', 'running', 'done', 'failed')}
+    print(f"[{time.strftime('%H:%M:%S')}] " + ", ".join(f"{count} {status}" for status, count in counts.items()))
+    for job in jobs:
+        if job['status'] == 'running':
+            elapsed = time.perf_counter() - job['start_time']
+            runs = count_solver_runs(job, base_directory)
+            print(f"    {job['name']}: {elapsed:.0f} s, {runs} solver runs ({runs / max(elapsed, 1e-9):.2f}/s)")
+
+
+# Function to run all jobs, keeping the summed worker count of the running jobs within max_cores
+def run_jobs(jobs, base_directory, max_cores, poll_interval=2.0, progress_interval=60.0, resume=False):
+    queued = list(jobs)
+    running = []
+    last_progress = time.perf_counter()
+    while queued or running:
+        # Start jobs in priority order while their workers fit into the free cores
+        used_cores = sum(job['workers'] for job in running)
+        while queued and used_cores + queued[0]['workers'] <= max_cores:
+            job = queued.pop(0)
+            start_job(job, base_directory, resume)
+            running.append(job)
+            used_cores += job['workers']
+
+        time.sleep(poll_interval)
+
+        for job in list(running):
+            returncode = job['process'].poll()
+            if returncode is None:
+                continue
+            job['log_handle'].close()
+            job['wall_time'] = time.perf_counter() - job['start_time']
+            job['solver_runs'] = count_solver_runs(job, base_directory)
+            job['returncode'] = returncode
+            job['status'] = 'done' if returncode == 0 else 'failed'
+            job['rmsrd'] = read_optimized_rmsrd(job, base_directory) if returncode == 0 else None
+            running.remove(job)
+            print(f"Finished {job['name']}: {job['status']} after {job['wall_time']:.1f} s "
+                  f"({job['solver_runs']} solver runs)")
+
+        if time.perf_counter() - last_progress >= progress_interval:
+            print_progress(jobs, base_directory)
+            last_progress = time.perf_counter()
+    return jobs
+
+
+# Function to format the per-system summary table
+def format_summary(jobs):
+    lines = [f"{'system':<40} {'step':>4} {'status':>7} {'wall/s':>9} {'runs':>6} {'runs/s':>7} {'RMSRD':>10}"]
+    for job in jobs:
+        wall_time = job.get('wall_time', 0.0)
+        runs = job.get('solver_runs', 0)
+        rmsrd = job.get('rmsrd')
+        lines.append(f"{job['name']:<40} {job['step']:>4} {job['status']:>7} {wall_time:9.1f} {runs:6d} "
+                     f"{runs / wall_time if wall_time > 0 else 0.0:7.2f} "
+                     f"{rmsrd if rmsrd is not None else '-':>10}")
+    total_runs = sum(job.get('solver_runs', 0) for job in jobs)
+    lines.append(f"{len(jobs)} system(s), {total_runs} solver runs")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Step 1 / Step 2 headless for every drug_polymer folder "
+                                                 "listed in a JSON job manifest, several systems at a time.")
+    parser.add_argument("manifest")
+    parser.add_argument("--max-cores", type=int, help="Override the manifest's max_cores (summed workers of "
+                                                      "all running systems)")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds between job status checks")
+    parser.add_argument("--progress-interval", type=float, default=60.0,
+                        help="Seconds between progress reports (default 60)")
+    parser.add_argument("--resume", action="store_true", help="Pass --resume to every job (continue from checkpoints)")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the commands in scheduling order")
+    args = parser.parse_args(argv)
+
+    base_directory, max_cores, jobs = load_manifest(args.manifest)
+    if args.max_cores:
+        max_cores = args.max_cores
+        for job in jobs:
+            job['workers'] = min(job['workers'], max_cores)
+
+    if args.dry_run:
+        for job in jobs:
+            print(subprocess.list2cmdline(build_command(job, base_directory, args.resume)))
+        return 0
+
+    start_time = time.perf_counter()
+    print(f"Scheduling {len(jobs)} system(s) on {max_cores} core(s)")
+    run_jobs(jobs, base_directory, max_cores, args.poll_interval, args.progress_interval, args.resume)
+    print(f"\nAll systems finished in {time.perf_counter() - start_time:.1f} s\n")
+    print(format_summary(jobs))
+    return 1 if any(job['status'] == 'failed' for job in jobs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
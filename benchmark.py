@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import secrets
+import sqlite3
+import argparse
+import tempfile
+import subprocess
+from evaluation_trace import load_trace
+from fake_pc_saft import install_fake_solver, FAKE_OPTIMUM
+from inp_template import PARAMETER_NAMES
+from results_db import RESULTS_DATABASE_NAME
+from remote_workers import TOKEN_VARIABLE
+
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_SYSTEM = "benchmark_system"
+OUTPUT_FOLDERS = ("generated_PC-SAFT_datasets", "generated_inp_files", "generated_RMSRD_values")
+
+# Parameter ranges of the README example; the stand-in solver's optimum lies inside them
+BENCHMARK_RANGES = {
+    'A_range': (0.01070, 0.04980),
+    'B_range': (2.65800, 4.76700),
+    'C_range': (151.60000, 470.92000),
+    'D_range': (516.46910, 2181.90000),
+    'E_range': (0.00952, 0.08946),
+    'F_range': (0.03130, 0.05400),
+    'G_range': (2.71000, 3.12000),
+    'H_range': (205.00000, 298.04700),
+}
+
+
+# Function to set up a campaign directory: stand-in executable, ranges file and one system folder
+# (template and experimental data of the repository, initial dataset at the centre of the ranges for Step 2)
+def create_benchmark_campaign(work_directory, latency, jitter, failure_rate, step2_maxiter):
+    system_folder = os.path.join(work_directory, BENCHMARK_SYSTEM)
+    for folder in (system_folder, *(os.path.join(work_directory, name) for name in OUTPUT_FOLDERS)):
+        os.makedirs(folder, exist_ok=True)
+    for file_name in ("Input_ASD_template.inp", "Exp_data_SLE.dat"):
+        shutil.copy(os.path.join(REPOSITORY_DIRECTORY, file_name), os.path.join(system_folder, file_name))
+    install_fake_solver(os.path.join(work_directory, "PC_SAFT_ASD_v2022.12.exe"), latency, jitter, failure_rate)
+
+    with open(os.path.join(work_directory, "ranges_variables.txt"), 'w') as f:
+        f.write("use_cache = False\n\n")  # Every evaluation must reach the solver
+        f.write("".join(f"{key} = {value}\n" for key, value in BENCHMARK_RANGES.items()))
+
+    with open(os.path.join(system_folder, "initial_dataset.txt"), 'w') as f:
+        f.write(f"maxiter = {step2_maxiter}\n\n")
+        for name in PARAMETER_NAMES:
+            low, high = BENCHMARK_RANGES[f"{name}_range"]
+            f.write(f"{name}* = {(low + high) / 2:.6f}\n")
+    return system_folder
+
+
+# Function to run Step 1 or Step 2 headless on the benchmark system; returns the wall time in seconds
+def run_step(step, work_directory, system_folder, settings, log_name):
+    command = [sys.executable, os.path.join(REPOSITORY_DIRECTORY, f"Step_{step}.py"), "--base-dir", work_directory,
+               "--folder", system_folder]
+    for key, value in settings.items():
+        command += ["--set", f"{key}={value!r}"]
+
+    # Only the trace of this run is read afterwards
+    trace_directory = os.path.join(work_directory, "generated_RMSRD_values")
+    for file_name in os.listdir(trace_directory):
+        if file_name.endswith("_trace.jsonl"):
+            os.remove(os.path.join(trace_directory, file_name))
+    start_time = time.perf_counter()
+    with open(os.path.join(work_directory, log_name), 'w') as log_file:
+        completed = subprocess.run(command, cwd=work_directory, stdin=subprocess.DEVNULL, stdout=log_file,
+                                   stderr=subprocess.STDOUT)
+    wall_time = time.perf_counter() - start_time
+    if completed.returncode != 0:
+        raise RuntimeError(f"Step {step} exited with code {completed.returncode}, see "
+                           f"{os.path.join(work_directory, log_name)}")
+    return wall_time
+
+
+# Function to read the trace records of the last run of a step
+def read_trace(work_directory, step):
+    trace_directory = os.path.join(work_directory, "generated_RMSRD_values")
+    for file_name in os.listdir(trace_directory):
+        if file_name.endswith(f"_step{step}_trace.jsonl"):
+            return load_trace(os.path.join(trace_directory, file_name))[-1][1]
+    raise RuntimeError(f"No step {step} trace in {trace_directory}")
+
+
+# Function to measure random-phase throughput of Step 1 with several worker counts
+def benchmark_throughput(work_directory, system_folder, worker_counts, evaluations, seed):
+    results = []
+    for num_workers in worker_counts:
+        settings = {'num_workers': num_workers, 'num_datasets': evaluations, 'maxiter': 1, 'sampling_seed': seed}
+        wall_time = run_step(1, work_directory, system_folder, settings, f"throughput_{num_workers}.log")
+        steps = [record for record in read_trace(work_directory, 1)
+                 if record['type'] == 'optimizer' and record['label'] == 'random']
+        points = sum(record['points'] for record in steps)
+        rate = points / sum(record['duration'] for record in steps)
+        results.append({'workers': num_workers, 'evaluations': points, 'evaluations_per_second': rate,
+                        'wall_time': wall_time})
+        print(f"  {num_workers:>3} worker(s): {rate:8.2f} evaluations/s")
+
+    base = results[0]
+    for result in results:
+        result['speedup'] = result['evaluations_per_second'] / base['evaluations_per_second']
+        result['efficiency'] = result['speedup'] * base['workers'] / result['workers']
+    return results
+
+
+# Function to count the evaluations of the last run of a step until the target RMSRD was first reached
+def evaluations_to_target(work_directory, step, target):
+    connection = sqlite3.connect(os.path.join(work_directory, RESULTS_DATABASE_NAME))
+    try:
+        (run_id,) = connection.execute("SELECT MAX(run_id) FROM runs WHERE step = ?", (step,)).fetchone()
+        rows = connection.execute("SELECT rmsrd FROM evaluations WHERE run_id = ? AND phase != 'final' "
+                                  "ORDER BY id", (run_id,)).fetchall()
+    finally:
+        connection.close()
+    values = [rmsrd_value for (rmsrd_value,) in rows]
+    reached = next((count for count, value in enumerate(values, start=1) if value is not None and value <= target),
+                   None)
+    best = min((value for value in values if value is not None), default=None)
+    return reached, len(values), best
+
+
+# Function to read the parameters and RMSRD of every evaluation of the last run of a step, sorted
+def run_evaluations(work_directory, step):
+    connection = sqlite3.connect(os.path.join(work_directory, RESULTS_DATABASE_NAME))
+    try:
+        (run_id,) = connection.execute("SELECT MAX(run_id) FROM runs WHERE step = ?", (step,)).fetchone()
+        rows = connection.execute(f"SELECT {', '.join(PARAMETER_NAMES)}, rmsrd, status FROM evaluations "
+                                  "WHERE run_id = ?", (run_id,)).fetchall()
+    finally:
+        connection.close()
+    return sorted(rows, key=lambda row: tuple(-1.0 if value is None else value for value in row[:-1]))
+
+
+# Function to check distributed mode end to end: Step 1 runs once locally and once as coordinator of
+# num_remote_workers remote_workers.py processes on localhost; both runs must record the same evaluations and
+# every remote worker must have run some of them. Returns the list of problems found.
+def check_distributed(work_directory, system_folder, evaluations, seed, num_remote_workers=2):
+    settings = {'num_workers': num_remote_workers, 'num_datasets': evaluations, 'maxiter': 5, 'sampling_seed': seed}
+    run_step(1, work_directory, system_folder, settings, "distributed_local.log")
+    local_evaluations = run_evaluations(work_directory, 1)
+
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    executable = os.path.join(work_directory, "PC_SAFT_ASD_v2022.12.exe")
+    token = secrets.token_hex(16)
+    workers, log_paths = [], []
+    for i in range(1, num_remote_workers + 1):
+        log_paths.append(os.path.join(work_directory, f"distributed_worker_{i}.log"))
+        with open(log_paths[-1], 'w') as log_file:
+            workers.append(subprocess.Popen(
+                [sys.executable, os.path.join(REPOSITORY_DIRECTORY, "remote_workers.py"), "--coordinator",
+                 f"127.0.0.1:{port}", "--executable", executable, "--slots", "1", "--name", f"worker_{i}",
+                 "--scratch", os.path.join(work_directory, "remote_scratch", str(i))],
+                cwd=work_directory, env=dict(os.environ, **{TOKEN_VARIABLE: token}), stdin=subprocess.DEVNULL,
+                stdout=log_file, stderr=subprocess.STDOUT))
+    try:
+        run_step(1, work_directory, system_folder,
+                 dict(settings, distributed_port=port, remote_token=token, remote_wait_timeout=60),
+                 "distributed_remote.log")
+    finally:
+        for worker in workers:
+            try:
+                worker.wait(timeout=30)  # Workers exit once the coordinator shuts down
+            except subprocess.TimeoutExpired:
+                worker.kill()
+    remote_evaluations = run_evaluations(work_directory, 1)
+
+    problems = []
+    if len(remote_evaluations) != len(local_evaluations):
+        problems.append(f"{len(remote_evaluations)} evaluations with remote workers, {len(local_evaluations)} locally")
+    elif remote_evaluations != local_evaluations:
+        problems.append("remote and local runs recorded different parameters or RMSRD values")
+    if any(row[-1] != 'ok' for row in remote_evaluations):
+        problems.append("failed evaluations with remote workers")
+    for worker, log_path in zip(workers, log_paths):
+        with open(log_path, 'r') as f:
+            runs = f.read().count("PC-SAFT run in")
+        if worker.returncode != 0:
+            problems.append(f"{os.path.basename(log_path)}: worker exited with code {worker.returncode}")
+        if runs == 0:
+            problems.append(f"{os.path.basename(log_path)}: worker ran no evaluation")
+        print(f"  {os.path.basename(log_path)}: {runs} evaluations")
+    print(f"  {len(remote_evaluations)} evaluations with remote workers, {len(local_evaluations)} locally")
+    return problems
+
+
+# Function to run every optimizer on Step 1 and Step 2 and record how many evaluations it needs to reach the target
+def benchmark_convergence(work_directory, system_folder, optimizers, num_workers, target, maxiter, evaluations,
+                          seed):
+    results = []
+    for step in (1, 2):
+        for optimizer_method in optimizers:
+            settings = {'num_workers': num_workers, 'optimizer_method': optimizer_method, 'sampling_seed': seed}
+            if step == 1:
+                settings.update({'num_datasets': evaluations, 'maxiter': maxiter})
+            wall_time = run_step(step, work_directory, system_folder, settings,
+                                 f"convergence_step{step}_{optimizer_method}.log")
+            reached, total, best = evaluations_to_target(work_directory, step, target)
+            results.append({'step': step, 'optimizer': optimizer_method, 'evaluations_to_target': reached,
+                            'evaluations': total, 'best_rmsrd': best, 'wall_time': wall_time})
+            print(f"  step {step} {optimizer_method:<22} {reached if reached is not None else '-':>6} of {total} "
+                  f"evaluations, best RMSRD {best if best is not None else '-'}")
+    return results
+
+
+# Function to compare a benchmark with a baseline; returns the list of regressions beyond the tolerance
+def compare_with_baseline(results, baseline, tolerance):
+    regressions = []
+    baseline_rates = {entry['workers']: entry['evaluations_per_second'] for entry in baseline.get('throughput', [])}
+    for entry in results['throughput']:
+        old_rate = baseline_rates.get(entry['workers'])
+        if old_rate and entry['evaluations_per_second'] < (1.0 - tolerance) * old_rate:
+            regressions.append(f"throughput with {entry['workers']} worker(s): "
+                               f"{entry['evaluations_per_second']:.2f} vs {old_rate:.2f} evaluations/s")
+
+    baseline_counts = {(entry['step'], entry['optimizer']): entry['evaluations_to_target']
+                       for entry in baseline.get('convergence', [])}
+    for entry in results['convergence']:
+        key = (entry['step'], entry['optimizer'])
+        if key not in baseline_counts or baseline_counts[key] is None:
+            continue
+        new_count = entry['evaluations_to_target']
+        if new_count is None or new_count > (1.0 + tolerance) * baseline_counts[key]:
+            regressions.append(f"step {key[0]} {key[1]}: {new_count if new_count is not None else 'target missed'} "
+                               f"vs {baseline_counts[key]} evaluations to target")
+    return regressions
+
+
+# Function to format the benchmark results as tables
+def format_report(results):
+    lines = [f"Stand-in solver: latency {results['config']['latency']} s, jitter {results['config']['jitter']} s",
+             "",
+             f"{'workers':>7} {'evals/s':>9} {'speedup':>8} {'efficiency':>10}"]
+    for entry in results['throughput']:
+        lines.append(f"{entry['workers']:>7} {entry['evaluations_per_second']:9.2f} {entry['speedup']:8.2f} "
+                     f"{entry['efficiency']:10.2f}")
+    lines += ["", f"Evaluations to RMSRD <= {results['config']['target']}:",
+              f"{'step':>4} {'optimizer':<22} {'to target':>9} {'total':>6} {'best RMSRD':>11} {'wall/s':>8}"]
+    for entry in results['convergence']:
+        reached = entry['evaluations_to_target'] if entry['evaluations_to_target'] is not None else '-'
+        best = f"{entry['best_rmsrd']:11.4g}" if entry['best_rmsrd'] is not None else f"{'-':>11}"
+        lines.append(f"{entry['step']:>4} {entry['optimizer']:<22} {reached:>9} {entry['evaluations']:>6} {best} "
+                     f"{entry['wall_time']:8.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Step 1 and Step 2 against the stand-in PC-SAFT solver "
+                                                 "(fake_pc_saft.py): throughput versus worker count and "
+                                                 "evaluations needed to reach a target RMSRD per optimizer.")
+    parser.add_argument("--latency", type=float, default=0.1, help="Mean solver run time in seconds (default 0.1)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Standard deviation of the solver run time")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of solver runs that fail")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts (default 1,2,4)")
+    parser.add_argument("--evaluations", type=int, default=32,
+                        help="Random datasets per Step 1 run (default 32)")
+    parser.add_argument("--optimizers", default="nelder-mead,parallel-nelder-mead,least-squares",
+                        help="Comma-separated optimizer_method values to compare")
+    parser.add_argument("--target", type=float, default=1.0, help="Target RMSRD in %% (default 1.0)")
+    parser.add_argument("--maxiter", type=int, default=100,
+                        help="Optimizer iterations per run (default 100); generations for cma-es and "
+                             "differential-evolution, i.e. up to maxiter times the population in solver runs")
+    parser.add_argument("--seed", type=int, default=1, help="Sampling seed, the same for every run (default 1)")
+    parser.add_argument("--work-dir", help="Campaign directory to use (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the campaign directory (logs, traces, database)")
+    parser.add_argument("--output", help="Write the results as JSON (e.g. to use as a baseline later)")
+    parser.add_argument("--baseline", help="JSON results of an earlier benchmark to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Allowed relative slowdown against the baseline before failing (default 0.1)")
+    parser.add_argument("--check-distributed", action="store_true",
+                        help="Only check distributed mode: Step 1 with two remote workers on localhost must "
+                             "record the same evaluations as a local run")
+    args = parser.parse_args(argv)
+
+    worker_counts = [int(value) for value in args.workers.split(',')]
+    optimizers = [value.strip() for value in args.optimizers.split(',')]
+    work_directory = os.path.abspath(args.work_dir) if args.work_dir else tempfile.mkdtemp(prefix="pc_saft_bench_")
+    os.makedirs(work_directory, exist_ok=True)
+    system_folder = create_benchmark_campaign(work_directory, args.latency, args.jitter, args.failure_rate,
+                                              args.maxiter)
+    print(f"Benchmark campaign in {work_directory}")
+
+    if args.check_distributed:
+        try:
+            print("Distributed mode (coordinator and two remote workers on localhost):")
+            problems = check_distributed(work_directory, system_folder, args.evaluations, args.seed)
+        finally:
+            if not args.keep and not args.work_dir:
+                shutil.rmtree(work_directory, ignore_errors=True)
+        if problems:
+            print("\n".join(f"  {problem}" for problem in problems))
+            return 1
+        print("Distributed mode: OK")
+        return 0
+
+    try:
+        print("Throughput (Step 1 random phase):")
+        throughput = benchmark_throughput(work_directory, system_folder, worker_counts, args.evaluations, args.seed)
+        print("Convergence:")
+        convergence = benchmark_convergence(work_directory, system_folder, optimizers, max(worker_counts),
+                                            args.target, args.maxiter, args.evaluations, args.seed)
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_directory, ignore_errors=True)
+
+    results = {'config': {'latency': args.latency, 'jitter': args.jitter, 'failure_rate': args.failure_rate,
+                          'target': args.target, 'maxiter': args.maxiter, 'evaluations': args.evaluations,
+                          'seed': args.seed, 'optimum': FAKE_OPTIMUM.tolist()},
+               'throughput': throughput, 'convergence': convergence}
+    print()
+    print(format_report(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            print("\n".join(f"  {regression}" for regression in regressions))
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
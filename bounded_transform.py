@@ -0,0 +1,58 @@
+import numpy as np
+
+
+BOUND_TRANSFORMS = ('sine', 'logit')
+
+# Initial simplex step in internal coordinates: about 10 % of the range for a parameter in the middle of it
+INITIAL_STEPS = {'sine': 0.2, 'logit': 0.4}
+
+
+# Map between the physical parameters (each inside its range) and unbounded internal coordinates of unit scale
+# sine:  p = low + (high - low) (sin(u) + 1) / 2, the boundaries are reached at u = +-pi/2 and the map is periodic
+# logit: p = low + (high - low) / (1 + exp(-u)), the boundaries are approached but never reached
+# Every internal point is a distinct in-range parameter set, so the simplex never pays for clamped duplicates,
+# and A (~0.03) and D (~1000) move on the same scale.
+class BoundedTransform:
+    def __init__(self, bounds, kind='sine', margin=1e-9):
+        if kind not in BOUND_TRANSFORMS:
+            raise ValueError(f"Unknown bound transform '{kind}', expected one of {', '.join(BOUND_TRANSFORMS)}")
+        self.kind = kind
+        self.lower = np.array([bound[0] for bound in bounds], dtype=float)
+        self.upper = np.array([bound[1] for bound in bounds], dtype=float)
+        self.width = self.upper - self.lower
+        self.margin = margin
+
+    def to_internal(self, params):
+        fraction = np.clip((np.asarray(params, dtype=float) - self.lower) / self.width, self.margin, 1.0 - self.margin)
+        if self.kind == 'sine':
+            return np.arcsin(2.0 * fraction - 1.0)
+        return np.log(fraction / (1.0 - fraction))
+
+    def to_external(self, internal):
+        internal = np.asarray(internal, dtype=float)
+        if self.kind == 'sine':
+            fraction = (np.sin(internal) + 1.0) / 2.0
+        else:
+            fraction = 1.0 / (1.0 + np.exp(-internal))
+        return self.lower + self.width * fraction
+
+    # Function to build the initial simplex around a starting point, in internal coordinates
+    # Each vertex steps one coordinate towards the middle of its range, so no vertex starts on a boundary
+    def initial_simplex(self, params, step=None):
+        if step is None:
+            step = INITIAL_STEPS[self.kind]
+        x0 = self.to_internal(params)
+        simplex = [x0]
+        for k in range(len(x0)):
+            vertex = x0.copy()
+            vertex[k] += -step if x0[k] > 0 else step
+            simplex.append(vertex)
+        return np.array(simplex)
+
+    # Function to wrap an objective of the physical parameters as a function of internal coordinates
+    def wrap(self, objective):
+        return lambda internal, *args: objective(self.to_external(internal), *args)
+
+    # Same for a batch objective taking a list of points
+    def wrap_batch(self, batch_objective):
+        return lambda points: batch_objective([self.to_external(point) for point in points])
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+RMSRD_PREFIX = "# RMSRD/%"
+OBJECTIVES = ('rmsrd', 'aard', 'log', 'weighted')
+
+
+# Function to parse Calc_data_SLE.dat into its RMSRD and numeric blocks
+# Consecutive rows of numbers with the same column count form one block (e.g. the points at the experimental
+# temperatures and the SLE curve); comment and text lines end a block. Values in scientific notation are fine.
+def parse_calc_output(calc_data_file):
+    rmsrd_value = None
+    blocks = []
+    rows = []
+
+    def close_block():
+        if rows:
+            blocks.append(np.array(rows, dtype=float))
+            rows.clear()
+
+    with open(calc_data_file, 'r') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped.startswith(RMSRD_PREFIX):
+                fields = stripped[len(RMSRD_PREFIX):].split()
+                try:
+                    rmsrd_value = float(fields[0])
+                except (IndexError, ValueError):
+                    pass
+                close_block()
+                continue
+            try:
+                row = [float(field) for field in stripped.split()]
+            except ValueError:
+                close_block()  # Header or free text
+                continue
+            if rows and len(row) != len(rows[-1]):
+                close_block()
+            rows.append(row)
+    close_block()
+    return {'rmsrd': rmsrd_value, 'blocks': blocks}
+
+
+# Function to get the RMSRD from a parsed output (non-finite values become inf, a missing line is an error)
+def output_rmsrd(calc_output):
+    rmsrd_value = calc_output['rmsrd']
+    if rmsrd_value is None:
+        raise ValueError("RMSRD value not found or is not valid.")
+    return rmsrd_value if np.isfinite(rmsrd_value) else float('inf')
+
+
+# Function to return the calculated solubility curve (T, w) of a parsed output: the last numeric block
+def output_curve(calc_output):
+    if not calc_output['blocks']:
+        return np.empty(0), np.empty(0)
+    block = calc_output['blocks'][-1]
+    return block[:, 0], block[:, -1]
+
+
+# Function to get the calculated solubility at the experimental temperatures
+# A block listed at exactly those temperatures is used directly; otherwise a curve covering them is
+# interpolated. Points that cannot be recovered are NaN.
+def calculated_at_temperatures(calc_output, T_exp):
+    T_exp = np.asarray(T_exp, dtype=float)
+    for block in calc_output['blocks']:
+        if block.shape[1] >= 2 and len(block) == len(T_exp) and np.allclose(block[:, 0], T_exp, atol=1e-2):
+            return block[:, -1].copy()
+
+    for block in sorted(calc_output['blocks'], key=len, reverse=True):
+        if block.shape[1] >= 2 and len(block) >= 2 and len(T_exp) > 0:
+            order = np.argsort(block[:, 0])
+            T_curve, w_curve = block[order, 0], block[order, -1]
+            if T_curve[0] <= T_exp.min() + 1e-6 and T_curve[-1] >= T_exp.max() - 1e-6:
+                return np.interp(T_exp, T_curve, w_curve)
+    return np.full(len(T_exp), np.nan)
+
+
+# Function to build the residual vector for least squares: relative deviations in %, scaled so that the norm
+# equals the RMSRD. Without per-point values the RMSRD is split evenly over the points (same norm).
+# A failed run (rmsrd_value None), a non-finite RMSRD or a curve with only some points missing is split from
+# the penalty RMSRD instead, so the vector is always finite: scipy's least_squares stops on non-finite
+# residuals at the start point, and inside a Jacobian batch they would spoil the finite differences.
+def scaled_residuals(w_calc, w_exp, rmsrd_value, penalty):
+    w_exp = np.asarray(w_exp, dtype=float)
+    w_calc = np.asarray(w_calc, dtype=float)
+    if w_calc.shape == w_exp.shape:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            residuals = 100.0 * (w_calc - w_exp) / w_exp / np.sqrt(len(w_exp))
+        finite = np.isfinite(residuals)
+        if np.all(finite):
+            return residuals
+        if np.any(finite):
+            rmsrd_value = None  # The solver failed at some of the temperatures
+    if rmsrd_value is None or not np.isfinite(rmsrd_value):
+        rmsrd_value = penalty
+    return np.full(len(w_exp), rmsrd_value / np.sqrt(len(w_exp)))
+
+
+# Function to score calculated against experimental solubilities (works on one row or a matrix of runs)
+# rmsrd: 100 sqrt(mean r^2), aard: 100 mean |r|, log: sqrt(mean ln(w_calc/w_exp)^2),
+# weighted: 100 sqrt(sum(weight r^2) / sum(weight)); r is the relative residual, missing points give inf
+def score(w_calc, w_exp, objective='rmsrd', weights=None):
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective '{objective}', expected one of {', '.join(OBJECTIVES)}")
+    w_calc = np.asarray(w_calc, dtype=float)
+    w_exp = np.asarray(w_exp, dtype=float)
+    relative = (w_calc - w_exp) / w_exp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if objective == 'rmsrd':
+            value = 100.0 * np.sqrt(np.mean(relative ** 2, axis=-1))
+        elif objective == 'aard':
+            value = 100.0 * np.mean(np.abs(relative), axis=-1)
+        elif objective == 'log':
+            value = np.sqrt(np.mean(np.log(w_calc / w_exp) ** 2, axis=-1))
+        else:
+            weights = np.ones(w_exp.shape[-1]) if weights is None else np.asarray(weights, dtype=float)
+            value = 100.0 * np.sqrt(np.sum(weights * relative ** 2, axis=-1) / np.sum(weights))
+    return np.where(np.isfinite(value), value, np.inf)
@@ -0,0 +1,94 @@
+import os
+import time
+import atexit
+import pickle
+import logging
+import threading
+import numpy as np
+
+
+CHECKPOINT_VERSION = 2
+
+
+# Journal of finished objective evaluations plus a little run state (seeds), written atomically every
+# `interval` seconds and at exit. The optimizers are deterministic given their seeds and the objective
+# values, so a resumed run replays the recorded evaluations from the journal (rebuilding the random design,
+# simplex and surrogate exactly) and only calls the solver for points it has not seen yet.
+# Replay is keyed by the exact parameter bytes, so it only reproduces paths decided by seeds and evaluation
+# counts. It is not exact after a restart when the path depends on timing or on the order in which
+# concurrent evaluations finish: wall-clock stopping (max_optimizer_seconds, campaign_max_seconds), multi-start
+# cancellation of dominated starts, a campaign budget shared with systems that ran before the interruption,
+# or a warm-start library that gained entries since. From the first differing point on, the resumed run calls
+# the solver again (the results stay valid, they are just not free).
+class EvaluationCheckpoint:
+    def __init__(self, path, interval=60.0, state=None, evaluations=None):
+        self.path = path
+        self.interval = interval
+        self.state = state if state is not None else {}
+        self.evaluations = evaluations if evaluations is not None else {}
+        self.resumed = evaluations is not None  # Loaded from a previous run's checkpoint
+        self.replayed = 0
+        self.closed = False
+        self._lock = threading.Lock()
+        self._last_save = time.perf_counter()
+        atexit.register(self.save)
+
+    @staticmethod
+    def key(params):
+        return np.asarray(params, dtype=float).tobytes()
+
+    # Function to return the recorded result (or the recorded failure) of a parameter set, None if not evaluated
+    def lookup(self, params):
+        with self._lock:
+            recorded = self.evaluations.get(self.key(params))
+            if recorded is not None:
+                self.replayed += 1
+        return recorded
+
+    # Function to record one finished evaluation; failures are recorded as the exception so they are not retried
+    def record(self, params, value):
+        with self._lock:
+            self.evaluations[self.key(params)] = value
+        if time.perf_counter() - self._last_save >= self.interval:
+            self.save()
+
+    def save(self):
+        if self.closed:
+            return
+        with self._lock:
+            data = {'version': CHECKPOINT_VERSION, 'state': dict(self.state), 'evaluations': dict(self.evaluations)}
+            self._last_save = time.perf_counter()
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(data, f)
+        os.replace(temporary_path, self.path)
+
+    # Function to delete the checkpoint once the system has finished
+    def remove(self):
+        self.closed = True
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        if self.replayed:
+            logging.info(f"Checkpoint answered {self.replayed} evaluations without running the solver")
+
+
+# Function to open the checkpoint of one system; with resume=True a previous checkpoint is loaded if present
+def open_checkpoint(path, resume=False, interval=60.0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if resume and os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') == CHECKPOINT_VERSION:
+            logging.info(f"Resuming from {path}: {len(data['evaluations'])} recorded evaluations")
+            return EvaluationCheckpoint(path, interval, data['state'], data['evaluations'])
+        logging.warning(f"Checkpoint {path} has an unsupported version. Starting from scratch.")
+    elif resume:
+        logging.info(f"No checkpoint at {path}. Starting from scratch.")
+    return EvaluationCheckpoint(path, interval)
+
+
+# Function to pick a fixed seed for a run (kept in the checkpoint so a resumed run draws the same points)
+def checkpoint_seed(checkpoint, name, seed=None):
+    if name not in checkpoint.state:
+        checkpoint.state[name] = seed if seed is not None else int(np.random.SeedSequence().entropy % 2 ** 32)
+    return checkpoint.state[name]
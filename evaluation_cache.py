@@ -0,0 +1,150 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+
+
+# Function to hash a file's bytes (used to tie cache entries to a specific executable build)
+def hash_file(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Persistent on-disk cache of PC-SAFT evaluations, keyed by the solver build, Exp_data_SLE.dat and the system's
+# full template rendered with the parameters (template identity plus parameter values), tagged with the kind of
+# run: 'objective' (trimmed template of the optimizer evaluations) or 'full' (the final run). The trimmed output
+# only has the SLE points at the experimental temperatures, so a full output can answer an objective lookup (e.g.
+# Step 2 re-scoring Step 1's optimized point) but not the other way round: the final run of a point that was only
+# evaluated by the optimizer still runs the solver for its full curve. Inputs not rendered from a template are
+# keyed by their content.
+class EvaluationCache:
+    def __init__(self, cache_path, max_size_mb=512, solver_id=""):
+        self.cache_path = cache_path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.solver_id = solver_id
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # One connection shared by the pool threads; other processes (Step 1 / Step 2) go through SQLite locking
+        self._connection = sqlite3.connect(cache_path, timeout=60, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                "key TEXT PRIMARY KEY, rmsrd REAL, calc_output BLOB, size INTEGER, "
+                "created REAL, last_used REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON evaluations (last_used)")
+            self._estimated_size = self._stored_size()
+
+    def _stored_size(self):
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM evaluations").fetchone()[0]
+
+    # Function to build the cache key from the solver input and the experimental data it is scored against
+    def make_key(self, inp_content, exp_data_content, run_kind=None):
+        digest = hashlib.sha256()
+        digest.update(self.solver_id.encode())
+        digest.update(b'\0')
+        digest.update(inp_content.encode() if isinstance(inp_content, str) else inp_content)
+        digest.update(b'\0')
+        digest.update(exp_data_content.encode() if isinstance(exp_data_content, str) else exp_data_content)
+        if run_kind is not None:
+            digest.update(b'\0' + run_kind.encode())
+        return digest.hexdigest()
+
+    # Returns (rmsrd, calc_output_bytes) or None; count_miss=False for a lookup that has another key to try
+    def get(self, key, count_miss=True):
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT rmsrd, calc_output FROM evaluations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                if count_miss:
+                    self.misses += 1
+                return None
+            self._connection.execute("UPDATE evaluations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        rmsrd, calc_output = row
+        return rmsrd, zlib.decompress(calc_output)
+
+    def put(self, key, rmsrd, calc_output):
+        compressed = zlib.compress(calc_output)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO evaluations (key, rmsrd, calc_output, size, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (key, rmsrd, compressed, len(compressed), now, now))
+            self._estimated_size += len(compressed)
+            if self._estimated_size > self.max_size_bytes:
+                self._evict_if_needed()
+
+    # Drop least recently used entries once the stored output exceeds the size limit
+    def _evict_if_needed(self):
+        # Other processes may have written or evicted too, so re-check the real size before deleting anything
+        total_size = self._stored_size()
+        self._estimated_size = total_size
+        if total_size <= self.max_size_bytes:
+            return
+
+        target_size = int(self.max_size_bytes * 0.9)
+        removed = 0
+        for key, size in self._connection.execute(
+                "SELECT key, size FROM evaluations ORDER BY last_used ASC").fetchall():
+            if total_size <= target_size:
+                break
+            self._connection.execute("DELETE FROM evaluations WHERE key = ?", (key,))
+            total_size -= size
+            removed += 1
+        self._estimated_size = total_size
+        logging.info(f"Evaluation cache evicted {removed} entries ({total_size} bytes kept)")
+
+    def close(self):
+        logging.info(f"Evaluation cache: {self.hits} hits, {self.misses} misses")
+        self._connection.close()
+
+
+# Function to open the cache shared by Step 1 and Step 2 in the main program directory
+def open_evaluation_cache(base_directory, executable_path, max_size_mb=512):
+    cache_path = os.path.join(base_directory, "pc_saft_cache.sqlite")
+    solver_id = hash_file(executable_path) if os.path.exists(executable_path) else ""
+    logging.info(f"Using evaluation cache {cache_path}")
+    return EvaluationCache(cache_path, max_size_mb, solver_id)
+
+
+# Function to restore a cached Calc_data_SLE.dat before launching the executable; returns (key, hit)
+# full_content is the full template rendered with the evaluated parameters (None keys on the input file itself);
+# an objective-only run is also answered by a cached full run of the same parameters
+def restore_cached_output(cache, inp_file, exp_data_file, calc_data_file, full_content=None, objective_only=False):
+    exp_data_content = b''
+    if os.path.exists(exp_data_file):
+        with open(exp_data_file, 'rb') as f:
+            exp_data_content = f.read()
+
+    if full_content is None:
+        with open(inp_file, 'rb') as f:
+            keys = [cache.make_key(f.read(), exp_data_content)]
+    elif objective_only:
+        keys = [cache.make_key(full_content, exp_data_content, 'objective'),
+                cache.make_key(full_content, exp_data_content, 'full')]
+    else:
+        keys = [cache.make_key(full_content, exp_data_content, 'full')]
+
+    for key in keys:
+        cached = cache.get(key, count_miss=(key == keys[-1]))
+        if cached is not None:
+            with open(calc_data_file, 'wb') as f:
+                f.write(cached[1])
+            logging.info(f"Evaluation cache hit: RMSRD={cached[0]}")
+            return keys[0], True
+    return keys[0], False
+
+
+# Function to store a fresh Calc_data_SLE.dat together with its RMSRD
+def store_output(cache, key, calc_data_file, rmsrd_value):
+    with open(calc_data_file, 'rb') as f:
+        cache.put(key, rmsrd_value, f.read())
@@ -0,0 +1,93 @@
+import os
+import shutil
+import queue
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Files every worker needs next to its own copy of the executable
+WORKER_INPUT_FILES = ("Input_ASD_template.inp", "Exp_data_SLE.dat")
+
+
+# Function to copy a file only if the destination is missing or out of date
+def copy_if_changed(source, destination):
+    if os.path.exists(destination):
+        source_stat = os.stat(source)
+        destination_stat = os.stat(destination)
+        if (source_stat.st_size == destination_stat.st_size
+                and int(source_stat.st_mtime) == int(destination_stat.st_mtime)):
+            return
+    shutil.copy2(source, destination)
+
+
+# Function to create one scratch directory per worker holding the executable, template and experimental data
+# (remote workers receive the input files with every task and pass input_files=())
+def create_worker_folders(pc_saft_folder, executable_path, num_workers, scratch_root=None,
+                          input_files=WORKER_INPUT_FILES):
+    if scratch_root is None:
+        scratch_root = os.path.join(pc_saft_folder, "pc_saft_workers")
+
+    worker_folders = []
+    for worker_index in range(1, num_workers + 1):
+        worker_folder = os.path.join(scratch_root, f"worker_{worker_index}")
+        os.makedirs(worker_folder, exist_ok=True)
+
+        # The native backend and the remote pool need no executable, so a missing one is not an error here
+        if executable_path and os.path.exists(executable_path):
+            copy_if_changed(executable_path, os.path.join(worker_folder, os.path.basename(executable_path)))
+        for file_name in input_files:
+            source = os.path.join(pc_saft_folder, file_name)
+            if os.path.exists(source):
+                copy_if_changed(source, os.path.join(worker_folder, file_name))
+            else:
+                logging.warning(f"{file_name} not found in {pc_saft_folder}. Worker {worker_index} will run without it.")
+
+        worker_folders.append(worker_folder)
+    return worker_folders
+
+
+# Pool of PC-SAFT workers, each running the executable inside its own scratch directory
+class EvaluationPool:
+    def __init__(self, pc_saft_folder, executable_path, num_workers=None, scratch_root=None,
+                 input_files=WORKER_INPUT_FILES):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_workers = max(1, int(num_workers))
+        self.executable_name = os.path.basename(executable_path) if executable_path else None
+        self.worker_folders = create_worker_folders(pc_saft_folder, executable_path, self.num_workers, scratch_root,
+                                                    input_files)
+
+        # Free worker folders are handed out one at a time, so no two runs share a directory
+        self._free_folders = queue.Queue()
+        for worker_folder in self.worker_folders:
+            self._free_folders.put(worker_folder)
+
+        # The executable does the heavy lifting in its own process, so threads are enough here
+        self._executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        logging.info(f"Started PC-SAFT evaluation pool with {self.num_workers} worker(s)")
+
+    def _run_in_worker(self, func, item):
+        worker_folder = self._free_folders.get()
+        try:
+            worker_executable = os.path.join(worker_folder, self.executable_name)
+            return func(item, worker_folder, worker_executable)
+        finally:
+            self._free_folders.put(worker_folder)
+
+    # Submit one evaluation; func is called as func(item, worker_folder, worker_executable)
+    def submit(self, func, item):
+        return self._executor.submit(self._run_in_worker, func, item)
+
+    # Evaluate all items concurrently and return the results in input order
+    def map(self, func, items):
+        futures = [self.submit(func, item) for item in items]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
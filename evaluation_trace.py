@@ -0,0 +1,230 @@
+import sys
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+
+# Stages of one evaluation, in the order they run
+STAGES = ('render', 'stage_files', 'cache', 'solver', 'output_wait', 'parse', 'record')
+PERCENTILES = (50, 90, 99)
+
+
+# Timing trace of one system run: every evaluation with its per-stage breakdown and every optimizer step with
+# the optimizer's own overhead (the time since the previous step returned). Records are kept for the summary
+# and, with a path, appended as JSON lines (one 'run' header, then 'evaluation' and 'optimizer' records; times
+# in seconds since the start of the run).
+class EvaluationTracer:
+    def __init__(self, path, system, step):
+        self.path = path
+        self.system = system
+        self.step = step
+        self.records = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', buffering=1) if path else None  # Line-buffered: readable while running
+        self._write({'type': 'run', 'system': system, 'step': step, 'started': time.time()})
+
+    def _now(self):
+        return time.perf_counter() - self._origin
+
+    def _write(self, record):
+        with self._lock:
+            if record['type'] != 'run':
+                self.records.append(record)
+            if self._file is not None:
+                self._file.write(json.dumps(record) + "\n")
+
+    # Function to time one evaluation (a batch of `points` for the vectorized native backend)
+    # Stages timed inside it are added to its breakdown; an exception marks it failed
+    @contextmanager
+    def evaluation(self, phase, dataset_index=None, points=1):
+        record = {'type': 'evaluation', 'phase': phase, 'dataset_index': dataset_index, 'points': points,
+                  'thread': threading.current_thread().name, 'start': self._now(), 'status': 'ok', 'stages': {}}
+        outer = getattr(self._local, 'record', None)
+        self._local.record = record
+        try:
+            yield record
+        except BaseException:
+            record['status'] = 'failed'
+            raise
+        finally:
+            record['duration'] = self._now() - record['start']
+            self._local.record = outer
+            self._write(record)
+
+    @contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start_time)
+
+    # Function to add time to a stage of the evaluation running in this thread (ignored outside evaluations)
+    def add_stage(self, name, seconds):
+        record = getattr(self._local, 'record', None)
+        if record is not None:
+            record['stages'][name] = record['stages'].get(name, 0.0) + seconds
+
+    # Function to set a field (e.g. status='cached') on the evaluation running in this thread
+    def note(self, **fields):
+        record = getattr(self._local, 'record', None)
+        if record is not None:
+            record.update(fields)
+
+    # Function to time one optimizer step of `points` evaluations; the time since the previous step of the same
+    # optimizer returned in this thread is the optimizer's own overhead (simplex update, model fit, sampling)
+    @contextmanager
+    def optimizer_step(self, label, points=1):
+        last_ends = self._local.__dict__.setdefault('optimizer_ends', {})
+        start = self._now()
+        overhead = start - last_ends[label] if label in last_ends else None
+        try:
+            yield
+        finally:
+            end = self._now()
+            last_ends[label] = end
+            self._write({'type': 'optimizer', 'label': label, 'points': points,
+                         'thread': threading.current_thread().name, 'start': start, 'duration': end - start,
+                         'overhead': overhead})
+
+    # Function to wrap the objective handed to an optimizer so every call is traced as one optimizer step
+    # (batch=True: the first argument is the list of points evaluated in that step)
+    def traced_objective(self, function, label, batch=False):
+        def traced(*args, **kwargs):
+            with self.optimizer_step(label, len(args[0]) if batch else 1):
+                return function(*args, **kwargs)
+        return traced
+
+    def summary(self):
+        return format_summary(self.records, self.system, self.step)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Function to format percentiles of a list of durations in milliseconds
+def format_percentiles(values):
+    return " ".join(f"{value * 1000:9.1f}" for value in np.percentile(values, PERCENTILES))
+
+
+# Function to summarize the records of one run: throughput, per-stage percentiles and optimizer overhead
+def format_summary(records, system, step):
+    evaluations = [record for record in records if record['type'] == 'evaluation']
+    steps = [record for record in records if record['type'] == 'optimizer']
+    wall_time = max((record['start'] + record['duration'] for record in records), default=0.0)
+    points = sum(record['points'] for record in evaluations)
+    rate = points / wall_time if wall_time > 0 else 0.0
+
+    lines = [f"Timing summary for {system} (step {step}): {points} evaluations in {wall_time:.1f} s "
+             f"({rate:.3f} evaluations/s)"]
+    if not evaluations:
+        return "\n".join(lines) + "\n"
+
+    percentile_header = " ".join(f"{'p' + str(p) + '/ms':>9}" for p in PERCENTILES)
+    lines.append(f"{'stage':<14} {'count':>6} {'total/s':>9} {'share':>6} {percentile_header}")
+    total_time = sum(record['duration'] for record in evaluations)
+    rows = [('evaluation', [record['duration'] for record in evaluations])]
+    for name in STAGES + tuple(sorted({name for record in evaluations for name in record['stages']} - set(STAGES))):
+        values = [record['stages'][name] for record in evaluations if name in record['stages']]
+        if values:
+            rows.append((name, values))
+    rows.append(('other', [max(record['duration'] - sum(record['stages'].values()), 0.0)
+                           for record in evaluations]))
+    for name, values in rows:
+        share = 100.0 * sum(values) / total_time if total_time > 0 else 0.0
+        lines.append(f"{name:<14} {len(values):>6} {sum(values):9.2f} {share:5.1f}% {format_percentiles(values)}")
+
+    phases = {}
+    for record in evaluations:
+        phases.setdefault(record['phase'], []).append(record)
+    lines.append("By phase: " + ", ".join(
+        f"{phase} {sum(record['points'] for record in phase_records)} "
+        f"({sum(record['status'] == 'failed' for record in phase_records)} failed, "
+        f"{sum(record['status'] == 'cached' for record in phase_records)} cached)"
+        for phase, phase_records in phases.items()))
+
+    labels = {}
+    for record in steps:
+        labels.setdefault(record['label'], []).append(record)
+    for label, label_steps in labels.items():
+        overheads = [record['overhead'] for record in label_steps if record['overhead'] is not None]
+        step_time = sum(record['duration'] for record in label_steps)
+        text = (f"Optimizer {label}: {len(label_steps)} steps, "
+                f"{sum(record['points'] for record in label_steps)} points, {step_time:.2f} s evaluating")
+        if overheads:
+            text += (f", overhead {sum(overheads):.2f} s (p{'/p'.join(str(p) for p in PERCENTILES)} "
+                     f"{'/'.join(f'{value * 1000:.1f}' for value in np.percentile(overheads, PERCENTILES))} ms)")
+        lines.append(text)
+    return "\n".join(lines) + "\n"
+
+
+# Function to read a JSON lines trace as a list of runs, each a (header, records) pair
+def load_trace(path):
+    runs = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record['type'] == 'run':
+                runs.append((record, []))
+            elif runs:
+                runs[-1][1].append(record)
+    return runs
+
+
+# Function to convert trace records to Chrome trace events (chrome://tracing, Perfetto)
+# Stages only carry their total time, so they are drawn back to back from the start of their evaluation
+def chrome_trace_events(runs):
+    events = []
+    for run_index, (header, records) in enumerate(runs, start=1):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': run_index,
+                       'args': {'name': f"{header['system']} step {header['step']}"}})
+        thread_ids = {}
+        for record in records:
+            if record['thread'] not in thread_ids:
+                thread_ids[record['thread']] = len(thread_ids) + 1
+                events.append({'name': 'thread_name', 'ph': 'M', 'pid': run_index,
+                               'tid': thread_ids[record['thread']], 'args': {'name': record['thread']}})
+            thread_id = thread_ids[record['thread']]
+            name = record['phase'] if record['type'] == 'evaluation' else f"optimizer {record['label']}"
+            events.append({'name': name, 'ph': 'X', 'pid': run_index, 'tid': thread_id,
+                           'ts': record['start'] * 1e6, 'dur': record['duration'] * 1e6,
+                           'args': {key: value for key, value in record.items() if key not in ('start', 'duration')}})
+            offset = record['start']
+            for stage_name in STAGES:
+                seconds = record.get('stages', {}).get(stage_name)
+                if seconds:
+                    events.append({'name': stage_name, 'ph': 'X', 'pid': run_index, 'tid': thread_id,
+                                   'ts': offset * 1e6, 'dur': seconds * 1e6})
+                    offset += seconds
+    return events
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize an evaluation timing trace "
+                                                 "(generated_RMSRD_values/<drug_polymer>_step<N>_trace.jsonl).")
+    parser.add_argument("trace")
+    parser.add_argument("--chrome", metavar="OUTPUT", help="Also write the trace in Chrome trace format")
+    args = parser.parse_args(argv)
+
+    runs = load_trace(args.trace)
+    for header, records in runs:
+        print(f"Run started {time.strftime('%Y-%m-%d %H:%M', time.localtime(header['started']))}")
+        print(format_summary(records, header['system'], header['step']))
+    if args.chrome:
+        with open(args.chrome, 'w') as f:
+            json.dump({'traceEvents': chrome_trace_events(runs)}, f)
+        print(f"Wrote Chrome trace to {args.chrome}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
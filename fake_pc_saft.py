@@ -0,0 +1,128 @@
+import os
+import sys
+import stat
+import time
+import random
+import argparse
+import numpy as np
+from inp_template import PARAMETER_NAMES
+from pc_saft_native import parse_inp_content, read_exp_data, PURE_COMPONENT_FIELDS
+
+
+# Known optimum of the analytic RMSRD function (inside the example ranges of the README) and per-parameter
+# weights, so the problem is anisotropic like a real fit; B and G are coupled (segment diameters correlate)
+FAKE_OPTIMUM = np.array([0.0292, 3.62, 310.0, 1290.0, 0.0487, 0.0423, 2.91, 251.0])
+FAKE_WEIGHTS = np.array([1.0, 4.0, 0.5, 0.25, 0.5, 2.0, 8.0, 1.0])
+FAKE_COUPLING = 10.0
+
+# Field of each parameter in the default template (A..E on the API line, F..H on the polymer line)
+DEFAULT_PARAMETER_FIELDS = [(0, 'm_per_Mw'), (0, 'sigma'), (0, 'epsk'), (0, 'epsk_hb'), (0, 'kappa_hb'),
+                            (1, 'm_per_Mw'), (1, 'sigma'), (1, 'epsk')]
+
+
+# Function to find where the placeholders A*..H* sit in the template (component, field) for each parameter
+def parameter_fields(template_file):
+    if not os.path.exists(template_file):
+        return DEFAULT_PARAMETER_FIELDS
+    with open(template_file, 'r') as f:
+        template = parse_inp_content(f.read())
+    fields = dict(enumerate(DEFAULT_PARAMETER_FIELDS))
+    for component_index, component in enumerate(template['components']):
+        for field in PURE_COMPONENT_FIELDS:
+            value = component.get(field)
+            if isinstance(value, tuple):
+                fields[value[1]] = (component_index, field)
+    return [fields[index] for index in range(len(PARAMETER_NAMES))]
+
+
+# Function to read A..H back from a rendered Input_ASD.inp
+def read_parameters(input_file, template_file):
+    with open(input_file, 'r') as f:
+        system = parse_inp_content(f.read())
+    params = [system['components'][component_index][field]
+              for component_index, field in parameter_fields(template_file)]
+    return system, np.array(params, dtype=float)
+
+
+# Function to compute the relative residual at every experimental temperature
+# r_i = shape_i * d(p) with d = sum(weight z^2) + coupling (z_B - z_G)^2 and z the relative distance to the
+# optimum, so RMSRD = 100 rms(shape) d(p) is known in closed form (0 at FAKE_OPTIMUM) and the points differ
+def fake_relative_residuals(params, T_exp, optimum=FAKE_OPTIMUM):
+    z = (np.asarray(params, dtype=float) - optimum) / optimum
+    distance = np.sum(FAKE_WEIGHTS * z ** 2) + FAKE_COUPLING * (z[1] - z[6]) ** 2
+    spread = np.ptp(T_exp) if len(T_exp) > 1 else 1.0
+    shape = 1.0 + 0.5 * (T_exp - np.mean(T_exp)) / spread
+    return distance * shape
+
+
+# Function giving the analytic RMSRD in percent (what the stand-in solver writes for these parameters)
+def fake_rmsrd(params, T_exp, optimum=FAKE_OPTIMUM):
+    relative = fake_relative_residuals(params, T_exp, optimum)
+    return 100.0 * np.sqrt(np.mean(relative ** 2))
+
+
+# Function to write Calc_data_SLE.dat in the layout of the native backend: the points at the experimental
+# temperatures, the RMSRD line and a calculated curve over the template's SLE temperature range
+def write_calc_output(output_file, system, T_exp, w_exp, w_calc, rmsrd_value):
+    t_min, t_max, t_step = system['T_range']
+    T_curve = np.arange(t_min, t_max + 0.5 * t_step, t_step) if t_step > 0 else np.array([t_min])
+    order = np.argsort(T_exp)
+    w_curve = np.clip(np.interp(T_curve, T_exp[order], w_calc[order]), 0.0, 1.0)
+
+    with open(output_file, 'w') as f:
+        f.write(f"# {system['title']}: SLE of API (1) in polymer (2), stand-in PC-SAFT solver\n")
+        f.write("# T_exp/K   w_API_exp   w_API_calc\n")
+        for T, w_e, w_c in zip(T_exp, w_exp, w_calc):
+            f.write(f"{T:10.2f}  {w_e:12.6e}  {w_c:12.6e}\n")
+        f.write(f"# RMSRD/% {float(rmsrd_value):.6f} ({len(T_exp)} points)\n")
+        f.write("# T/K   w_API_calc\n")
+        for T, w_c in zip(T_curve, w_curve):
+            f.write(f"{T:10.2f}  {w_c:12.6e}\n")
+
+
+# Function to install the stand-in as an executable (e.g. <base>/PC_SAFT_ASD_v2022.12.exe) with fixed options
+# The wrapper runs this module with the current interpreter, so it works from any working directory
+def install_fake_solver(executable_path, latency=0.0, jitter=0.0, failure_rate=0.0):
+    module_directory = os.path.dirname(os.path.abspath(__file__))
+    argv = ["--latency", str(latency), "--jitter", str(jitter), "--failure-rate", str(failure_rate)]
+    with open(executable_path, 'w') as f:
+        f.write(f"#!{sys.executable}\n"
+                "import sys\n"
+                f"sys.path.insert(0, {module_directory!r})\n"
+                "from fake_pc_saft import main\n"
+                f"sys.exit(main({argv!r}))\n")
+    os.chmod(executable_path, os.stat(executable_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return executable_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stand-in for PC_SAFT_ASD_v2022.12.exe: reads Input_ASD.inp in "
+                                                 "the working directory and writes Calc_data_SLE.dat with an "
+                                                 "analytic RMSRD (minimum 0 at a known parameter set).")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean run time in seconds (default 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Standard deviation of the run time in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Fraction of runs that exit with an error and write no output")
+    parser.add_argument("--install", metavar="EXECUTABLE",
+                        help="Instead of running, write an executable wrapper with these options to EXECUTABLE")
+    args = parser.parse_args(argv)
+
+    if args.install:
+        install_fake_solver(args.install, args.latency, args.jitter, args.failure_rate)
+        print(f"Installed stand-in PC-SAFT solver at {args.install}")
+        return 0
+
+    system, params = read_parameters("Input_ASD.inp", "Input_ASD_template.inp")
+    T_exp, w_exp = read_exp_data("Exp_data_SLE.dat")
+    time.sleep(max(0.0, random.gauss(args.latency, args.jitter)) if args.jitter > 0 else args.latency)
+    if random.random() < args.failure_rate:
+        print("Stand-in PC-SAFT solver: simulated failure", file=sys.stderr)
+        return 1
+
+    w_calc = w_exp * (1.0 + fake_relative_residuals(params, T_exp))
+    write_calc_output("Calc_data_SLE.dat", system, T_exp, w_exp, w_calc, fake_rmsrd(params, T_exp))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
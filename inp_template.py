@@ -0,0 +1,97 @@
+import re
+import logging
+
+
+# Placeholder tokens in Input_ASD_template.inp: A* ... H*
+PARAMETER_NAMES = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+PLACEHOLDER_PATTERN = re.compile(r'(?<![\w.*])([A-H])\*')
+
+
+# Function to read the experimental temperatures (first column) from Exp_data_SLE.dat
+def read_experimental_temperatures(exp_data_file):
+    temperatures = []
+    with open(exp_data_file, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if not fields or line.lstrip().startswith('#'):
+                continue
+            try:
+                temperatures.append(float(fields[0]))
+            except ValueError:
+                continue  # Skip header or free-text lines
+    return temperatures
+
+
+# Function to replace the value part of a template line while keeping its indentation and "!!" comment
+def replace_line_values(line, new_values):
+    indent = line[:len(line) - len(line.lstrip())]
+    line_ending = line[len(line.rstrip('\r\n')):]
+    comment_start = line.find('!!')
+    comment = line[comment_start:] if comment_start >= 0 else line_ending
+    return f"{indent}{new_values}\t\t{comment}"
+
+
+# Function to rewrite the template so the solver only computes what RMSRD needs:
+# the SLE range collapses onto the experimental temperatures and the LLE calculation is switched off
+def make_objective_only_template(content, exp_temperatures):
+    lines = content.splitlines(keepends=True)
+    section = None
+    sle_range_found = False
+
+    for i, line in enumerate(lines):
+        if line.startswith('###'):
+            section = 'SLE' if 'SLE' in line else 'LLE' if 'LLE' in line else None
+            continue
+
+        if section == 'SLE' and 'T_min | T_max | T_step' in line and exp_temperatures:
+            t_min = min(exp_temperatures)
+            t_max = max(exp_temperatures)
+            # One step spanning the experimental range, so only its end points are added to T_exp
+            t_step = t_max - t_min if t_max > t_min else 1.0
+            lines[i] = replace_line_values(line, f"{t_min:.2f}\t{max(t_max, t_min + t_step):.2f}\t{t_step:.2f}")
+            sle_range_found = True
+        elif section == 'LLE' and ('Calculate LLE' in line or 'Print LLE calculation progress' in line):
+            lines[i] = replace_line_values(line, '.false.')
+
+    if not sle_range_found:
+        logging.warning("SLE temperature range line not found in template; objective-only mode leaves it unchanged")
+    return ''.join(lines)
+
+
+# Template parsed once into literal segments and placeholder slots, rendered in a single pass
+class CompiledTemplate:
+    def __init__(self, content, float_format="{:#.12g}"):
+        self.content = content
+        self.float_format = float_format
+        self._segments = []
+        self._fields = []
+
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(content):
+            self._segments.append(content[position:match.start()])
+            self._fields.append(match.group(1))
+            position = match.end()
+        self._segments.append(content[position:])
+
+        missing = [name for name in PARAMETER_NAMES if name not in self._fields]
+        if missing:
+            logging.warning(f"Template has no placeholder for {', '.join(name + '*' for name in missing)}")
+
+    @classmethod
+    def from_file(cls, template_path, float_format="{:#.12g}"):
+        with open(template_path, "r") as template_file:
+            return cls(template_file.read(), float_format)
+
+    # Compiled variant with the SLE range collapsed onto the experimental temperatures and LLE switched off
+    def objective_only(self, exp_temperatures):
+        return CompiledTemplate(make_objective_only_template(self.content, exp_temperatures), self.float_format)
+
+    # Render a dataset dict ({'A': ..., ...}) or a parameter vector in A..H order
+    def render(self, values):
+        if not isinstance(values, dict):
+            values = dict(zip(PARAMETER_NAMES, values))
+        parts = [self._segments[0]]
+        for name, segment in zip(self._fields, self._segments[1:]):
+            parts.append(self.float_format.format(float(values[name])))
+            parts.append(segment)
+        return ''.join(parts)
@@ -0,0 +1,86 @@
+import logging
+import numpy as np
+from scipy.optimize import least_squares
+
+
+LEAST_SQUARES_METHODS = ('trf', 'dogbox')
+
+
+# Residual function and finite-difference Jacobian for scipy's least_squares, where all Jacobian columns
+# are one batch: batch_residuals(list_of_points) returns the residual vectors in the same order, so with a
+# pool the 8 (forward) or 16 (central) perturbed solver runs of an iteration run at the same time
+# The residuals must be finite; the Steps score failed runs with a finite penalty (see calc_output.scaled_residuals)
+class ParallelJacobian:
+    def __init__(self, batch_residuals, bounds, diff_step=1e-3, central=False):
+        self.batch_residuals = batch_residuals
+        self.lower = np.asarray([bound[0] for bound in bounds], dtype=float)
+        self.upper = np.asarray([bound[1] for bound in bounds], dtype=float)
+        self.diff_step = diff_step
+        self.central = central
+        self.nfev = 0
+        self.batches = 0
+        self._last_x = None
+        self._last_residuals = None
+
+    def _evaluate(self, points):
+        values = [np.asarray(value, dtype=float) for value in self.batch_residuals(points)]
+        self.nfev += len(points)
+        self.batches += 1
+        return values
+
+    def residuals(self, x):
+        x = np.asarray(x, dtype=float)
+        if self._last_x is None or not np.array_equal(x, self._last_x):
+            self._last_residuals = self._evaluate([x])[0]
+            self._last_x = x.copy()
+        return self._last_residuals
+
+    # Function to step each parameter by diff_step of its range (or of its value when unbounded)
+    def _steps(self, x):
+        width = self.upper - self.lower
+        scale = np.where(np.isfinite(width), width, np.maximum(np.abs(x), 1.0))
+        return self.diff_step * scale
+
+    def jacobian(self, x):
+        x = np.asarray(x, dtype=float)
+        steps = self._steps(x)
+        if self.central:
+            points = [x + step * unit for step, unit in zip(steps, np.eye(len(x)))]
+            points += [x - step * unit for step, unit in zip(steps, np.eye(len(x)))]
+            points = [np.clip(point, self.lower, self.upper) for point in points]
+            values = self._evaluate(points)
+            n = len(x)
+            columns = [(values[i] - values[n + i]) / (points[i][i] - points[n + i][i]) for i in range(n)]
+        else:
+            # Step away from an upper bound instead of across it
+            steps = np.where(x + steps > self.upper, -steps, steps)
+            points = [x + step * unit for step, unit in zip(steps, np.eye(len(x)))]
+            values = self._evaluate(points)
+            base = self.residuals(x)
+            columns = [(value - base) / step for value, step in zip(values, steps)]
+        return np.column_stack(columns)
+
+
+# Function to fit the parameters to a residual vector with a bounded trust-region method ('trf' or 'dogbox')
+# max_nfev counts residual evaluations at trial points; each Jacobian adds one batch of len(x0) (forward)
+# or 2 len(x0) (central) runs
+def parallel_least_squares(batch_residuals, x0, bounds=None, max_nfev=None, method='trf', diff_step=1e-3,
+                           central=False):
+    if method not in LEAST_SQUARES_METHODS:
+        raise ValueError(f"Unknown least-squares method '{method}', expected one of "
+                         f"{', '.join(LEAST_SQUARES_METHODS)}")
+    if bounds is None:
+        bounds = [(-np.inf, np.inf)] * len(x0)
+
+    evaluator = ParallelJacobian(batch_residuals, bounds, diff_step, central)
+    width = evaluator.upper - evaluator.lower
+    x_scale = width if np.all(np.isfinite(width)) else 'jac'
+    x0 = np.clip(np.asarray(x0, dtype=float), evaluator.lower, evaluator.upper)
+
+    result = least_squares(evaluator.residuals, x0, jac=evaluator.jacobian, bounds=(evaluator.lower, evaluator.upper),
+                           method=method, x_scale=x_scale, max_nfev=max_nfev)
+    result.nbatches = evaluator.batches
+    result.nfev_total = evaluator.nfev
+    logging.info(f"Least squares ({method}): RMSRD {np.linalg.norm(result.fun)} after {evaluator.nfev} evaluations "
+                 f"in {evaluator.batches} batches")
+    return result
@@ -0,0 +1,91 @@
+import logging
+import threading
+import numpy as np
+from stopping_criteria import StopOptimization
+
+
+# Raised inside a start's objective to stop a start that is clearly dominated by the global best
+class StartCancelled(Exception):
+    pass
+
+
+# Best RMSRD found by any start, shared between the worker threads
+class SharedBest:
+    def __init__(self):
+        self.value = float('inf')
+        self.parameters = None
+        self.start_index = None
+        self._lock = threading.Lock()
+
+    def update(self, value, parameters, start_index):
+        with self._lock:
+            if value < self.value:
+                self.value = value
+                self.parameters = np.array(parameters, dtype=float)
+                self.start_index = start_index
+                logging.info(f"New global best RMSRD={value} from start {start_index}")
+
+
+# Called after every evaluation of one start; tracks its best point and cancels it when dominated
+class StartMonitor:
+    def __init__(self, start_index, shared_best, dominance_ratio, min_evaluations):
+        self.start_index = start_index
+        self.shared_best = shared_best
+        self.dominance_ratio = dominance_ratio
+        self.min_evaluations = min_evaluations
+        self.best_value = float('inf')
+        self.best_parameters = None
+        self.evaluations = 0
+
+    def __call__(self, parameters, value):
+        self.evaluations += 1
+        if value < self.best_value:
+            self.best_value = value
+            self.best_parameters = np.array(parameters, dtype=float)
+            self.shared_best.update(value, parameters, self.start_index)
+
+        # Give every start a fair number of evaluations before comparing it with the others
+        if (self.dominance_ratio is not None and self.evaluations >= self.min_evaluations
+                and self.shared_best.start_index != self.start_index
+                and self.best_value > self.dominance_ratio * self.shared_best.value):
+            raise StartCancelled(f"start {self.start_index} dominated: best RMSRD {self.best_value} vs "
+                                 f"global best {self.shared_best.value}")
+
+
+# Function to refine several starting points at the same time, one pool worker (and sandbox) per start
+# optimize(initial_guess, work_folder, executable, monitor) runs one local optimization and calls monitor
+# after every evaluation; starts is a list of (initial_rmsrd, initial_guess) pairs
+def run_multistart(optimize, starts, pool, dominance_ratio=1.5, min_evaluations=20):
+    shared_best = SharedBest()
+
+    def run_start(item, worker_folder, worker_executable):
+        start_index, (initial_rmsrd, initial_guess) = item
+        monitor = StartMonitor(start_index, shared_best, dominance_ratio, min_evaluations)
+        status = 'completed'
+        try:
+            optimize(initial_guess, worker_folder, worker_executable, monitor)
+        except StartCancelled as e:
+            logging.info(f"Cancelled {e}")
+            status = 'cancelled'
+        except StopOptimization:
+            status = 'stopped'  # A stopping criterion of the whole run was met
+        return {'start': start_index, 'initial_rmsrd': initial_rmsrd, 'rmsrd': monitor.best_value,
+                'parameters': monitor.best_parameters, 'evaluations': monitor.evaluations, 'status': status}
+
+    logging.info(f"Multi-start refinement of {len(starts)} starting points on {pool.num_workers} worker(s)")
+    futures = [pool.submit(run_start, item) for item in enumerate(starts, start=1)]
+    results = [future.result() for future in futures]
+    return sorted(results, key=lambda result: result['rmsrd'])
+
+
+# Function to format the ranked multi-start results for the RMSRD values file
+def format_multistart_table(results, parameter_names):
+    lines = [f"Multi-start refinement ({len(results)} starts, ranked by RMSRD):"]
+    for rank, result in enumerate(results, start=1):
+        if result['parameters'] is None:
+            values = "no successful evaluation"
+        else:
+            values = ", ".join(f"{name}={value}" for name, value in zip(parameter_names, result['parameters']))
+        lines.append(f"Rank {rank}: start {result['start']} (initial RMSRD={result['initial_rmsrd']}, "
+                     f"{result['evaluations']} evaluations, {result['status']}): {values} => RMSRD={result['rmsrd']}")
+    return "\n".join(lines) + "\n"
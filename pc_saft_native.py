@@ -0,0 +1,362 @@
+import os
+import logging
+import numpy as np
+from inp_template import PARAMETER_NAMES
+
+
+# Placeholder tokens in Input_ASD_template.inp and their column in a parameter matrix
+PLACEHOLDERS = {f"{name}*": index for index, name in enumerate(PARAMETER_NAMES)}
+
+BOLTZMANN = 1.380649e-23  # J/K
+GAS_CONSTANT = 8.314462618  # J/(mol K)
+PRESSURE = 1.0e5  # Pa; SLE is evaluated at atmospheric pressure
+
+# Universal PC-SAFT dispersion constants (Gross & Sadowski, 2001)
+A_CONSTANTS = np.array([
+    [0.9105631445, 0.6361281449, 2.6861347891, -26.547362491, 97.759208784, -159.59154087, 91.297774084],
+    [-0.3084016918, 0.1860531159, -2.5030047259, 21.419793629, -65.255885330, 83.318680481, -33.746922930],
+    [-0.0906148351, 0.4527842806, 0.5962700728, -1.7241829131, -4.1302112531, 13.776631870, -8.6728470368]])
+B_CONSTANTS = np.array([
+    [0.7240946941, 2.2382791861, -4.0025849485, -21.003576815, 26.855641363, 206.55133841, -355.60235612],
+    [-0.5755498075, 0.6995095521, 3.8925673390, -17.215471648, 192.67226447, -161.82646165, -165.20769346],
+    [0.0976883116, -0.2557574982, -9.1558561530, 20.642075974, -38.804430052, 93.626774077, -29.666905585]])
+
+# Column order of a pure-component line in the template
+PURE_COMPONENT_FIELDS = ['m_per_Mw', 'sigma', 'epsk', 'epsk_hb', 'kappa_hb', 'n_hb', 'n_don', 'n_acc',
+                         'Mw_mono', 'weight_frac']
+
+
+# Function to split the value part of a template line (everything before the first "!")
+def _line_tokens(line):
+    return line.split('!', 1)[0].split()
+
+
+# Function to turn a template token into a float or a placeholder index
+def _parse_token(token):
+    if token in PLACEHOLDERS:
+        return ('param', PLACEHOLDERS[token])
+    return float(token.replace('d', 'e').replace('D', 'E'))
+
+
+# Function to parse the system definition and SLE settings from Input_ASD(_template).inp content
+def parse_inp_content(content):
+    lines = [line for line in content.splitlines() if line.strip() and not line.lstrip().startswith('#')]
+    values = iter(lines)
+
+    system = {'title': next(values).split('!', 1)[0].strip()}
+    mw_tokens = _line_tokens(next(values))
+    system['Mw'] = [float(mw_tokens[0]), float(mw_tokens[1])]
+
+    subcomponent_tokens = _line_tokens(next(values))
+    subcomponents = [int(subcomponent_tokens[0]), int(subcomponent_tokens[1])]
+    if subcomponents != [1, 1]:
+        raise ValueError("Native PC-SAFT backend only supports one API and one polymer subcomponent, "
+                         f"got {subcomponents[0]} and {subcomponents[1]}")
+
+    system['components'] = []
+    for _ in range(2):
+        tokens = _line_tokens(next(values))
+        system['components'].append({field: _parse_token(token)
+                                     for field, token in zip(PURE_COMPONENT_FIELDS, tokens)})
+
+    system['kij'] = 0.0
+    for _ in range(int(_line_tokens(next(values))[0])):
+        tokens = _line_tokens(next(values))
+        if int(tokens[0]) != int(tokens[2]):
+            system['kij'] = _parse_token(tokens[4])
+
+    system['calculate_sle'] = _line_tokens(next(values))[0].lower() == '.true.'
+    fusion_tokens = _line_tokens(next(values))
+    system['T_fus'], system['H_fus'], system['Cp_fus_a'], system['Cp_fus_b'] = \
+        [float(token) for token in fusion_tokens[:4]]
+    next(values)  # Include experimental SLE data
+    next(values)  # Optimize k_ij
+    next(values)  # Number of k_ij(s) to optimize
+    next(values)  # k_ij range
+    system['T_range'] = [float(token) for token in _line_tokens(next(values))[:3]]
+    return system
+
+
+# Function to read T and w_API (and the optional data-set flag) from Exp_data_SLE.dat
+def read_exp_data(exp_data_file):
+    rows = []
+    with open(exp_data_file, 'r') as f:
+        for line in f:
+            fields = line.split()
+            if not fields or line.lstrip().startswith('#'):
+                continue
+            try:
+                rows.append([float(field) for field in fields[:2]])
+            except ValueError:
+                continue
+    data = np.array(rows, dtype=float).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+# Function to resolve a parsed field (constant or placeholder) for a batch of parameter sets
+def _field_values(field, params):
+    if isinstance(field, tuple):
+        return params[:, field[1]]
+    return np.full(params.shape[0], field)
+
+
+# Function to build per-batch component arrays (last axis = API, polymer) from the parsed system
+def build_component_arrays(system, params):
+    params = np.atleast_2d(np.asarray(params, dtype=float))
+    Mw = np.array(system['Mw'])
+    arrays = {}
+    for field in PURE_COMPONENT_FIELDS:
+        arrays[field] = np.stack([_field_values(component[field], params) for component in system['components']],
+                                 axis=-1)
+
+    # Segment number from m/Mw, association sites per molecule from the per-monomer counts
+    arrays['m'] = arrays['m_per_Mw'] * Mw
+    arrays['n_don'] = arrays['n_don'] * Mw / arrays['Mw_mono']
+    arrays['n_acc'] = arrays['n_acc'] * Mw / arrays['Mw_mono']
+    arrays['kij'] = _field_values(system['kij'], params)
+    arrays['Mw'] = np.broadcast_to(Mw, arrays['m'].shape)
+    return arrays
+
+
+# Function to compute the reduced residual Helmholtz energy; all arrays broadcast, components on the last axis
+def residual_helmholtz(T, rho, x, comp, max_association_iterations=500):
+    T_c = T[..., None]
+    m, sigma, epsk = comp['m'], comp['sigma'], comp['epsk']
+
+    d = sigma * (1.0 - 0.12 * np.exp(-3.0 * epsk / T_c))
+    zeta = [np.pi / 6.0 * rho * np.sum(x * m * d ** n, axis=-1) for n in range(4)]
+    zeta0, zeta1, zeta2, zeta3 = zeta
+    eta = zeta3
+    one_minus = 1.0 - zeta3
+
+    # Hard-sphere and hard-chain contributions
+    a_hs = (3.0 * zeta1 * zeta2 / one_minus + zeta2 ** 3 / (zeta3 * one_minus ** 2)
+            + (zeta2 ** 3 / zeta3 ** 2 - zeta0) * np.log(one_minus)) / zeta0
+    d_ratio = (d[..., :, None] * d[..., None, :]) / (d[..., :, None] + d[..., None, :])
+    z2 = zeta2[..., None, None]
+    om = one_minus[..., None, None]
+    g_hs = 1.0 / om + d_ratio * 3.0 * z2 / om ** 2 + d_ratio ** 2 * 2.0 * z2 ** 2 / om ** 3
+    g_ii = np.diagonal(g_hs, axis1=-2, axis2=-1)
+    m_bar = np.sum(x * m, axis=-1)
+    a_hc = m_bar * a_hs - np.sum(x * (m - 1.0) * np.log(g_ii), axis=-1)
+
+    # Dispersion contribution
+    sigma_ij = 0.5 * (sigma[..., :, None] + sigma[..., None, :])
+    kij_matrix = np.zeros(sigma_ij.shape)
+    kij_matrix[..., 0, 1] = comp['kij']
+    kij_matrix[..., 1, 0] = comp['kij']
+    eps_ij = np.sqrt(epsk[..., :, None] * epsk[..., None, :]) * (1.0 - kij_matrix)
+    xxmm = x[..., :, None] * x[..., None, :] * m[..., :, None] * m[..., None, :]
+    reduced_eps = eps_ij / T[..., None, None]
+    m2es3 = np.sum(xxmm * reduced_eps * sigma_ij ** 3, axis=(-2, -1))
+    m2e2s3 = np.sum(xxmm * reduced_eps ** 2 * sigma_ij ** 3, axis=(-2, -1))
+
+    m_factor = np.stack([np.ones_like(m_bar), (m_bar - 1.0) / m_bar, (m_bar - 1.0) * (m_bar - 2.0) / m_bar ** 2])
+    I1 = 0.0
+    I2 = 0.0
+    for i in range(7):
+        a_i = sum(A_CONSTANTS[k, i] * m_factor[k] for k in range(3))
+        b_i = sum(B_CONSTANTS[k, i] * m_factor[k] for k in range(3))
+        I1 = I1 + a_i * eta ** i
+        I2 = I2 + b_i * eta ** i
+    C1 = 1.0 / (1.0 + m_bar * (8.0 * eta - 2.0 * eta ** 2) / one_minus ** 4
+                + (1.0 - m_bar) * (20.0 * eta - 27.0 * eta ** 2 + 12.0 * eta ** 3 - 2.0 * eta ** 4)
+                / (one_minus * (2.0 - eta)) ** 2)
+    a_disp = -2.0 * np.pi * rho * I1 * m2es3 - np.pi * rho * m_bar * C1 * I2 * m2e2s3
+
+    # Association between donor and acceptor sites (donors only bind acceptors)
+    eps_hb_ij = 0.5 * (comp['epsk_hb'][..., :, None] + comp['epsk_hb'][..., None, :])
+    kappa_ij = (np.sqrt(comp['kappa_hb'][..., :, None] * comp['kappa_hb'][..., None, :])
+                * (np.sqrt(sigma[..., :, None] * sigma[..., None, :]) / sigma_ij) ** 3)
+    delta = sigma_ij ** 3 * g_hs * kappa_ij * (np.exp(eps_hb_ij / T[..., None, None]) - 1.0)
+
+    n_don, n_acc = comp['n_don'], comp['n_acc']
+    rho_c = rho[..., None]
+    X_don = np.ones(np.broadcast_shapes(x.shape, n_don.shape), dtype=np.result_type(rho, x, T, float))
+    X_acc = X_don.copy()
+    for _ in range(max_association_iterations):
+        new_X_don = 1.0 / (1.0 + rho_c * np.sum((x * n_acc * X_acc)[..., None, :] * delta, axis=-1))
+        # Gauss-Seidel update: acceptors already see the new donor fractions
+        new_X_acc = 1.0 / (1.0 + rho_c * np.sum((x * n_don * new_X_don)[..., None, :] * delta, axis=-1))
+        change = max(np.max(np.abs(new_X_don - X_don)), np.max(np.abs(new_X_acc - X_acc)))
+        X_don = new_X_don
+        X_acc = new_X_acc
+        if change < 1e-13:
+            break
+    a_assoc = np.sum(x * (n_don * (np.log(X_don) - 0.5 * X_don + 0.5)
+                          + n_acc * (np.log(X_acc) - 0.5 * X_acc + 0.5)), axis=-1)
+
+    return a_hc + a_disp + a_assoc
+
+
+# Function to convert a packing fraction into a number density (1/Angstrom^3)
+def _density_from_eta(T, eta, x, comp):
+    d = comp['sigma'] * (1.0 - 0.12 * np.exp(-3.0 * comp['epsk'] / T[..., None]))
+    return eta / (np.pi / 6.0 * np.sum(x * comp['m'] * d ** 3, axis=-1))
+
+
+# Function to compute the compressibility factor Z = 1 + rho * d(a_res)/d(rho) via a complex step
+def compressibility(T, rho, x, comp, step=1e-20):
+    a_complex = residual_helmholtz(T, rho * (1.0 + 1j * step), x, comp)
+    return 1.0 + np.imag(a_complex) / step
+
+
+# Function to solve for the liquid packing fraction at the given pressure (Newton from the dense side)
+def liquid_packing_fraction(T, x, comp, pressure=PRESSURE, eta_start=0.6, iterations=40):
+    eta = np.full(np.broadcast_shapes(T.shape, x.shape[:-1]), eta_start)
+
+    def pressure_at(eta_value):
+        rho = _density_from_eta(T, eta_value, x, comp)
+        return compressibility(T, rho, x, comp) * rho * BOLTZMANN * T * 1.0e30
+
+    for _ in range(iterations):
+        p = pressure_at(eta)
+        step = eta * 1e-7
+        dp = (pressure_at(eta + step) - p) / step
+        # On the liquid branch the pressure rises steeply with eta; elsewhere step towards denser states
+        new_eta = np.where(dp > 0, eta - (p - pressure) / np.where(dp > 0, dp, 1.0), eta + 0.5 * (0.74 - eta))
+        new_eta = np.clip(new_eta, 1e-6, 0.7404)
+        if np.max(np.abs(new_eta - eta)) < 1e-12:
+            eta = new_eta
+            break
+        eta = new_eta
+    return eta
+
+
+# Function to compute ln(fugacity coefficient) of every component at T, liquid density and composition x
+def ln_fugacity_coefficients(T, x, comp, pressure=PRESSURE, step=1e-20):
+    eta = liquid_packing_fraction(T, x, comp, pressure)
+    rho = _density_from_eta(T, eta, x, comp)
+    a_res = residual_helmholtz(T, rho, x, comp)
+    Z = compressibility(T, rho, x, comp)
+
+    nc = x.shape[-1]
+    da_dx = []
+    for k in range(nc):
+        x_step = x.astype(complex)
+        x_step[..., k] = x_step[..., k] + 1j * step
+        da_dx.append(np.imag(residual_helmholtz(T, rho, x_step, comp)) / step)
+    da_dx = np.stack(da_dx, axis=-1)
+
+    mu_res = (a_res + (Z - 1.0))[..., None] + da_dx - np.sum(x * da_dx, axis=-1)[..., None]
+    # States without a liquid root give Z <= 0; they come out as NaN and are scored as failed evaluations
+    with np.errstate(invalid='ignore'):
+        return mu_res - np.log(Z)[..., None]
+
+
+# Function to convert API weight fractions into mole fractions
+def weight_to_mole_fraction(w, Mw):
+    n = np.stack([w / Mw[..., 0], (1.0 - w) / Mw[..., 1]], axis=-1)
+    return n / np.sum(n, axis=-1, keepdims=True)
+
+
+# Function to compute the right-hand side ln(x*gamma) of the SLE condition with a linear Cp_fus(T):
+# -H_fus/R (1/T - 1/T_fus) + int_T^T_fus Cp_fus dT / (R T) - int_T^T_fus Cp_fus / T dT / R
+def ideal_solubility_term(T, T_fus, H_fus, Cp_a, Cp_b):
+    H_fus_J = H_fus * 1000.0
+    heat_term = -H_fus_J / GAS_CONSTANT * (1.0 / T - 1.0 / T_fus)
+    cp_integral = Cp_a * (T_fus - T) + 0.5 * Cp_b * (T_fus ** 2 - T ** 2)
+    cp_over_T_integral = Cp_a * np.log(T_fus / T) + Cp_b * (T_fus - T)
+    return heat_term + cp_integral / (GAS_CONSTANT * T) - cp_over_T_integral / GAS_CONSTANT
+
+
+# Function to compute API solubility (weight fraction) for a batch of parameter sets at temperatures T
+# Returns an array of shape (n_parameter_sets, n_temperatures)
+def solubility(system, params, temperatures, tolerance=1e-10, max_iterations=60):
+    comp = build_component_arrays(system, params)
+    batch = comp['m'].shape[0]
+    T = np.broadcast_to(np.asarray(temperatures, dtype=float)[None, :], (batch, len(temperatures)))
+    comp = {key: value[:, None, ...] for key, value in comp.items()}
+    Mw = np.broadcast_to(comp['Mw'], T.shape + (2,))
+
+    # Pure (subcooled) API reference state
+    x_pure = np.zeros(T.shape + (2,))
+    x_pure[..., 0] = 1.0
+    ln_phi_pure = ln_fugacity_coefficients(T, x_pure, comp)[..., 0]
+    target = ideal_solubility_term(T, system['T_fus'], system['H_fus'], system['Cp_fus_a'], system['Cp_fus_b'])
+
+    def residual(logit_w):
+        w = 1.0 / (1.0 + np.exp(-logit_w))
+        x = weight_to_mole_fraction(w, Mw)
+        ln_gamma = ln_fugacity_coefficients(T, x, comp)[..., 0] - ln_phi_pure
+        return np.log(x[..., 0]) + ln_gamma - target
+
+    # Illinois (modified regula falsi) on logit(w), vectorized over the whole batch
+    lo = np.full(T.shape, -20.0)
+    hi = np.full(T.shape, 20.0)
+    f_lo = residual(lo)
+    f_hi = residual(hi)
+    side = np.zeros(T.shape)
+    root = np.where(np.abs(f_lo) < np.abs(f_hi), lo, hi)
+    bracketed = np.sign(f_lo) != np.sign(f_hi)
+
+    for _ in range(max_iterations):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            candidate = (lo * f_hi - hi * f_lo) / (f_hi - f_lo)
+        candidate = np.where(np.isfinite(candidate), candidate, 0.5 * (lo + hi))
+        f_candidate = residual(candidate)
+        root = np.where(bracketed, candidate, root)
+        if np.all(~bracketed | (np.abs(f_candidate) < tolerance)):
+            break
+
+        same_as_hi = np.sign(f_candidate) == np.sign(f_hi)
+        hi = np.where(same_as_hi, candidate, hi)
+        f_lo = np.where(same_as_hi & (side == 1), 0.5 * f_lo, f_lo)
+        f_hi = np.where(same_as_hi, f_candidate, f_hi)
+        lo = np.where(~same_as_hi, candidate, lo)
+        f_hi = np.where(~same_as_hi & (side == -1), 0.5 * f_hi, f_hi)
+        f_lo = np.where(~same_as_hi, f_candidate, f_lo)
+        side = np.where(same_as_hi, 1, -1)
+
+    w = 1.0 / (1.0 + np.exp(-root))
+    # Above the melting point the API is fully miscible
+    w = np.where(T >= system['T_fus'], 1.0, w)
+    return np.where(bracketed | (T >= system['T_fus']), w, np.nan)
+
+
+# Function to compute RMSRD in percent for every parameter set (rows of w_calc)
+def rmsrd(w_calc, w_exp):
+    relative = (w_calc - w_exp) / w_exp
+    value = 100.0 * np.sqrt(np.mean(relative ** 2, axis=-1))
+    return np.where(np.isfinite(value), value, np.inf)
+
+
+# Function to score a whole batch of parameter sets (rows A..H) against the experimental data in one call
+# (return_solubility=True also returns the calculated solubilities at the experimental temperatures)
+def evaluate_batch(template_content, exp_data_file, params, return_solubility=False):
+    system = parse_inp_content(template_content)
+    T_exp, w_exp = read_exp_data(exp_data_file)
+    w_calc = solubility(system, params, T_exp)
+    if return_solubility:
+        return rmsrd(w_calc, w_exp), w_calc
+    return rmsrd(w_calc, w_exp)
+
+
+# Function to stand in for the executable: read Input_ASD.inp in work_folder and write Calc_data_SLE.dat
+def run_native(work_folder, output_file_name="Calc_data_SLE.dat"):
+    with open(os.path.join(work_folder, "Input_ASD.inp"), 'r') as f:
+        system = parse_inp_content(f.read())
+    T_exp, w_exp = read_exp_data(os.path.join(work_folder, "Exp_data_SLE.dat"))
+
+    no_params = np.zeros((1, len(PARAMETER_NAMES)))
+    w_exp_calc = solubility(system, no_params, T_exp)[0]
+    rmsrd_value = rmsrd(w_exp_calc, w_exp)
+
+    t_min, t_max, t_step = system['T_range']
+    T_curve = np.arange(t_min, t_max + 0.5 * t_step, t_step) if t_step > 0 else np.array([t_min])
+    w_curve = solubility(system, no_params, T_curve)[0]
+
+    output_file = os.path.join(work_folder, output_file_name)
+    with open(output_file, 'w') as f:
+        f.write(f"# {system['title']}: SLE of API (1) in polymer (2), native PC-SAFT backend\n")
+        f.write("# T_exp/K   w_API_exp   w_API_calc\n")
+        for T, w_e, w_c in zip(T_exp, w_exp, w_exp_calc):
+            f.write(f"{T:10.2f}  {w_e:12.6e}  {w_c:12.6e}\n")
+        f.write(f"# RMSRD/% {float(rmsrd_value):.6f} ({len(T_exp)} points)\n")
+        f.write("# T/K   w_API_calc\n")
+        for T, w_c in zip(T_curve, w_curve):
+            f.write(f"{T:10.2f}  {w_c:12.6e}\n")
+
+    if not np.isfinite(rmsrd_value):
+        logging.warning(f"Native PC-SAFT backend did not converge for {work_folder}")
+    return output_file
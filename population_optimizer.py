@@ -0,0 +1,197 @@
+import math
+import logging
+import numpy as np
+from scipy.optimize import differential_evolution, OptimizeResult
+from samplers import ParameterSampler
+
+
+POPULATION_METHODS = ('cma-es', 'differential-evolution')
+
+
+# Raised by the recorder when the next generation would exceed the evaluation budget
+class EvaluationBudgetSpent(Exception):
+    pass
+
+
+# Function to pick the population size: the method's usual size, rounded up to a whole number of batches on
+# the workers so no worker idles while a generation is evaluated
+def default_population_size(method, dimension, num_workers):
+    if method == 'cma-es':
+        size = 4 + int(3 * math.log(dimension))
+    else:
+        size = 10 * dimension
+    num_workers = max(int(num_workers), 1)
+    return max(5, math.ceil(max(size, num_workers) / num_workers) * num_workers)
+
+
+# Function to fold points back into the unit cube by reflection at the faces (keeps the sample distribution
+# smooth near the bounds, unlike clipping)
+def reflect_into_unit_cube(points):
+    points = np.mod(points, 2.0)
+    return np.where(points > 1.0, 2.0 - points, points)
+
+
+# Counts generations and keeps every evaluated point; a generation is one call of the batch objective
+# A generation that does not fit in max_evaluations is not evaluated (the run ends with EvaluationBudgetSpent)
+class GenerationRecorder:
+    def __init__(self, batch_objective, lower, width, callback=None, max_evaluations=None):
+        self.batch_objective = batch_objective
+        self.lower = lower
+        self.width = width
+        self.callback = callback
+        self.max_evaluations = max_evaluations
+        self.X = []
+        self.y = []
+        self.generations = 0
+        self.restart = 0
+        self.population_size = 0
+
+    def evaluate(self, unit_points):
+        if self.max_evaluations is not None and len(self.y) + len(unit_points) > self.max_evaluations:
+            raise EvaluationBudgetSpent(f"evaluation budget of {self.max_evaluations} spent")
+        values = np.asarray(self.batch_objective(list(self.lower + np.asarray(unit_points) * self.width)),
+                            dtype=float)
+        self.X.extend(unit_points)
+        self.y.extend(values)
+        self.generations += 1
+        if self.callback is not None:
+            self.callback({'generation': self.generations, 'restart': self.restart, 'population': len(values),
+                           'best_in_generation': float(np.min(values)), 'best': float(np.min(self.y)),
+                           'nfev': len(self.y)})
+        return values
+
+    def best(self):
+        index = int(np.argmin(self.y))
+        return np.array(self.X[index]), float(self.y[index])
+
+
+# Function to run one CMA-ES in the unit cube until max_generations or until it converges
+# Standard (mu/mu_w, lambda) update with rank-one and rank-mu covariance adaptation; the reflected samples are
+# used for the update so the mean stays inside the box. Returns the generations used and the stop reason.
+def cma_es_run(recorder, mean, sigma, population_size, max_generations, rng, tolx=1e-6, tolfun=1e-6):
+    n = len(mean)
+    lam = population_size
+    mu = lam // 2
+    weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    weights /= np.sum(weights)
+    mueff = 1.0 / np.sum(weights ** 2)
+    cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+    cs = (mueff + 2) / (n + mueff + 5)
+    c1 = 2 / ((n + 1.3) ** 2 + mueff)
+    cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+    damps = 1 + 2 * max(0.0, math.sqrt((mueff - 1) / (n + 1)) - 1) + cs
+    chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+    mean = np.array(mean, dtype=float)
+    pc, ps = np.zeros(n), np.zeros(n)
+    B, D, C = np.eye(n), np.ones(n), np.eye(n)
+    history = []
+    history_length = 10 + math.ceil(30 * n / lam)
+    for generation in range(1, max_generations + 1):
+        X = reflect_into_unit_cube(mean + sigma * (rng.standard_normal((lam, n)) * D) @ B.T)
+        values = recorder.evaluate(X)
+        order = np.argsort(values, kind='stable')
+
+        steps = (X[order[:mu]] - mean) / sigma
+        step = weights @ steps
+        mean = mean + sigma * step
+        ps = (1 - cs) * ps + math.sqrt(cs * (2 - cs) * mueff) * (B @ ((B.T @ step) / D))
+        hsig = (np.linalg.norm(ps) / math.sqrt(1 - (1 - cs) ** (2 * generation)) / chi_n) < 1.4 + 2 / (n + 1)
+        pc = (1 - cc) * pc + hsig * math.sqrt(cc * (2 - cc) * mueff) * step
+        C = ((1 - c1 - cmu) * C + c1 * (np.outer(pc, pc) + (1 - hsig) * cc * (2 - cc) * C)
+             + cmu * (steps.T * weights) @ steps)
+        sigma *= math.exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+
+        eigenvalues, B = np.linalg.eigh((C + C.T) / 2)
+        D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+        history.append(values[order[0]])
+        if sigma * np.max(D) < tolx:
+            return generation, "step size below tolx"
+        if len(history) >= history_length:
+            recent = history[-history_length:]
+            if max(recent) - min(recent) <= tolfun * max(abs(min(recent)), 1e-12):
+                return generation, "best RMSRD flat"
+        if np.max(D) > 1e7 * np.min(D):
+            return generation, "covariance ill-conditioned"
+    return max_generations, "generation budget spent"
+
+
+# Function to run one differential evolution (scipy, one vectorized call per generation) in the unit cube
+# scipy evaluates the initial population as generation 0 and then maxiter more, so maxiter is one less than the
+# generations left; with a single generation left only the initial population is evaluated
+def differential_evolution_run(recorder, x0, population_size, max_generations, rng):
+    n = len(x0)
+    if max_generations < 1:
+        return 0, "generation budget spent"
+    init = ParameterSampler(np.column_stack([np.zeros(n), np.ones(n)]), 'lhs',
+                            rng.integers(2 ** 32)).next_batch(population_size)
+    init[0] = x0
+    if max_generations == 1:
+        recorder.evaluate(init)
+        return 1, "generation budget spent"
+    generations_before = recorder.generations
+    result = differential_evolution(lambda X: recorder.evaluate(X.T), [(0.0, 1.0)] * n,
+                                    maxiter=max_generations - 1, init=init, vectorized=True,
+                                    updating='deferred', polish=False, seed=rng, tol=1e-6)
+    return recorder.generations - generations_before, result.message
+
+
+# Function to minimize over the bounded box with a population method, one batch per generation
+# max_generations counts generations over all runs, not solver runs: the cost is up to max_generations times
+# the population (80 points per generation for differential evolution on A..H by default), more after restarts.
+# max_evaluations caps the solver runs; the last generation is dropped if it does not fit. When a run converges
+# early it is restarted (CMA-ES: IPOP, from a random mean with twice the population; DE: a new population twice
+# as large, seeded with the best point), up to `restarts` times. callback receives a dict per generation (for
+# progress output).
+def population_optimize(batch_objective, bounds, x0=None, method='cma-es', population_size=None,
+                        max_generations=100, restarts=2, seed=None, num_workers=1, sigma0=0.3, callback=None,
+                        max_evaluations=None):
+    if method not in POPULATION_METHODS:
+        raise ValueError(f"Unknown population method '{method}', expected one of {', '.join(POPULATION_METHODS)}")
+
+    bounds = np.asarray(bounds, dtype=float)
+    lower, width = bounds[:, 0], bounds[:, 1] - bounds[:, 0]
+    dimension = len(bounds)
+    rng = np.random.default_rng(seed)
+    if population_size is None:
+        population_size = default_population_size(method, dimension, num_workers)
+    start = np.full(dimension, 0.5) if x0 is None else np.clip((np.asarray(x0, dtype=float) - lower) / width, 0, 1)
+
+    recorder = GenerationRecorder(batch_objective, lower, width, callback, max_evaluations)
+    messages = []
+    while True:
+        recorder.population_size = population_size
+        remaining = max_generations - recorder.generations
+        budget_spent = False
+        try:
+            if method == 'cma-es':
+                _, message = cma_es_run(recorder, start, sigma0, population_size, remaining, rng)
+            else:
+                _, message = differential_evolution_run(recorder, start, population_size, remaining, rng)
+        except EvaluationBudgetSpent as e:
+            message, budget_spent = str(e), True
+        messages.append(message)
+        if not recorder.y:
+            raise ValueError(f"max_evaluations={max_evaluations} is smaller than one generation of "
+                             f"{population_size} points")
+        logging.info(f"{method} run {recorder.restart + 1} (population {population_size}) ended: {message}; "
+                     f"best RMSRD {recorder.best()[1]} after {len(recorder.y)} evaluations")
+
+        if budget_spent or recorder.generations >= max_generations or recorder.restart >= restarts:
+            break
+        recorder.restart += 1
+        population_size *= 2
+        start = rng.random(dimension) if method == 'cma-es' else recorder.best()[0]
+
+    best_x, best_value = recorder.best()
+    return OptimizeResult(x=lower + best_x * width, fun=best_value, nfev=len(recorder.y), nit=recorder.generations,
+                          restarts=recorder.restart, message="; ".join(messages),
+                          X=lower + np.array(recorder.X) * width, y=np.array(recorder.y))
+
+
+# Function to format the progress of one generation for the RMSRD values file
+def format_generation(method, record):
+    return (f"{method} generation {record['generation']} (run {record['restart'] + 1}, population "
+            f"{record['population']}): best RMSRD in generation={record['best_in_generation']}, "
+            f"best so far={record['best']} ({record['nfev']} evaluations)\n")
@@ -0,0 +1,437 @@
+import os
+import sys
+import hmac
+import json
+import time
+import socket
+import logging
+import argparse
+import itertools
+import threading
+import collections
+from evaluation_pool import EvaluationPool, WORKER_INPUT_FILES
+from solver_runner import run_solver, SolverError
+from calc_output import parse_calc_output
+
+
+DEFAULT_PORT = 5560
+HEARTBEAT_INTERVAL = 5.0
+TOKEN_VARIABLE = "PC_SAFT_REMOTE_TOKEN"  # Environment variable holding the shared token of coordinator and workers
+
+# Files sent with every task: the rendered input plus the system's template and experimental data
+TASK_INPUT_FILES = ("Input_ASD.inp",) + WORKER_INPUT_FILES
+
+
+# Function to send one newline-delimited JSON message (the lock keeps concurrent senders from interleaving)
+def send_message(connection, lock, message):
+    data = (json.dumps(message) + "\n").encode()
+    with lock:
+        connection.sendall(data)
+
+
+# One evaluation handed to the remote workers; attempts counts the workers lost while running it
+class RemoteTask:
+    def __init__(self, task_id, payload):
+        self.id = task_id
+        self.payload = payload
+        self.attempts = 0
+        self.queued = time.monotonic()  # Time it was last put in the queue
+        self.dispatched = None  # Time it was last sent to a worker
+        self.result = None
+        self.done = threading.Event()
+
+
+# A connected worker: its slot count and the tasks it is running
+class RemoteWorker:
+    def __init__(self, connection, address):
+        self.connection = connection
+        self.address = address
+        self.name = f"{address[0]}:{address[1]}"
+        self.slots = 0
+        self.in_flight = {}
+        self.alive = True
+        self.last_seen = time.monotonic()
+        self.send_lock = threading.Lock()
+
+
+# Raised on the worker side when the coordinator refuses its token
+class WorkerRejected(Exception):
+    pass
+
+
+# Function to get the shared token from the given value or the environment; raises ValueError if there is none
+def resolve_token(token=None):
+    token = token or os.environ.get(TOKEN_VARIABLE)
+    if not token:
+        raise ValueError(f"Distributed mode needs a shared token: set the {TOKEN_VARIABLE} environment variable "
+                         f"(or remote_token on the coordinator, --token on a worker)")
+    return str(token)
+
+
+# Coordinator side of distributed mode: workers connect over TCP and announce their slots; queued evaluations
+# are sent to free slots in batches (one message per worker). A worker that disconnects, stops sending
+# heartbeats or keeps an evaluation past its solver timeout is dropped and its evaluations go back to the front
+# of the queue, up to max_retries times each. When no worker has been connected for worker_wait_timeout seconds,
+# the queued evaluations fail instead of waiting forever. Results feed the optimizers, the cache and the results
+# database, so a worker only gets work after its hello carries the shared token.
+class WorkerCoordinator:
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, heartbeat_timeout=30.0, max_retries=2,
+                 worker_wait_timeout=600.0, token=None):
+        self._token = resolve_token(token).encode()
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_retries = max_retries
+        self.worker_wait_timeout = worker_wait_timeout
+        self._server = socket.create_server((host, port))
+        self.port = self._server.getsockname()[1]
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        self._workers = []
+        self._task_ids = itertools.count(1)
+        self._no_workers_since = time.monotonic()
+        self._closed = False
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._monitor_loop, daemon=True).start()
+        logging.info(f"Coordinator listening for remote workers on {host}:{self.port}")
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                connection, address = self._server.accept()
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection.settimeout(self.heartbeat_timeout)  # Also drops connections that never say hello
+            worker = RemoteWorker(connection, address)
+            threading.Thread(target=self._read_loop, args=(worker,), daemon=True).start()
+
+    # Malformed messages are logged and skipped; whatever ends the loop, the worker is dropped
+    def _read_loop(self, worker):
+        try:
+            for line in worker.connection.makefile('rb'):
+                worker.last_seen = time.monotonic()
+                try:
+                    message = json.loads(line)
+                    if message['type'] == 'hello':
+                        if not hmac.compare_digest(str(message.get('token', '')).encode(), self._token):
+                            logging.warning(f"Rejected remote worker {worker.name}: wrong or missing token")
+                            send_message(worker.connection, worker.send_lock, {'type': 'rejected'})
+                            return
+                        slots = int(message['slots'])
+                        with self._lock:
+                            worker.name = message.get('name') or worker.name
+                            worker.slots = slots
+                            self._workers.append(worker)
+                        logging.info(f"Remote worker {worker.name} joined with {worker.slots} slot(s)")
+                        self._dispatch()
+                    elif message['type'] == 'result':
+                        self._complete(worker, message)
+                except (ValueError, KeyError, TypeError) as e:
+                    logging.warning(f"Ignoring malformed message from remote worker {worker.name}: {e!r}")
+        except OSError:
+            pass
+        finally:
+            self._worker_lost(worker, "connection closed")
+
+    def _complete(self, worker, message):
+        if 'status' not in message:
+            raise KeyError('status')
+        with self._lock:
+            task = worker.in_flight.pop(message['id'], None)
+        # Results of a worker already given up on are ignored; the task was requeued
+        if task is not None:
+            task.result = dict(message, worker=worker.name)
+            task.done.set()
+        self._dispatch()
+
+    def _worker_lost(self, worker, reason):
+        with self._lock:
+            if not worker.alive:
+                return
+            worker.alive = False
+            if worker in self._workers:
+                self._workers.remove(worker)
+                if not self._workers:
+                    self._no_workers_since = time.monotonic()
+            tasks = list(worker.in_flight.values())
+            worker.in_flight.clear()
+            for task in tasks:
+                task.attempts += 1
+                if task.attempts > self.max_retries:
+                    task.result = {'status': 'failed', 'worker': worker.name,
+                                   'error': f"worker lost ({reason}) {task.attempts} times"}
+                    task.done.set()
+                else:
+                    task.queued = time.monotonic()
+                    self._pending.appendleft(task)
+        try:
+            worker.connection.close()
+        except OSError:
+            pass
+        if not self._closed and worker.slots:
+            logging.warning(f"Remote worker {worker.name} lost ({reason}), {len(tasks)} evaluation(s) requeued")
+        self._dispatch()
+
+    # Function to drop workers without heartbeats or with overdue evaluations, to report evaluations waiting for
+    # a worker and to fail them once no worker has been connected for worker_wait_timeout
+    def _monitor_loop(self):
+        last_report = time.monotonic()
+        while not self._closed:
+            time.sleep(1.0)
+            now = time.monotonic()
+            for worker in list(self._workers):
+                if now - worker.last_seen > self.heartbeat_timeout:
+                    self._worker_lost(worker, f"no heartbeat for {self.heartbeat_timeout:.0f} s")
+                elif any(task.payload.get('timeout') is not None
+                         and now - task.dispatched > task.payload['timeout'] + self.heartbeat_timeout
+                         for task in list(worker.in_flight.values())):
+                    self._worker_lost(worker, "evaluation overdue")
+            with self._lock:
+                waiting_since = (max(self._no_workers_since, min(task.queued for task in self._pending))
+                                 if self._pending and not self._workers else None)
+            if waiting_since is not None:
+                if self.worker_wait_timeout is not None and now - waiting_since > self.worker_wait_timeout:
+                    self._fail_pending(f"no remote worker connected for {self.worker_wait_timeout:.0f} s")
+                elif now - last_report > 30.0:
+                    logging.info(f"{len(self._pending)} evaluation(s) waiting for remote workers on port {self.port}")
+                    last_report = now
+
+    # Function to fail every queued evaluation (the optimizers see failed runs and carry on with the penalty)
+    def _fail_pending(self, reason):
+        with self._lock:
+            tasks = list(self._pending)
+            self._pending.clear()
+        for task in tasks:
+            task.result = {'status': 'failed', 'worker': None, 'error': reason}
+            task.done.set()
+        logging.error(f"{len(tasks)} evaluation(s) failed: {reason}")
+
+    # Function to hand queued tasks to free slots, one batch message per worker
+    def _dispatch(self):
+        batches = []
+        with self._lock:
+            for worker in self._workers:
+                tasks = []
+                while self._pending and len(worker.in_flight) < worker.slots:
+                    task = self._pending.popleft()
+                    task.dispatched = time.monotonic()
+                    worker.in_flight[task.id] = task
+                    tasks.append(task)
+                if tasks:
+                    batches.append((worker, tasks))
+        for worker, tasks in batches:
+            try:
+                send_message(worker.connection, worker.send_lock,
+                             {'type': 'tasks', 'tasks': [dict(task.payload, id=task.id) for task in tasks]})
+            except OSError:
+                self._worker_lost(worker, "send failed")
+
+    # Function to run one task on a remote worker and wait for its result message
+    def run(self, payload):
+        task = RemoteTask(next(self._task_ids), payload)
+        with self._lock:
+            self._pending.append(task)
+        self._dispatch()
+        # Lost workers and overdue evaluations are handled by the monitor; a closed coordinator ends the wait too
+        while not task.done.wait(HEARTBEAT_INTERVAL):
+            if self._closed:
+                return {'status': 'failed', 'worker': None, 'error': "coordinator closed"}
+        return task.result
+
+    def close(self):
+        self._closed = True
+        self._server.close()  # Reconnecting workers must not reach this coordinator again
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                send_message(worker.connection, worker.send_lock, {'type': 'shutdown'})
+                worker.connection.close()
+            except OSError:
+                pass
+
+
+# Stand-in for the executable path in distributed mode: run_pc_saft hands it the prepared work folder, the files
+# are sent to a remote worker and the returned output is written back, so caching and parsing stay local
+class RemoteSolver:
+    def __init__(self, coordinator):
+        self.coordinator = coordinator
+
+    def run(self, work_folder, output_file_name="Calc_data_SLE.dat", timeout=None, timings=None):
+        files = {}
+        for file_name in TASK_INPUT_FILES:
+            path = os.path.join(work_folder, file_name)
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    files[file_name] = f.read()
+
+        start_time = time.perf_counter()
+        result = self.coordinator.run({'files': files, 'output_file': output_file_name, 'timeout': timeout})
+        round_trip = time.perf_counter() - start_time
+        if timings is not None and result.get('solver_time') is not None:
+            timings['solver'] = result['solver_time']
+            timings['remote'] = max(round_trip - result['solver_time'], 0.0)
+        if result['status'] != 'ok':
+            raise SolverError(f"Remote worker {result.get('worker') or '(none)'}: {result['error']}")
+
+        output_file = os.path.join(work_folder, output_file_name)
+        with open(output_file, 'w') as f:
+            f.write(result['output'])
+        return output_file
+
+
+# Pool with the interface of EvaluationPool whose slots run on remote workers: each slot is a local folder where
+# the input is rendered (and the cache consulted) and the evaluation function gets a RemoteSolver as executable
+class RemoteEvaluationPool(EvaluationPool):
+    def __init__(self, coordinator, pc_saft_folder, num_workers, scratch_root=None):
+        if scratch_root is None:
+            scratch_root = os.path.join(pc_saft_folder, "pc_saft_workers", "remote")
+        super().__init__(pc_saft_folder, None, num_workers, scratch_root)
+        self.solver = RemoteSolver(coordinator)
+
+    def _run_in_worker(self, func, item):
+        worker_folder = self._free_folders.get()
+        try:
+            return func(item, worker_folder, self.solver)
+        finally:
+            self._free_folders.put(worker_folder)
+
+
+# Function to check that a task only names the known input files and a plain output file name, so a
+# coordinator cannot write or read outside the worker's scratch folder; raises ValueError otherwise
+def check_task_files(files, output_file_name):
+    for file_name, content in files.items():
+        if file_name not in TASK_INPUT_FILES:
+            raise ValueError(f"unexpected input file {file_name!r}")
+        if not isinstance(content, str):
+            raise ValueError(f"content of {file_name} is not text")
+    if (not isinstance(output_file_name, str) or os.path.basename(output_file_name) != output_file_name
+            or output_file_name in ('', '.', '..')):
+        raise ValueError(f"output file {output_file_name!r} is not a plain file name")
+
+
+# Function to run one task in a worker's scratch directory and build the result message
+# Returns the raw output and its RMSRD; solver failures and malformed tasks are reported back rather than retried
+def run_task(task, worker_folder, worker_executable):
+    try:
+        result = {'type': 'result', 'id': task['id']}
+        check_task_files(task['files'], task['output_file'])
+        timeout = task['timeout']
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logging.warning(f"Rejecting malformed task: {e!r}")
+        return {'type': 'result', 'id': task.get('id') if isinstance(task, dict) else None, 'status': 'failed',
+                'error': f"malformed task: {e!r}"}
+
+    output_file = os.path.join(worker_folder, task['output_file'])
+    timings = {}
+    try:
+        for file_name, content in task['files'].items():
+            with open(os.path.join(worker_folder, file_name), 'w') as f:
+                f.write(content)
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        run_solver(worker_executable, worker_folder, task['output_file'], timeout, timings=timings)
+        with open(output_file, 'r') as f:
+            result.update(status='ok', output=f.read(), rmsrd=parse_calc_output(output_file)['rmsrd'])
+    except (SolverError, OSError, ValueError) as e:
+        result.update(status='failed', error=str(e))
+    result['solver_time'] = timings.get('solver')
+    return result
+
+
+# Function to serve one coordinator connection until it closes; returns True if the coordinator shut down
+# Raises WorkerRejected if the coordinator refuses the token
+def serve_coordinator(connection, pool, name, token):
+    send_lock = threading.Lock()
+    stopped = threading.Event()
+
+    def send_heartbeats():
+        while not stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                send_message(connection, send_lock, {'type': 'heartbeat'})
+            except OSError:
+                return
+
+    def send_result(future):
+        try:
+            send_message(connection, send_lock, future.result())
+        except OSError:
+            pass  # The coordinator requeues the task when it notices the lost connection
+
+    send_message(connection, send_lock, {'type': 'hello', 'name': name, 'slots': pool.num_workers, 'token': token})
+    threading.Thread(target=send_heartbeats, daemon=True).start()
+    try:
+        for line in connection.makefile('rb'):
+            # Malformed messages are logged and skipped, like on the coordinator side
+            try:
+                message = json.loads(line)
+                if message['type'] == 'shutdown':
+                    return True
+                if message['type'] == 'rejected':
+                    raise WorkerRejected("the coordinator refused this worker's token")
+                if message['type'] == 'tasks':
+                    for task in message['tasks']:
+                        pool.submit(run_task, task).add_done_callback(send_result)
+            except (ValueError, KeyError, TypeError) as e:
+                logging.warning(f"Ignoring malformed message from the coordinator: {e!r}")
+    except OSError:
+        pass
+    finally:
+        stopped.set()
+        connection.close()
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Remote PC-SAFT worker: connects to a Step 1 / Step 2 coordinator "
+                                                 "(setting distributed_port) and runs its evaluations with the local "
+                                                 "executable, one scratch directory per slot.")
+    parser.add_argument("--coordinator", required=True, help="HOST:PORT of the coordinator")
+    parser.add_argument("--executable", required=True, help="Path of the local PC-SAFT executable")
+    parser.add_argument("--slots", type=int, default=os.cpu_count() or 1,
+                        help="Concurrent evaluations on this node (default: one per core)")
+    parser.add_argument("--scratch", default=None,
+                        help="Directory for the slot folders (default: pc_saft_workers/ next to the executable)")
+    parser.add_argument("--name", default=socket.gethostname(), help="Worker name in the coordinator's log")
+    parser.add_argument("--reconnect", action="store_true",
+                        help="Keep serving: wait for the next coordinator after one shuts down or is lost")
+    parser.add_argument("--token", default=None,
+                        help=f"Shared token of the coordinator (default: the {TOKEN_VARIABLE} environment variable, "
+                             f"which keeps it out of the process list)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        token = resolve_token(args.token)
+    except ValueError as e:
+        parser.error(str(e))
+    host, port = args.coordinator.rsplit(':', 1)
+    executable = os.path.abspath(args.executable)
+    scratch_root = args.scratch or os.path.join(os.path.dirname(executable), "pc_saft_workers")
+    pool = EvaluationPool(os.path.dirname(executable), executable, args.slots, scratch_root, input_files=())
+
+    try:
+        while True:
+            try:
+                connection = socket.create_connection((host, int(port)))
+            except OSError:
+                time.sleep(2.0)  # Coordinator not up (yet)
+                continue
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            logging.info(f"Connected to coordinator {args.coordinator} with {args.slots} slot(s)")
+            try:
+                shut_down = serve_coordinator(connection, pool, args.name, token)
+            except WorkerRejected as e:
+                logging.error(f"Connection refused: {e}")
+                return 1
+            logging.info("Coordinator shut down" if shut_down else "Connection to the coordinator lost")
+            if not args.reconnect:
+                return 0 if shut_down else 1
+            time.sleep(2.0)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import os
+import sys
+import csv
+import json
+import time
+import atexit
+import sqlite3
+import argparse
+import threading
+from inp_template import PARAMETER_NAMES
+
+
+RESULTS_DATABASE_NAME = "pc_saft_results.sqlite"
+PARAMETER_COLUMNS = ", ".join(PARAMETER_NAMES)
+
+
+# One SQLite results store per campaign (main program directory), shared by Step 1, Step 2 and all systems
+# Evaluations are only ever appended; they are buffered and written in one transaction per batch_size rows.
+class ResultsDatabase:
+    def __init__(self, database_path, batch_size=200):
+        self.database_path = database_path
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+        # Several scheduler jobs may write at the same time; SQLite serializes them
+        self._connection = sqlite3.connect(database_path, timeout=60, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, system TEXT, step INTEGER, "
+                "started REAL, finished REAL, status TEXT, settings TEXT)")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations (id INTEGER PRIMARY KEY, run_id INTEGER, phase TEXT, "
+                f"dataset_index INTEGER, {', '.join(name + ' REAL' for name in PARAMETER_NAMES)}, rmsrd REAL, "
+                "status TEXT, wall_time REAL, error TEXT, created REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_run ON evaluations (run_id)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_evaluations_rmsrd ON evaluations (rmsrd)")
+        atexit.register(self.flush)
+
+    # Function to register a run of one system and return its run_id
+    def start_run(self, system, step, settings=None):
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (system, step, started, status, settings) VALUES (?, ?, ?, 'running', ?)",
+                (system, step, time.time(), json.dumps(settings or {}, default=str)))
+            return cursor.lastrowid
+
+    def finish_run(self, run_id, status='completed'):
+        self.flush()
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE runs SET finished = ?, status = ? WHERE run_id = ?",
+                                     (time.time(), status, run_id))
+
+    # Function to queue one evaluation (status 'ok' or 'failed'); rows are written in batches
+    def add_evaluation(self, run_id, phase, dataset_index, params, rmsrd_value, status='ok', wall_time=None,
+                       error=None):
+        row = (run_id, phase, dataset_index, *[float(value) for value in params],
+               None if rmsrd_value is None else float(rmsrd_value), status, wall_time, error, time.time())
+        with self._lock:
+            self._pending.append(row)
+            flush = len(self._pending) >= self.batch_size
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+            if not rows:
+                return
+            placeholders = ", ".join("?" * (len(PARAMETER_NAMES) + 8))
+            with self._connection:
+                self._connection.executemany(
+                    f"INSERT INTO evaluations (run_id, phase, dataset_index, {PARAMETER_COLUMNS}, rmsrd, status, "
+                    f"wall_time, error, created) VALUES ({placeholders})", rows)
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+
+# Function to open the campaign database in the main program directory
+def open_results_database(base_directory):
+    return ResultsDatabase(os.path.join(base_directory, RESULTS_DATABASE_NAME))
+
+
+# Function to list the best evaluations, optionally for one system / step
+def query_top(connection, n=10, system=None, step=None):
+    conditions, arguments = ["e.status = 'ok'"], []
+    if system is not None:
+        conditions.append("r.system = ?")
+        arguments.append(system)
+    if step is not None:
+        conditions.append("r.step = ?")
+        arguments.append(step)
+    return connection.execute(
+        f"SELECT r.system, r.step, e.phase, e.rmsrd, {', '.join('e.' + name for name in PARAMETER_NAMES)} "
+        f"FROM evaluations e JOIN runs r ON e.run_id = r.run_id WHERE {' AND '.join(conditions)} "
+        "ORDER BY e.rmsrd LIMIT ?", arguments + [n]).fetchall()
+
+
+# Function to summarize every run: evaluations, failures, best RMSRD and solver time
+def query_history(connection, system=None):
+    condition, arguments = ("WHERE r.system = ?", [system]) if system is not None else ("", [])
+    return connection.execute(
+        "SELECT r.run_id, r.system, r.step, r.status, r.started, r.finished, COUNT(e.id), "
+        "SUM(e.status = 'failed'), MIN(CASE WHEN e.status = 'ok' THEN e.rmsrd END), SUM(e.wall_time) "
+        f"FROM runs r LEFT JOIN evaluations e ON e.run_id = r.run_id {condition} "
+        "GROUP BY r.run_id ORDER BY r.started", arguments).fetchall()
+
+
+# Function to export evaluations (all or one system) to CSV
+def export_csv(connection, output_path, system=None):
+    condition, arguments = ("WHERE r.system = ?", [system]) if system is not None else ("", [])
+    cursor = connection.execute(
+        f"SELECT r.system, r.step, e.run_id, e.phase, e.dataset_index, {PARAMETER_COLUMNS}, e.rmsrd, e.status, "
+        f"e.wall_time, e.error, e.created FROM evaluations e JOIN runs r ON e.run_id = r.run_id {condition} "
+        "ORDER BY e.id", arguments)
+    count = 0
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([column[0] for column in cursor.description])
+        for row in cursor:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp)) if timestamp else '-'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Query the campaign results database ({RESULTS_DATABASE_NAME} "
+                                                 "in the main program directory).")
+    parser.add_argument("database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    top_parser = commands.add_parser("top", help="Best evaluations by RMSRD")
+    top_parser.add_argument("-n", type=int, default=10)
+    top_parser.add_argument("--system")
+    top_parser.add_argument("--step", type=int)
+    history_parser = commands.add_parser("history", help="One line per run of every (or one) system")
+    history_parser.add_argument("--system")
+    export_parser = commands.add_parser("export", help="Write evaluations to a CSV file")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--system")
+    args = parser.parse_args(argv)
+
+    connection = sqlite3.connect(args.database)
+    if args.command == "top":
+        print(f"{'system':<30} {'step':>4} {'phase':<10} {'RMSRD':>12}  parameters")
+        for system, step, phase, rmsrd_value, *params in query_top(connection, args.n, args.system, args.step):
+            values = ", ".join(f"{name}={value:.6g}" for name, value in zip(PARAMETER_NAMES, params))
+            print(f"{system:<30} {step:>4} {phase:<10} {rmsrd_value:12.6g}  {values}")
+    elif args.command == "history":
+        print(f"{'run':>4} {'system':<30} {'step':>4} {'status':<10} {'started':<16} {'finished':<16} "
+              f"{'evals':>6} {'failed':>6} {'best RMSRD':>12} {'solver/s':>9}")
+        for run_id, system, step, status, started, finished, count, failed, best, wall in query_history(
+                connection, args.system):
+            best_text = f"{best:12.6g}" if best is not None else f"{'-':>12}"
+            print(f"{run_id:>4} {system:<30} {step:>4} {status:<10} {format_time(started):<16} "
+                  f"{format_time(finished):<16} {count:>6} {failed or 0:>6} {best_text} {wall or 0.0:9.1f}")
+    else:
+        count = export_csv(connection, args.output, args.system)
+        print(f"Exported {count} evaluations to {args.output}")
+    connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
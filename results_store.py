@@ -0,0 +1,120 @@
+import os
+import sys
+import argparse
+import logging
+import threading
+import numpy as np
+from calc_output import calculated_at_temperatures, output_curve, score, OBJECTIVES
+from inp_template import PARAMETER_NAMES
+
+
+# Columnar archive of all evaluations of one system (compressed .npz), one row per parameter set
+# Columns: params (n x 8), rmsrd (n), w_calc (n x points at the experimental temperatures) and the ragged
+# calculated curves (curve_T / curve_w with curve_offsets). The experimental data are stored alongside,
+# so past runs can be re-scored with another objective without running PC-SAFT again.
+class ResultsStore:
+    def __init__(self, path, T_exp, w_exp, flush_every=50):
+        self.path = path
+        self.T_exp = np.asarray(T_exp, dtype=float)
+        self.w_exp = np.asarray(w_exp, dtype=float)
+        self.flush_every = flush_every
+        self._rows = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        # Keep earlier runs of the same system, unless the experimental data have changed since
+        if os.path.exists(path):
+            results = load_results(path)
+            if (results['T_exp'].shape == self.T_exp.shape and np.allclose(results['T_exp'], self.T_exp)
+                    and np.allclose(results['w_exp'], self.w_exp)):
+                for i, params in enumerate(results['params']):
+                    curve = slice(results['curve_offsets'][i], results['curve_offsets'][i + 1])
+                    self._rows[params.tobytes()] = (params, results['rmsrd'][i], results['w_calc'][i],
+                                                    results['curve_T'][curve], results['curve_w'][curve])
+            else:
+                logging.warning(f"Experimental data changed, starting a new results archive {path}")
+
+    # Function to add one evaluation; calc_output is a parsed Calc_data_SLE.dat, or pass w_calc directly
+    def add(self, params, rmsrd_value, calc_output=None, w_calc=None):
+        params = np.asarray(params, dtype=float)
+        if calc_output is not None:
+            w_calc = calculated_at_temperatures(calc_output, self.T_exp)
+            curve_T, curve_w = output_curve(calc_output)
+        else:
+            curve_T, curve_w = np.empty(0), np.empty(0)
+        if w_calc is None:
+            w_calc = np.full(len(self.T_exp), np.nan)
+
+        with self._lock:
+            self._rows[params.tobytes()] = (params, float(rmsrd_value), np.asarray(w_calc, dtype=float),
+                                            curve_T, curve_w)
+            self._unsaved += 1
+            flush = self._unsaved >= self.flush_every
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows = list(self._rows.values())
+            self._unsaved = 0
+        if not rows:
+            return
+
+        curve_lengths = [len(row[3]) for row in rows]
+        columns = {
+            'params': np.array([row[0] for row in rows]).reshape(-1, len(PARAMETER_NAMES)),
+            'rmsrd': np.array([row[1] for row in rows]),
+            'w_calc': np.array([row[2] for row in rows]).reshape(len(rows), len(self.T_exp)),
+            'curve_T': np.concatenate([row[3] for row in rows]),
+            'curve_w': np.concatenate([row[4] for row in rows]),
+            'curve_offsets': np.concatenate([[0], np.cumsum(curve_lengths)]).astype(np.int64),
+            'T_exp': self.T_exp,
+            'w_exp': self.w_exp,
+            'parameter_names': np.array(PARAMETER_NAMES),
+        }
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'wb') as f:
+            np.savez_compressed(f, **columns)
+        os.replace(temporary_path, self.path)
+
+    def close(self):
+        self.flush()
+        logging.info(f"Stored {len(self._rows)} evaluations in {self.path}")
+
+
+# Function to load an archive written by ResultsStore as a dict of arrays
+def load_results(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+# Function to re-score every stored evaluation with another objective
+def rescore(results, objective='rmsrd', weights=None):
+    return score(results['w_calc'], results['w_exp'], objective, weights)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score the evaluations stored in a results archive "
+                                                 "(generated_RMSRD_values/<drug_polymer>_step<N>_results.npz) "
+                                                 "with another objective, without running PC-SAFT.")
+    parser.add_argument("archive")
+    parser.add_argument("--objective", choices=OBJECTIVES, default='rmsrd')
+    parser.add_argument("--weights", help="Comma-separated weights per experimental point (objective 'weighted')")
+    parser.add_argument("--top", type=int, default=10, help="Number of best parameter sets to list (default 10)")
+    args = parser.parse_args(argv)
+
+    results = load_results(args.archive)
+    weights = [float(value) for value in args.weights.split(',')] if args.weights else None
+    scores = rescore(results, args.objective, weights)
+    order = np.argsort(scores, kind='stable')[:args.top]
+
+    print(f"{len(scores)} stored evaluations, {int(np.sum(np.isfinite(scores)))} with all experimental points")
+    print(f"{'rank':>4} {args.objective:>12} {'RMSRD/%':>12}  parameters")
+    for rank, i in enumerate(order, start=1):
+        values = ", ".join(f"{name}={value:.6g}" for name, value in zip(PARAMETER_NAMES, results['params'][i]))
+        print(f"{rank:>4} {scores[i]:12.6g} {results['rmsrd'][i]:12.6g}  {values}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
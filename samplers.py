@@ -0,0 +1,44 @@
+import warnings
+import numpy as np
+from scipy.stats import qmc
+
+
+SAMPLING_METHODS = ('sobol', 'lhs', 'uniform')
+
+
+# Sampler over the A-H box that hands out the design matrix in batches
+# Sobol continues one scrambled sequence across batches, LHS draws a fresh hypercube per batch
+class ParameterSampler:
+    def __init__(self, bounds, method='sobol', seed=None):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.method = method.lower()
+        if self.method not in SAMPLING_METHODS:
+            raise ValueError(f"Unknown sampling method '{method}', expected one of {', '.join(SAMPLING_METHODS)}")
+
+        self.rng = np.random.default_rng(seed)
+        dimension = len(self.bounds)
+        if self.method == 'sobol':
+            self._engine = qmc.Sobol(d=dimension, scramble=True, seed=self.rng)
+        elif self.method == 'lhs':
+            self._engine = qmc.LatinHypercube(d=dimension, seed=self.rng)
+        else:
+            self._engine = None
+        self.samples_drawn = 0
+
+    # Function to draw the next n points in the unit cube
+    def next_unit_batch(self, n):
+        if self._engine is None:
+            unit = self.rng.random((n, len(self.bounds)))
+        else:
+            with warnings.catch_warnings():
+                # Sobol balance is best at powers of two, but any batch size is still a valid design
+                warnings.simplefilter("ignore", UserWarning)
+                unit = self._engine.random(n)
+        self.samples_drawn += n
+        return unit
+
+    # Function to draw the next n parameter sets scaled to the bounds (shape n x 8)
+    def next_batch(self, n):
+        unit = self.next_unit_batch(n)
+        return qmc.scale(unit, self.bounds[:, 0], self.bounds[:, 1])
+
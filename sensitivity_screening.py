@@ -0,0 +1,140 @@
+import logging
+import numpy as np
+from scipy.optimize import OptimizeResult
+from surrogate_optimizer import transform_objective
+
+
+SCREENING_METHODS = ('morris', 'sobol')
+
+
+# Function to draw Morris trajectories in the unit cube: each starts on a grid of `levels` values per parameter
+# and moves one parameter at a time by delta, in random order (down instead of up where up would leave the cube)
+# Returns the points (trajectories, dimension + 1, dimension), the parameter moved at each step and the step
+def morris_trajectories(dimension, trajectories, levels, rng):
+    delta = levels / (2.0 * (levels - 1))
+    grid = np.arange(levels) / (levels - 1)
+    points = np.empty((trajectories, dimension + 1, dimension))
+    orders = np.empty((trajectories, dimension), dtype=int)
+    steps = np.empty((trajectories, dimension))
+    for t in range(trajectories):
+        x = rng.choice(grid, size=dimension)
+        points[t, 0] = x
+        orders[t] = rng.permutation(dimension)
+        for j, i in enumerate(orders[t]):
+            steps[t, j] = delta if x[i] + delta <= 1.0 + 1e-12 else -delta
+            x[i] += steps[t, j]
+            points[t, j + 1] = x
+    return points, orders, steps
+
+
+# Function to compute the Morris statistics from the values along the trajectories: mu* (mean absolute
+# elementary effect) ranks the parameters, sigma (spread of the effects) flags interactions and curvature
+def morris_indices(orders, steps, values):
+    trajectories, dimension = orders.shape
+    effects = np.diff(np.reshape(values, (trajectories, dimension + 1)), axis=1) / steps
+    mu_star = np.empty(dimension)
+    sigma = np.empty(dimension)
+    for i in range(dimension):
+        parameter_effects = effects[orders == i]
+        mu_star[i] = np.mean(np.abs(parameter_effects))
+        sigma[i] = np.std(parameter_effects)
+    return mu_star, sigma
+
+
+# Function to estimate first-order Sobol indices from an existing sample, without extra runs: the objective is
+# fitted as a sum of binned one-parameter effects (backfitting, so a parameter correlated with a stronger one in
+# a small sample does not borrow its effect), and S_i is the variance of effect i over the total variance. The
+# variance binning picks up from the unexplained rest, (bins - 1) / n of it, is subtracted so unrelated
+# parameters come out near 0.
+def first_order_indices(unit_points, values, bins=None, iterations=10):
+    n, dimension = unit_points.shape
+    if bins is None:
+        bins = max(2, int(np.sqrt(n)))
+    total_variance = np.var(values)
+    if total_variance == 0.0:
+        return np.zeros(dimension)
+    groups = [np.array_split(np.argsort(unit_points[:, i], kind='stable'), bins) for i in range(dimension)]
+    centred = values - np.mean(values)
+    effects = np.zeros((dimension, n))
+    for _ in range(iterations):
+        for i in range(dimension):
+            partial = centred - np.sum(effects, axis=0) + effects[i]
+            for group in groups[i]:
+                effects[i, group] = np.mean(partial[group])
+            effects[i] -= np.mean(effects[i])
+    noise = np.var(centred - np.sum(effects, axis=0)) * (bins - 1) / n
+    return np.maximum((np.var(effects, axis=1) - noise) / total_variance, 0.0)
+
+
+# Function to decide which parameters stay free: an index below threshold times the largest index freezes the
+# parameter (the most sensitive one always stays free)
+def free_parameter_mask(indices, threshold):
+    largest = np.max(indices)
+    if not largest > 0.0:
+        return np.ones(len(indices), dtype=bool), np.ones(len(indices))
+    relative = indices / largest
+    return relative >= threshold, relative
+
+
+# Function to screen with Morris elementary effects: all trajectories are one parallel batch of
+# trajectories * (dimension + 1) runs over the bounds; the best point evaluated is returned as x / fun
+def screen_morris(batch_objective, bounds, trajectories=10, levels=4, seed=None, threshold=0.1):
+    bounds = np.asarray(bounds, dtype=float)
+    lower, width = bounds[:, 0], bounds[:, 1] - bounds[:, 0]
+    rng = np.random.default_rng(seed)
+    points, orders, steps = morris_trajectories(len(bounds), trajectories, levels, rng)
+
+    X = lower + np.reshape(points, (-1, len(bounds))) * width
+    y = np.asarray(batch_objective(list(X)), dtype=float)
+    index, sigma = morris_indices(orders, steps, transform_objective(y))
+    free, relative = free_parameter_mask(index, threshold)
+
+    best = int(np.argmin(y))
+    logging.info(f"Morris screening: {len(y)} evaluations, mu* relative to the largest "
+                 f"{np.array2string(relative, precision=3)}")
+    return OptimizeResult(method='morris', index=index, sigma=sigma, relative=relative, free=free, nfev=len(y),
+                          x=X[best], fun=float(y[best]), X=X, y=y)
+
+
+# Function to screen with first-order Sobol indices estimated from points already evaluated (no extra runs)
+def screen_samples(points, values, bounds, threshold=0.1):
+    bounds = np.asarray(bounds, dtype=float)
+    unit_points = (np.asarray(points, dtype=float) - bounds[:, 0]) / (bounds[:, 1] - bounds[:, 0])
+    index = first_order_indices(unit_points, transform_objective(values))
+    free, relative = free_parameter_mask(index, threshold)
+    logging.info(f"Sobol screening from {len(values)} samples: first-order indices "
+                 f"{np.array2string(index, precision=3)}")
+    return OptimizeResult(method='sobol', index=index, sigma=None, relative=relative, free=free, nfev=0)
+
+
+# Function to format the ranked screening result for the RMSRD values file
+def format_screening_table(result, parameter_names):
+    label = "mu*" if result.method == 'morris' else "S1"
+    lines = [f"Sensitivity screening ({result.method}, {result.nfev} evaluations), ranked:"]
+    for rank, i in enumerate(np.argsort(-result.index, kind='stable'), start=1):
+        spread = f", sigma={result.sigma[i]:.4g}" if result.sigma is not None else ""
+        lines.append(f"Rank {rank}: {parameter_names[i]} {label}={result.index[i]:.4g}{spread} "
+                     f"(relative {result.relative[i]:.3f}) {'free' if result.free[i] else 'frozen'}")
+    return "\n".join(lines) + "\n"
+
+
+# The free parameters of a full parameter vector, the frozen ones held at fixed values: objectives of the full
+# vector are wrapped as objectives of the free parameters only, so the simplex has one vertex per free parameter
+class ParameterSubspace:
+    def __init__(self, full_point, free):
+        self.full_point = np.array(full_point, dtype=float)
+        self.free = np.asarray(free, dtype=bool)
+
+    def reduce(self, values):
+        return [value for value, free in zip(values, self.free) if free]
+
+    def expand(self, reduced):
+        point = self.full_point.copy()
+        point[self.free] = reduced
+        return point
+
+    def wrap(self, objective):
+        return lambda reduced, *args: objective(self.expand(reduced), *args)
+
+    def wrap_batch(self, batch_objective):
+        return lambda points: batch_objective([self.expand(point) for point in points])
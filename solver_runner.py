@@ -0,0 +1,59 @@
+import os
+import time
+import logging
+import subprocess
+
+
+# Raised when a PC-SAFT run fails, times out or produces no output
+class SolverError(RuntimeError):
+    pass
+
+
+# Function to wait for the output file with a short exponential backoff (only used if it is missing at exit)
+def wait_for_output_file(output_file, max_wait, initial_delay=0.01, max_delay=0.25):
+    delay = initial_delay
+    deadline = time.perf_counter() + max_wait
+    while not os.path.exists(output_file):
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return False
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
+    return True
+
+
+# Function to run the PC-SAFT executable and treat its exit as the completion signal
+# If a timings dict is given, the solver and output-wait times (in seconds) are stored in it
+def run_solver(executable, work_folder, output_file_name="Calc_data_SLE.dat", timeout=None, output_wait=5.0,
+               timings=None):
+    output_file = os.path.join(work_folder, output_file_name)
+    start_time = time.perf_counter()
+
+    try:
+        completed = subprocess.run([executable], cwd=work_folder, stdin=subprocess.DEVNULL, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # subprocess.run kills the hung process before re-raising
+        elapsed = time.perf_counter() - start_time
+        if timings is not None:
+            timings['solver'] = elapsed
+        logging.warning(f"PC-SAFT run in {work_folder} killed after {elapsed:.2f} s (timeout {timeout} s)")
+        raise SolverError(f"PC-SAFT run timed out after {timeout} s")
+
+    run_time = time.perf_counter() - start_time
+    if timings is not None:
+        timings['solver'] = run_time
+    if completed.returncode != 0:
+        logging.warning(f"PC-SAFT run in {work_folder} exited with code {completed.returncode} after {run_time:.2f} s")
+        raise SolverError(f"PC-SAFT exited with return code {completed.returncode}")
+
+    # The file is normally there as soon as the process exits; only fall back to waiting if it is not
+    wait_start = time.perf_counter()
+    found = os.path.exists(output_file) or wait_for_output_file(output_file, output_wait)
+    wait_time = time.perf_counter() - wait_start
+    if timings is not None:
+        timings['output_wait'] = wait_time
+    logging.info(f"PC-SAFT run in {work_folder}: solver {run_time:.3f} s, output wait {wait_time:.3f} s")
+
+    if not found:
+        raise SolverError(f"{output_file_name} not written within {output_wait} s of the solver exiting")
+    return output_file
@@ -0,0 +1,117 @@
+import time
+import logging
+import threading
+import numpy as np
+from scipy.optimize import OptimizeResult
+
+
+# Raised from a wrapped objective once a stopping criterion is met; optimize_parameters then returns the best
+# point evaluated so far
+class StopOptimization(Exception):
+    pass
+
+
+# Optimizer evaluations and optimizer wall-clock time shared by the runs of all selected folders
+class CampaignBudget:
+    def __init__(self, max_evaluations=None, max_seconds=None):
+        self.max_evaluations = max_evaluations
+        self.max_seconds = max_seconds
+        self.evaluations = 0
+        self.seconds = 0.0  # Time of the finished runs; the running one is added by its policy
+
+
+# Stopping criteria of one optimization run (one system), checked after every objective call (point or batch)
+# Budgets can be exceeded by at most one batch; the plateau criterion compares the best RMSRD now with the best
+# RMSRD plateau_window evaluations ago
+class StoppingPolicy:
+    def __init__(self, max_evaluations=None, max_seconds=None, plateau_window=0, plateau_tolerance=1e-3,
+                 target_rmsrd=None, campaign=None):
+        self.max_evaluations = max_evaluations
+        self.max_seconds = max_seconds
+        self.plateau_window = plateau_window
+        self.plateau_tolerance = plateau_tolerance
+        self.target_rmsrd = target_rmsrd
+        self.campaign = campaign
+        self.start_time = time.monotonic()
+        self.evaluations = 0
+        self.best_value = float('inf')
+        self.best_parameters = None
+        self.best_history = []
+        self.reason = None
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def record(self, parameters, value):
+        with self._lock:
+            self.evaluations += 1
+            if self.campaign is not None:
+                self.campaign.evaluations += 1
+            if value is not None and np.isfinite(value) and value < self.best_value:
+                self.best_value = float(value)
+                self.best_parameters = np.array(parameters, dtype=float)
+            self.best_history.append(self.best_value)
+
+    # Function to name the criterion that is met, or None to carry on
+    def met_criterion(self):
+        if self.target_rmsrd is not None and self.best_value <= self.target_rmsrd:
+            return f"target RMSRD {self.target_rmsrd} reached"
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return f"evaluation budget of {self.max_evaluations} spent"
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return f"wall-clock budget of {self.max_seconds} s spent"
+        if self.plateau_window and len(self.best_history) > self.plateau_window:
+            previous = self.best_history[-1 - self.plateau_window]
+            if np.isfinite(previous) and previous - self.best_value <= self.plateau_tolerance * abs(previous):
+                return (f"plateau: best RMSRD improved by less than {self.plateau_tolerance:g} (relative) over "
+                        f"the last {self.plateau_window} evaluations")
+        campaign = self.campaign
+        if campaign is not None:
+            if campaign.max_evaluations is not None and campaign.evaluations >= campaign.max_evaluations:
+                return f"campaign evaluation budget of {campaign.max_evaluations} spent"
+            if campaign.max_seconds is not None and campaign.seconds + self.elapsed() >= campaign.max_seconds:
+                return f"campaign wall-clock budget of {campaign.max_seconds} s spent"
+        return None
+
+    def check(self):
+        reason = self.met_criterion()
+        if reason is not None:
+            with self._lock:
+                if self.reason is None:
+                    self.reason = reason
+                    logging.info(f"Stopping the optimization: {reason} after {self.evaluations} evaluations")
+            raise StopOptimization(reason)
+
+    # Function to wrap an objective (or a batch objective) so that every call is recorded and then checked
+    # value maps the function's return value to an RMSRD, e.g. the norm of the scaled residuals
+    def checked(self, function, batch=False, value=None):
+        def checked_function(points, *args):
+            results = function(points, *args)
+            for point, result in (zip(points, results) if batch else [(points, results)]):
+                self.record(point, result if value is None else value(result))
+            self.check()
+            return results
+        return checked_function
+
+    # Function to build the optimizer result from the best point recorded before the run was stopped
+    # Stopped before any evaluation (e.g. a campaign budget spent by earlier systems), the starting point is kept
+    def best_result(self, initial_guess):
+        if self.best_parameters is None:
+            logging.warning(f"Optimization stopped before any evaluation ({self.reason}); keeping the starting "
+                            f"point")
+            return OptimizeResult(x=np.array(initial_guess, dtype=float), fun=None, nfev=self.evaluations,
+                                  success=False, message=self.reason)
+        return OptimizeResult(x=self.best_parameters, fun=self.best_value, nfev=self.evaluations, success=False,
+                              message=self.reason)
+
+    # Function to end the run: the criterion that ended it (message if no stopping criterion was met)
+    def finish(self, message):
+        with self._lock:
+            if self.reason is None:
+                self.reason = message
+            self.duration = self.elapsed()
+            if self.campaign is not None:
+                self.campaign.seconds += self.duration
+        return self.reason
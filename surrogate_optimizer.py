@@ -0,0 +1,212 @@
+import logging
+import numpy as np
+from scipy.interpolate import RBFInterpolator
+from scipy.linalg import cho_factor, cho_solve
+from scipy.optimize import minimize, OptimizeResult
+from scipy.stats import norm
+from samplers import ParameterSampler
+
+
+SURROGATE_MODELS = ('gp', 'rbf')
+
+# Weights cycled by the RBF acquisition: low = explore far from samples, high = trust the surrogate minimum
+RBF_WEIGHT_CYCLE = (0.3, 0.5, 0.8, 0.95)
+
+
+# Function to turn RMSRD values into the modelled quantity: log scale, with the worst 10 % (failed runs and
+# penalties) capped so a few huge values do not flatten the surrogate everywhere else
+def transform_objective(values):
+    z = np.log(np.maximum(np.asarray(values, dtype=float), 1e-12))
+    return np.minimum(z, np.percentile(z, 90))
+
+
+# Gaussian process with an ARD Matern 5/2 kernel on unit-cube inputs and standardized outputs
+class GaussianProcess:
+    def __init__(self, dimension):
+        self.dimension = dimension
+        # log length scales, log signal variance, log noise variance
+        self.theta = np.concatenate([np.full(dimension, np.log(0.3)), [0.0, np.log(1e-4)]])
+
+    def _kernel(self, X1, X2, theta):
+        length_scales = np.exp(theta[:self.dimension])
+        diff = (X1[:, None, :] - X2[None, :, :]) / length_scales
+        r = np.sqrt(np.maximum(np.sum(diff ** 2, axis=-1), 0.0))
+        sqrt5_r = np.sqrt(5.0) * r
+        return np.exp(theta[self.dimension]) * (1.0 + sqrt5_r + sqrt5_r ** 2 / 3.0) * np.exp(-sqrt5_r)
+
+    def _negative_log_likelihood(self, theta, X, y):
+        K = self._kernel(X, X, theta) + (np.exp(theta[-1]) + 1e-8) * np.eye(len(X))
+        try:
+            factor = cho_factor(K, lower=True)
+        except np.linalg.LinAlgError:
+            return 1e10
+        alpha = cho_solve(factor, y)
+        return 0.5 * y @ alpha + np.sum(np.log(np.diag(factor[0])))
+
+    # Function to fit the GP; optimize=False keeps the current hyperparameters (used for fantasy points)
+    def fit(self, X, y, optimize=True):
+        self.X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.y_mean = np.mean(y)
+        self.y_std = np.std(y) if np.std(y) > 0 else 1.0
+        self.y = (y - self.y_mean) / self.y_std
+
+        if optimize:
+            bounds = ([(np.log(0.01), np.log(10.0))] * self.dimension
+                      + [(np.log(0.05), np.log(20.0)), (np.log(1e-6), np.log(0.1))])
+            best = None
+            for theta0 in (self.theta, GaussianProcess(self.dimension).theta):
+                result = minimize(self._negative_log_likelihood, theta0, args=(self.X, self.y),
+                                  method='L-BFGS-B', bounds=bounds)
+                if best is None or result.fun < best.fun:
+                    best = result
+            self.theta = best.x
+
+        K = self._kernel(self.X, self.X, self.theta) + (np.exp(self.theta[-1]) + 1e-8) * np.eye(len(self.X))
+        self._factor = cho_factor(K, lower=True)
+        self._alpha = cho_solve(self._factor, self.y)
+        return self
+
+    # Function to predict mean and standard deviation (in the units of the fitted y)
+    def predict(self, X):
+        X = np.asarray(X, dtype=float)
+        K_star = self._kernel(X, self.X, self.theta)
+        mean = K_star @ self._alpha
+        v = cho_solve(self._factor, K_star.T)
+        variance = np.exp(self.theta[self.dimension]) - np.sum(K_star * v.T, axis=1)
+        std = np.sqrt(np.maximum(variance, 1e-12))
+        return mean * self.y_std + self.y_mean, std * self.y_std
+
+
+# Function to compute expected improvement for minimization
+def expected_improvement(mean, std, best_value, xi=0.01):
+    improvement = best_value - mean - xi
+    z = improvement / std
+    return improvement * norm.cdf(z) + std * norm.pdf(z)
+
+
+# Function to draw acquisition candidates: uniform points plus Gaussian clouds around the best samples
+def generate_candidates(X, y, rng, num_candidates=2000):
+    dimension = X.shape[1]
+    uniform = rng.random((num_candidates, dimension))
+    best_points = X[np.argsort(y)[:5]]
+    scales = rng.choice([0.2, 0.05, 0.01], size=(num_candidates, 1))
+    centres = best_points[rng.integers(len(best_points), size=num_candidates)]
+    local = np.clip(centres + scales * rng.standard_normal((num_candidates, dimension)), 0.0, 1.0)
+    return np.vstack([uniform, local])
+
+
+# Function to pick a batch with a GP and expected improvement; the batch is built greedily with the
+# kriging believer heuristic (each chosen point is added with its predicted mean before picking the next)
+def propose_gp_batch(X, z, batch_size, rng, gp):
+    gp.fit(X, z)
+    max_ei = None
+    X_fantasy, z_fantasy = X.copy(), z.copy()
+    batch = []
+    for k in range(batch_size):
+        if k > 0:
+            gp.fit(X_fantasy, z_fantasy, optimize=False)
+        candidates = generate_candidates(X_fantasy, z_fantasy, rng)
+        mean, std = gp.predict(candidates)
+        ei = expected_improvement(mean, std, np.min(z_fantasy))
+        best = int(np.argmax(ei))
+        if max_ei is None:
+            max_ei = float(ei[best])
+        batch.append(candidates[best])
+        X_fantasy = np.vstack([X_fantasy, candidates[best]])
+        z_fantasy = np.append(z_fantasy, mean[best])
+    return np.array(batch), max_ei
+
+
+# Function to pick a batch with an RBF surrogate (Regis & Shoemaker weighted score of predicted value and
+# distance to the nearest evaluated point)
+def propose_rbf_batch(X, z, batch_size, rng, iteration):
+    model = RBFInterpolator(X, z, kernel='thin_plate_spline', smoothing=1e-8)
+    candidates = generate_candidates(X, z, rng)
+    predicted = model(candidates)
+    selected_points = X.copy()
+    batch = []
+    for k in range(batch_size):
+        weight = RBF_WEIGHT_CYCLE[(iteration * batch_size + k) % len(RBF_WEIGHT_CYCLE)]
+        distance = np.min(np.linalg.norm(candidates[:, None, :] - selected_points[None, :, :], axis=-1), axis=1)
+        value_score = (predicted - predicted.min()) / max(np.ptp(predicted), 1e-12)
+        distance_score = 1.0 - (distance - distance.min()) / max(np.ptp(distance), 1e-12)
+        score = weight * value_score + (1.0 - weight) * distance_score
+        score[distance < 1e-6] = np.inf
+        best = int(np.argmin(score))
+        batch.append(candidates[best])
+        selected_points = np.vstack([selected_points, candidates[best]])
+    return np.array(batch), None
+
+
+# Function to minimize an expensive objective over a box with a surrogate model
+# batch_objective(list_of_points) returns the objective values in the same order; X_init / y_init are
+# already evaluated points (e.g. the random datasets), topped up with a Sobol design if there are fewer
+# than initial_design_size. Stops on budget, target, an expected improvement below ei_tolerance (GP) or
+# `patience` batches without improvement, so the caller can switch to local refinement.
+def surrogate_optimize(batch_objective, bounds, X_init=None, y_init=None, max_evaluations=50, batch_size=4,
+                       model='gp', seed=None, target=None, initial_design_size=None, ei_tolerance=1e-3,
+                       patience=3, improvement_tolerance=1e-3):
+    if model not in SURROGATE_MODELS:
+        raise ValueError(f"Unknown surrogate model '{model}', expected one of {', '.join(SURROGATE_MODELS)}")
+
+    bounds = np.asarray(bounds, dtype=float)
+    lower, width = bounds[:, 0], bounds[:, 1] - bounds[:, 0]
+    dimension = len(bounds)
+    rng = np.random.default_rng(seed)
+
+    if X_init is None or len(X_init) == 0:
+        X, y = np.empty((0, dimension)), np.empty(0)
+    else:
+        X, y = (np.asarray(X_init, dtype=float) - lower) / width, np.asarray(y_init, dtype=float)
+
+    nfev = 0
+    if initial_design_size is None:
+        initial_design_size = 2 * dimension + 1
+    design_size = min(initial_design_size - len(X), max_evaluations)
+    if design_size > 0:
+        design = ParameterSampler(np.column_stack([np.zeros(dimension), np.ones(dimension)]), 'sobol',
+                                  rng.integers(2 ** 32)).next_unit_batch(design_size)
+        design_values = np.asarray(batch_objective(list(lower + design * width)), dtype=float)
+        X, y = np.vstack([X, design]), np.append(y, design_values)
+        nfev += len(design)
+
+    gp = GaussianProcess(dimension) if model == 'gp' else None
+    message = "Maximum number of evaluations reached."
+    iteration = 0
+    stalled_batches = 0
+    while nfev < max_evaluations:
+        if target is not None and np.min(y) <= target:
+            message = "Target RMSRD reached."
+            break
+
+        z = transform_objective(y)
+        size = min(batch_size, max_evaluations - nfev)
+        if model == 'gp':
+            batch, max_ei = propose_gp_batch(X, z, size, rng, gp)
+            if max_ei < ei_tolerance:
+                message = f"Expected improvement below {ei_tolerance}."
+                break
+        else:
+            batch, _ = propose_rbf_batch(X, z, size, rng, iteration)
+
+        previous_best = np.min(y)
+        values = np.asarray(batch_objective(list(lower + batch * width)), dtype=float)
+        X, y = np.vstack([X, batch]), np.append(y, values)
+        nfev += len(batch)
+        iteration += 1
+        logging.info(f"Surrogate ({model}) batch {iteration}: best RMSRD in batch {np.min(values)}, "
+                     f"overall best {np.min(y)} after {nfev} new evaluations")
+
+        if np.min(y) < previous_best * (1.0 - improvement_tolerance):
+            stalled_batches = 0
+        else:
+            stalled_batches += 1
+            if stalled_batches >= patience:
+                message = f"No improvement in {patience} batches."
+                break
+
+    best = int(np.argmin(y))
+    logging.info(f"Surrogate optimization finished: {message} Best RMSRD {y[best]} with {nfev} new evaluations")
+    return OptimizeResult(x=lower + X[best] * width, fun=float(y[best]), nfev=nfev, nit=iteration, message=message,
+                          X=lower + X * width, y=y)
@@ -0,0 +1,106 @@
+import os
+import sys
+import argparse
+import numpy as np
+from pc_saft_native import (parse_inp_content, read_exp_data, solubility, rmsrd, ideal_solubility_term,
+                            PARAMETER_NAMES)
+
+
+CASE_FILES = ("Input_ASD.inp", "Exp_data_SLE.dat", "Calc_data_SLE.dat")
+
+# Known answers of the SLE right-hand side ln(x*gamma): (T, T_fus, H_fus/kJ mol-1, Cp_fus_a, Cp_fus_b, value)
+# Values from numerical quadrature of -H_fus/R (1/T - 1/T_fus) + int Cp_fus dT / (R T) - int Cp_fus / T dT / R;
+# a positive Cp_fus raises the ideal solubility below the melting point
+IDEAL_SOLUBILITY_REFERENCES = (
+    (393.0, 420.0, 25.0, 0.0, 0.0, -0.491844418122721),
+    (393.0, 420.0, 25.0, 100.0, 0.0, -0.46469665437793567),
+    (393.0, 420.0, 25.0, 100.0, -0.1, -0.4758516857809591),
+)
+
+
+# Function to read the RMSRD written by the executable
+def read_executable_rmsrd(calc_data_file):
+    with open(calc_data_file, 'r') as f:
+        for line in f:
+            if line.strip().startswith("# RMSRD/%"):
+                return float(line.split()[2])
+    raise ValueError(f"No RMSRD line in {calc_data_file}")
+
+
+# Function to find stored executable runs: any folder holding Input_ASD.inp, Exp_data_SLE.dat and Calc_data_SLE.dat
+def find_cases(root_folder):
+    cases = []
+    for folder, _, files in os.walk(root_folder):
+        if all(file_name in files for file_name in CASE_FILES):
+            cases.append(folder)
+    return sorted(cases)
+
+
+# Function to check the ideal solubility term against the known answers; returns the failing cases
+def check_ideal_solubility_term(tolerance=1e-9):
+    failures = []
+    for T, T_fus, H_fus, Cp_a, Cp_b, expected in IDEAL_SOLUBILITY_REFERENCES:
+        value = float(ideal_solubility_term(T, T_fus, H_fus, Cp_a, Cp_b))
+        if abs(value - expected) > tolerance:
+            failures.append(f"T={T}, T_fus={T_fus}, H_fus={H_fus}, Cp_fus_a={Cp_a}, Cp_fus_b={Cp_b}: "
+                            f"{value} instead of {expected}")
+    return failures
+
+
+# Function to compare the native backend with one stored executable run
+def validate_case(case_folder):
+    with open(os.path.join(case_folder, "Input_ASD.inp"), 'r') as f:
+        system = parse_inp_content(f.read())
+    T_exp, w_exp = read_exp_data(os.path.join(case_folder, "Exp_data_SLE.dat"))
+
+    w_native = solubility(system, np.zeros((1, len(PARAMETER_NAMES))), T_exp)[0]
+    native_rmsrd = float(rmsrd(w_native, w_exp))
+    executable_rmsrd = read_executable_rmsrd(os.path.join(case_folder, "Calc_data_SLE.dat"))
+    return executable_rmsrd, native_rmsrd
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the native PC-SAFT backend against stored executable runs. "
+                                                 "Every folder below CASES_FOLDER containing Input_ASD.inp, "
+                                                 "Exp_data_SLE.dat and Calc_data_SLE.dat is treated as one case "
+                                                 "(e.g. the pc_saft_workers/worker_N folders after a run).")
+    parser.add_argument("cases_folder")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Maximum allowed absolute RMSRD difference in percentage points (default 0.5)")
+    args = parser.parse_args(argv)
+
+    # The stored runs can only show agreement with the executable; the known answers pin the SLE condition itself
+    failures = check_ideal_solubility_term()
+    for failure in failures:
+        print(f"Ideal solubility term wrong for {failure}")
+    if failures:
+        return 1
+
+    cases = find_cases(args.cases_folder)
+    if not cases:
+        print(f"No validation cases found in {args.cases_folder}")
+        return 1
+
+    differences = []
+    print(f"{'case':<50} {'exe RMSRD/%':>12} {'native RMSRD/%':>15} {'diff':>10}")
+    for case_folder in cases:
+        try:
+            executable_rmsrd, native_rmsrd = validate_case(case_folder)
+        except ValueError as e:
+            print(f"{case_folder:<50} skipped: {e}")
+            continue
+        difference = abs(native_rmsrd - executable_rmsrd)
+        differences.append(difference)
+        print(f"{case_folder:<50} {executable_rmsrd:12.4f} {native_rmsrd:15.4f} {difference:10.4f}")
+
+    if not differences:
+        return 1
+    differences = np.array(differences)
+    failed = int(np.sum(~(differences <= args.tolerance)))
+    print(f"\n{len(differences)} case(s): mean |diff| = {np.nanmean(differences):.4f}, "
+          f"max |diff| = {np.nanmax(differences):.4f}, {failed} above tolerance {args.tolerance}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+import numpy as np
+from inp_template import PARAMETER_NAMES
+from pc_saft_native import parse_inp_content
+from samplers import ParameterSampler
+
+
+WARM_START_LIBRARY_NAME = "pc_saft_library.sqlite"
+
+# System descriptors read from the template, and the difference that counts as one unit of distance for each:
+# molar masses and association sites per molecule are compared on a log scale (a factor ~3 in molar mass,
+# ~2 in sites), the melting temperature per 50 K and the melting enthalpy per 10 kJ/mol
+DESCRIPTOR_NAMES = ('Mw_API', 'Mw_polymer', 'T_fus', 'H_fus', 'n_don_API', 'n_acc_API', 'n_don_polymer',
+                    'n_acc_polymer')
+DESCRIPTOR_SCALES = np.array([0.5, 0.5, 50.0, 10.0, 0.3, 0.3, 0.3, 0.3])
+LOG_DESCRIPTORS = np.array([True, True, False, False, True, True, True, True])
+
+
+# Function to read the descriptors of a system from its template; values given by placeholders become NaN
+def system_descriptors(template_file):
+    with open(template_file, 'r') as f:
+        system = parse_inp_content(f.read())
+    values = [system['Mw'][0], system['Mw'][1], system['T_fus'], system['H_fus']]
+    for Mw, component in zip(system['Mw'], system['components']):
+        for field in ('n_don', 'n_acc'):
+            count, Mw_mono = component[field], component['Mw_mono']
+            values.append(count * Mw / Mw_mono if isinstance(count, float) and isinstance(Mw_mono, float)
+                          else np.nan)
+    return np.array(values, dtype=float)
+
+
+# Function to put descriptors on the scale they are compared on (log10 of the masses, log10(1 + n) of the sites)
+def scaled_descriptors(descriptors):
+    descriptors = np.asarray(descriptors, dtype=float)
+    return np.where(LOG_DESCRIPTORS, np.log10(1.0 + np.maximum(descriptors, 0.0)), descriptors) / DESCRIPTOR_SCALES
+
+
+# Function to compare two systems' descriptors, ignoring entries unknown for either
+def descriptor_distance(a, b):
+    a, b = scaled_descriptors(a), scaled_descriptors(b)
+    known = np.isfinite(a) & np.isfinite(b)
+    if not np.any(known):
+        return np.inf
+    return float(np.sqrt(np.mean((a[known] - b[known]) ** 2)))
+
+
+# Persistent library of fitted A..H per system, keyed by the system name (title of the template); a system
+# keeps its best solution from any step. Shared by Step 1 and Step 2, and across campaigns if given a path.
+class WarmStartLibrary:
+    def __init__(self, library_path):
+        self.library_path = library_path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(library_path, timeout=60, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS solutions (system TEXT PRIMARY KEY, "
+                f"{', '.join(name + ' REAL' for name in DESCRIPTOR_NAMES)}, "
+                f"{', '.join(name + ' REAL' for name in PARAMETER_NAMES)}, rmsrd REAL, step INTEGER, updated REAL)")
+
+    # Function to store a fitted solution, unless the library already has a better one for the system
+    def add(self, system, descriptors, parameters, rmsrd_value, step):
+        if rmsrd_value is None or not np.isfinite(rmsrd_value):
+            return False
+        columns = ("system",) + DESCRIPTOR_NAMES + tuple(PARAMETER_NAMES) + ("rmsrd", "step", "updated")
+        values = ([system] + [None if np.isnan(value) else float(value) for value in descriptors]
+                  + [float(value) for value in parameters] + [float(rmsrd_value), step, time.time()])
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT rmsrd FROM solutions WHERE system = ?", (system,)).fetchone()
+            if row is not None and row[0] <= rmsrd_value:
+                return False
+            self._connection.execute(f"INSERT OR REPLACE INTO solutions ({', '.join(columns)}) "
+                                     f"VALUES ({', '.join('?' for _ in columns)})", values)
+        return True
+
+    def solutions(self):
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT system, {', '.join(DESCRIPTOR_NAMES)}, {', '.join(PARAMETER_NAMES)}, rmsrd, step "
+                "FROM solutions ORDER BY system").fetchall()
+        count = len(DESCRIPTOR_NAMES)
+        return [{'system': row[0],
+                 'descriptors': np.array([np.nan if value is None else value for value in row[1:1 + count]]),
+                 'parameters': np.array(row[1 + count:1 + count + len(PARAMETER_NAMES)], dtype=float),
+                 'rmsrd': row[-2], 'step': row[-1]} for row in rows]
+
+    # Function to find the k fitted systems closest to the descriptors (optionally only fits below max_rmsrd)
+    def nearest(self, descriptors, k, max_rmsrd=None):
+        candidates = [dict(solution, distance=descriptor_distance(descriptors, solution['descriptors']))
+                      for solution in self.solutions() if max_rmsrd is None or solution['rmsrd'] <= max_rmsrd]
+        return sorted(candidates, key=lambda solution: (solution['distance'], solution['rmsrd']))[:k]
+
+    def close(self):
+        self._connection.close()
+
+
+# Function to open the library; a relative path is taken relative to the main program directory
+def open_warm_start_library(base_directory, library_path=WARM_START_LIBRARY_NAME):
+    return WarmStartLibrary(os.path.join(base_directory, library_path))
+
+
+# Function to propose a first sampling batch: the neighbours' solutions (clipped to the bounds), then points
+# drawn around them in turn, within +-radius of each range
+def warm_start_design(neighbours, bounds, size, radius=0.1, seed=None):
+    bounds = np.asarray(bounds, dtype=float)
+    lower, upper = bounds[:, 0], bounds[:, 1]
+    centres = [np.clip(neighbour['parameters'], lower, upper) for neighbour in neighbours]
+    design = centres[:size]
+    if size <= len(design):
+        return np.array(design)
+    sampler = ParameterSampler(np.column_stack([-np.ones(len(bounds)), np.ones(len(bounds))]), 'sobol', seed)
+    for i, offset in enumerate(sampler.next_batch(size - len(design))):
+        design.append(np.clip(centres[i % len(centres)] + radius * (upper - lower) * offset, lower, upper))
+    return np.array(design)
+
+
+# Function to size the initial simplex from the neighbours: per parameter, the spread of their solutions,
+# kept between min_fraction and max_fraction of the range (None without bounds or with a single neighbour)
+def warm_start_steps(neighbours, bounds, min_fraction=0.02, max_fraction=0.2):
+    if bounds is None or len(neighbours) < 2:
+        return None
+    bounds = np.asarray(bounds, dtype=float)
+    width = bounds[:, 1] - bounds[:, 0]
+    spread = np.std([neighbour['parameters'] for neighbour in neighbours], axis=0)
+    return np.clip(spread, min_fraction * width, max_fraction * width)
+
+
+# Function to build an initial simplex from per-parameter steps in physical units: each vertex moves one
+# parameter towards the middle of its range (or up, without bounds)
+def steps_simplex(start, steps, bounds=None):
+    start = np.array(start, dtype=float)
+    simplex = [start]
+    for k, step in enumerate(steps):
+        vertex = start.copy()
+        if bounds is not None and start[k] > 0.5 * (bounds[k][0] + bounds[k][1]):
+            step = -step
+        vertex[k] += step
+        simplex.append(vertex)
+    return np.array(simplex)
+
+
+# Function to format the neighbours used for a system for the RMSRD values file
+def format_neighbours(neighbours):
+    lines = [f"Warm start from {len(neighbours)} fitted system(s):"]
+    for neighbour in neighbours:
+        lines.append(f"  {neighbour['system']} (distance {neighbour['distance']:.3g}, RMSRD {neighbour['rmsrd']:.6g}, "
+                     f"step {neighbour['step']})")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Inspect the warm-start library ({WARM_START_LIBRARY_NAME} in "
+                                                 "the main program directory).")
+    parser.add_argument("library")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Every fitted system with its descriptors and RMSRD")
+    nearest_parser = commands.add_parser("nearest", help="Closest fitted systems to a template")
+    nearest_parser.add_argument("template", help="Input_ASD_template.inp of the new system")
+    nearest_parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    library = WarmStartLibrary(args.library)
+    if args.command == "list":
+        print(f"{'system':<30} {'step':>4} {'RMSRD':>12}  descriptors")
+        for solution in library.solutions():
+            descriptors = ", ".join(f"{name}={value:.6g}" for name, value in zip(DESCRIPTOR_NAMES,
+                                                                                 solution['descriptors']))
+            print(f"{solution['system']:<30} {solution['step']:>4} {solution['rmsrd']:12.6g}  {descriptors}")
+    else:
+        print(f"{'system':<30} {'distance':>9} {'RMSRD':>12}  parameters")
+        for solution in library.nearest(system_descriptors(args.template), args.k):
+            values = ", ".join(f"{name}={value:.6g}" for name, value in zip(PARAMETER_NAMES, solution['parameters']))
+            print(f"{solution['system']:<30} {solution['distance']:9.3g} {solution['rmsrd']:12.6g}  {values}")
+    library.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())